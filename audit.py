@@ -0,0 +1,374 @@
+"""
+Integrity audit of a generated index directory.
+
+Every committed artifact and '.metadata' sidecar is stream-hashed once across a thread pool (largest
+files first, so the pool drains evenly) and cross-checked against everything that describes it:
+
+    - the '#sha256=' fragment and 'data-core-metadata' attribute in '<package>/index.html',
+    - the 'hashes', 'size' and 'core-metadata' fields in '<package>/index.json',
+    - the digest cache '<package>/.digests.json',
+    - the root manifest '.packages.json' and the root pages.
+
+Remote artifacts (release assets) are not downloaded; their digests must agree between the pages
+and the cache. With --repair only the affected package pages (and, if needed, the root pages) are
+regenerated, re-hashing just the files whose cached digest is wrong.
+
+A file whose bytes match none of its recorded digests is corrupt (or was replaced), not stale: repair
+never publishes a new digest for it. It is restored from the git HEAD of the index repository when the
+committed copy matches the recorded digest; otherwise it stays reported, and its package's pages are
+left untouched, until it is fixed by hand.
+
+    py-toml-builder audit <index-dir> [--repair] [--workers N] [--format json]
+"""
+import os
+import sys
+import json
+import hashlib
+import tempfile
+import contextlib
+import subprocess
+from collections import namedtuple
+from html.parser import HTMLParser
+from urllib.parse import unquote, urlsplit
+
+try:
+    from .main import COLOR_RESET, COLOR_GREEN, COLOR_YELLOW, COLOR_RED, COLOR_CYAN
+    from .metrics import Metrics
+    from .validation import normalize_name
+    from .index import (
+        DIGEST_CACHE_FILENAME, HASH_CHUNK_SIZE, METADATA_SUFFIX, hash_files, list_distributions, load_digest_cache,
+        save_digest_cache, load_root_manifest, save_root_manifest, write_root_index, update_index,
+    )
+except ImportError:
+    from main import COLOR_RESET, COLOR_GREEN, COLOR_YELLOW, COLOR_RED, COLOR_CYAN
+    from metrics import Metrics
+    from validation import normalize_name
+    from index import (
+        DIGEST_CACHE_FILENAME, HASH_CHUNK_SIZE, METADATA_SUFFIX, hash_files, list_distributions, load_digest_cache,
+        save_digest_cache, load_root_manifest, save_root_manifest, write_root_index, update_index,
+    )
+
+# Problem kinds
+MISSING_FILE = "missing-file"               # listed by a page or the cache, but not on disk
+UNLISTED_FILE = "unlisted-file"             # on disk, but not on a page
+DIGEST_MISMATCH = "digest-mismatch"         # a page's digest or size is stale (the bytes on disk match another record)
+CACHE_MISMATCH = "cache-mismatch"           # the digest cache is stale (the bytes on disk match another record)
+CORRUPT_FILE = "corrupt-file"               # the bytes on disk match none of the recorded digests
+METADATA_MISMATCH = "metadata-mismatch"     # the '.metadata' sidecar is missing or doesn't match its advertised digest
+REMOTE_DISAGREEMENT = "remote-disagreement" # pages and cache give different digests for a remote artifact
+MISSING_PAGE = "missing-page"               # index.html or index.json is missing or unreadable
+DEAD_PROJECT = "dead-project"               # the root lists a project whose directory doesn't exist
+UNLISTED_PROJECT = "unlisted-project"       # a package directory isn't listed by the root
+LEGACY_DIRECTORY = "legacy-directory"       # a package directory isn't the PEP 503 normalized name (older workflows)
+
+ROOT = "<root>"
+
+
+class Problem(namedtuple("Problem", ["package", "filename", "kind", "detail"])):
+    """One integrity problem; 'package' is the normalized project name (or '<root>')."""
+    __slots__ = ()
+
+
+class _AnchorCollector(HTMLParser):
+    """Collects (filename, sha256 fragment, core-metadata sha256, is remote) for every anchor of a package page."""
+
+    def __init__(self):
+        super().__init__()
+        self.files = {}
+
+    def handle_starttag(self, tag, attrs):
+        attributes = dict(attrs)
+        if tag != "a" or not attributes.get("href"):
+            return
+        url, _, fragment = attributes["href"].partition("#")
+        parts = urlsplit(url)
+        filename = unquote(parts.path.rsplit("/", 1)[-1])
+        metadata = attributes.get("data-core-metadata") or attributes.get("data-dist-info-metadata") or ""
+        self.files[filename] = {
+            "sha256": fragment[len("sha256="):] if fragment.startswith("sha256=") else None,
+            "metadata_sha256": metadata[len("sha256="):] if metadata.startswith("sha256=") else None,
+            "remote": bool(parts.scheme),
+        }
+
+
+def read_html_files(path):
+    """Returns {filename: link details} from a package's index.html, or None if it can't be read."""
+    collector = _AnchorCollector()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            collector.feed(f.read())
+    except (OSError, UnicodeDecodeError):
+        return None
+    return collector.files
+
+
+def read_json_files(path):
+    """Returns {filename: file entry} from a package's PEP 691 index.json, or None if it can't be read."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            document = json.load(f)
+        return {entry["filename"]: entry for entry in document["files"]}
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def package_directories(index_root):
+    """Normalized names of the directories that look like package directories (pages or artifacts)."""
+    packages = set()
+    for name in os.listdir(index_root):
+        path = os.path.join(index_root, name)
+        if name.startswith(".") or not os.path.isdir(path):
+            continue
+        if any(os.path.exists(os.path.join(path, page)) for page in ("index.html", "index.json", DIGEST_CACHE_FILENAME)) or list_distributions(path):
+            packages.add(name)
+    return packages
+
+
+def collect_package(index_root, package):
+    """Reads everything that describes one package. Returns a dict used by check_package."""
+    package_dir = os.path.join(index_root, package)
+    on_disk = list_distributions(package_dir) if os.path.isdir(package_dir) else []
+    return {
+        "dir": package_dir,
+        "on_disk": on_disk,
+        "html": read_html_files(os.path.join(package_dir, "index.html")),
+        "json": read_json_files(os.path.join(package_dir, "index.json")),
+        "cache": load_digest_cache(package_dir),
+    }
+
+
+def recorded_digests(link, entry, cached):
+    """{source: sha256} of everything that records a file's digest (its links and cache entry)."""
+    return {source: value for source, value in (
+        ("index.html", link and link["sha256"]),
+        ("index.json", entry and entry.get("hashes", {}).get("sha256")),
+        (DIGEST_CACHE_FILENAME, cached and cached.get("sha256")),
+    ) if value}
+
+
+def check_package(package, state, digests):
+    """Cross-checks one package against the actual digests ({path: sha256}). Returns a list of Problem."""
+    problems = []
+    html_files, json_files, cache = state["html"], state["json"], state["cache"]
+    if html_files is None:
+        problems.append(Problem(package, "index.html", MISSING_PAGE, "missing or unreadable"))
+    if json_files is None:
+        problems.append(Problem(package, "index.json", MISSING_PAGE, "missing or unreadable"))
+    html_files, json_files = html_files or {}, json_files or {}
+
+    on_disk = set(state["on_disk"])
+    for filename in sorted(on_disk | set(html_files) | set(json_files) | set(cache)):
+        link, entry, cached = html_files.get(filename), json_files.get(filename), cache.get(filename)
+        path = os.path.join(state["dir"], filename)
+        remote = bool(cached and cached.get("url")) or bool(link and link["remote"]) or bool(entry and "://" in entry.get("url", ""))
+
+        if remote:
+            advertised = recorded_digests(link, entry, cached)
+            if len(set(advertised.values())) > 1:
+                problems.append(Problem(package, filename, REMOTE_DISAGREEMENT, ", ".join(f"{source}={value[:12]}" for source, value in advertised.items())))
+            continue
+
+        if filename not in on_disk:
+            listed_by = [source for source, present in (("index.html", link), ("index.json", entry), (DIGEST_CACHE_FILENAME, cached)) if present]
+            problems.append(Problem(package, filename, MISSING_FILE, f"listed by {', '.join(listed_by)}"))
+            continue
+
+        actual, size = digests[path], os.path.getsize(path)
+        unlisted = [page for page, listed in (("index.html", link), ("index.json", entry)) if not listed]
+        if unlisted:
+            problems.append(Problem(package, filename, UNLISTED_FILE, f"not in {', '.join(unlisted)}"))
+        recorded = recorded_digests(link, entry, cached)
+        if recorded and actual not in recorded.values():
+            # Re-rendering from these bytes would publish a new digest for an already published file
+            problems.append(Problem(package, filename, CORRUPT_FILE, f"content {actual} matches none of the recorded digests ({', '.join(f'{source}={value}' for source, value in recorded.items())})"))
+            continue
+        if link and link["sha256"] != actual:
+            problems.append(Problem(package, filename, DIGEST_MISMATCH, f"index.html has {link['sha256']}, file is {actual}"))
+        if entry:
+            if entry.get("hashes", {}).get("sha256") != actual:
+                problems.append(Problem(package, filename, DIGEST_MISMATCH, f"index.json has {entry.get('hashes', {}).get('sha256')}, file is {actual}"))
+            if entry.get("size") != size:
+                problems.append(Problem(package, filename, DIGEST_MISMATCH, f"index.json size {entry.get('size')}, file is {size} bytes"))
+        if cached and (cached.get("sha256") != actual or cached.get("size") != size):
+            problems.append(Problem(package, filename, CACHE_MISMATCH, f"cached {cached.get('sha256')} ({cached.get('size')} bytes), file is {actual} ({size} bytes)"))
+
+        advertised_metadata = {value for value in (link and link["metadata_sha256"], entry and (entry.get("core-metadata") or {}).get("sha256")) if value}
+        if advertised_metadata:
+            sidecar = digests.get(path + METADATA_SUFFIX)
+            if sidecar is None:
+                problems.append(Problem(package, filename + METADATA_SUFFIX, METADATA_MISMATCH, "advertised but missing"))
+            elif advertised_metadata != {sidecar}:
+                problems.append(Problem(package, filename + METADATA_SUFFIX, METADATA_MISMATCH, f"advertised {', '.join(sorted(advertised_metadata))}, file is {sidecar}"))
+    return problems
+
+
+def check_root(index_root, packages):
+    """Cross-checks the root manifest and root pages with the package directories."""
+    problems = []
+    projects = load_root_manifest(index_root)
+    for page in ("index.html", "index.json"):
+        if not os.path.exists(os.path.join(index_root, page)):
+            problems.append(Problem(ROOT, page, MISSING_PAGE, "missing"))
+    # Legacy directories count for their normalized project; repairing them moves them there
+    normalized = {normalize_name(package) for package in packages}
+    for project in sorted(set(projects) - normalized):
+        problems.append(Problem(ROOT, project, DEAD_PROJECT, "listed by the root, but the directory has no index"))
+    for package in sorted(packages):
+        if normalize_name(package) != package:
+            problems.append(Problem(ROOT, package, LEGACY_DIRECTORY, f"not the normalized name '{normalize_name(package)}'"))
+        elif package not in projects:
+            problems.append(Problem(ROOT, package, UNLISTED_PROJECT, "package directory not listed by the root"))
+    return problems
+
+
+def audit_index(index_root, packages=None, workers=None, metrics=None):
+    """
+    Audits the index (or only the given packages). Returns a list of Problem.
+    All artifacts and sidecars are hashed in one thread pool, largest first.
+    """
+    metrics = metrics or Metrics()
+    # Projects the root lists without a directory are reported by check_root (dead projects)
+    directories = package_directories(index_root)
+    selected = sorted(directories if packages is None else directories & set(packages))
+    states = {package: collect_package(index_root, package) for package in selected}
+
+    paths = []
+    for state in states.values():
+        for filename in state["on_disk"]:
+            paths.append(os.path.join(state["dir"], filename))
+            sidecar = os.path.join(state["dir"], filename + METADATA_SUFFIX)
+            if os.path.exists(sidecar):
+                paths.append(sidecar)
+    sizes = {path: os.path.getsize(path) for path in paths}
+    with metrics.phase("hash"):
+        digests = hash_files(sorted(paths, key=sizes.get, reverse=True), workers=workers)
+    metrics.count("files_hashed", len(paths))
+    metrics.count("bytes_read", sum(sizes.values()))
+
+    with metrics.phase("check"):
+        problems = []
+        for package in selected:
+            problems += check_package(package, states[package], digests)
+        if packages is None:
+            problems += check_root(index_root, directories)
+    metrics.count("problems", len(problems))
+    return problems
+
+
+def restore_from_git(index_root, package, filename, expected):
+    """
+    Restores '<package>/<filename>' from the git HEAD of the index repository if the committed copy's
+    SHA-256 is one of 'expected'. The blob is streamed through a temporary file, so large artifacts
+    aren't held in memory. Returns True if the file was restored.
+    """
+    path = os.path.join(index_root, package, filename)
+    temp_path = None
+    try:
+        fd, temp_path = tempfile.mkstemp(prefix=".restore-", dir=os.path.dirname(path))
+        digest = hashlib.sha256()
+        command = ["git", "cat-file", "blob", f"HEAD:./{package}/{filename}"]
+        with os.fdopen(fd, "wb") as f, subprocess.Popen(command, cwd=index_root, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL) as git:
+            for chunk in iter(lambda: git.stdout.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+                f.write(chunk)
+        if git.returncode == 0 and digest.hexdigest() in expected:
+            os.chmod(temp_path, 0o644) # As git checks out regular files (mkstemp creates them 0600)
+            os.replace(temp_path, path)
+            return True
+    except OSError:
+        pass
+    if temp_path and os.path.exists(temp_path):
+        os.remove(temp_path)
+    return False
+
+
+def repair_index(index_root, problems, workers=None):
+    """
+    Regenerates only what the problems affect: drops wrong cache entries so those files are re-hashed,
+    removes wrong '.metadata' sidecars so they are extracted again, moves legacy directories and
+    re-renders the affected package pages and, for root problems, the root manifest and pages.
+    Corrupt and missing files are restored from git when the committed copy matches their recorded
+    digest; a package with a corrupt file that can't be restored is not regenerated at all.
+    Returns the set of repaired packages (normalized names).
+    """
+    projects = load_root_manifest(index_root)
+    affected = {problem.package for problem in problems if problem.package != ROOT}
+    root_problems = [problem for problem in problems if problem.package == ROOT]
+    affected |= {problem.filename for problem in root_problems if problem.kind in (UNLISTED_PROJECT, LEGACY_DIRECTORY)}
+
+    states = {}
+    unrepairable = {}
+    for problem in problems:
+        if problem.kind not in (CORRUPT_FILE, MISSING_FILE):
+            continue
+        state = states.setdefault(problem.package, collect_package(index_root, problem.package))
+        expected = recorded_digests((state["html"] or {}).get(problem.filename), (state["json"] or {}).get(problem.filename), state["cache"].get(problem.filename))
+        if restore_from_git(index_root, problem.package, problem.filename, set(expected.values())):
+            print(f"{COLOR_CYAN}Restored {problem.package}/{problem.filename} from git{COLOR_RESET}")
+        elif problem.kind == CORRUPT_FILE:
+            unrepairable.setdefault(problem.package, []).append(problem.filename)
+
+    for package in sorted(affected):
+        if package in unrepairable:
+            print(f"{COLOR_RED}Not regenerating {package}: {', '.join(unrepairable[package])} doesn't match its published digest and no matching copy is committed; restore or remove it first{COLOR_RESET}")
+            continue
+        package_dir = os.path.join(index_root, package)
+        stale = {problem.filename for problem in problems if problem.package == package and problem.kind in (CACHE_MISMATCH, DIGEST_MISMATCH)}
+        cache = load_digest_cache(package_dir)
+        if stale & set(cache):
+            save_digest_cache(package_dir, {filename: entry for filename, entry in cache.items() if filename not in stale})
+        # A wrong sidecar is removed, so update_index extracts it from the wheel again
+        for problem in problems:
+            sidecar = os.path.join(package_dir, problem.filename)
+            if problem.package == package and problem.kind == METADATA_MISMATCH and os.path.exists(sidecar):
+                os.remove(sidecar)
+        display_name = projects.get(normalize_name(package), {}).get("name", package)
+        print(f"{COLOR_CYAN}Repairing {display_name}{COLOR_RESET}")
+        update_index(index_root, display_name, workers=workers)
+
+    dead = {problem.filename for problem in root_problems if problem.kind == DEAD_PROJECT}
+    if dead or any(problem.kind == MISSING_PAGE for problem in root_problems):
+        projects = {project: details for project, details in load_root_manifest(index_root).items() if project not in dead}
+        save_root_manifest(index_root, projects)
+        write_root_index(index_root, projects)
+        print(f"{COLOR_CYAN}Re-rendered the root index{' without ' + ', '.join(sorted(dead)) if dead else ''}{COLOR_RESET}")
+    return {normalize_name(package) for package in affected}
+
+
+def print_problems(problems):
+    for problem in problems:
+        print(f"{COLOR_RED}{problem.kind:<20}{COLOR_RESET}{problem.package}/{problem.filename}: {problem.detail}")
+
+
+def run_audit(index_root, repair=False, workers=None, output_format="text", metrics=None):
+    """Audits an index directory, optionally repairs it, and returns the exit code (1 if problems remain)."""
+    metrics = metrics or Metrics()
+    if not os.path.isdir(index_root):
+        print(f"{COLOR_RED}Error: '{index_root}' is not a directory.{COLOR_RESET}", file=sys.stderr)
+        return 2
+
+    problems = audit_index(index_root, workers=workers, metrics=metrics)
+    remaining = problems
+    if problems and repair:
+        # In JSON mode the repair progress goes to stderr, so stdout stays a single document
+        with metrics.phase("repair"), contextlib.redirect_stdout(sys.stderr if output_format == "json" else sys.stdout):
+            repaired = repair_index(index_root, problems, workers=workers)
+            remaining = audit_index(index_root, packages=repaired, workers=workers) + check_root(index_root, package_directories(index_root))
+        metrics.count("packages_repaired", len(repaired))
+
+    if output_format == "json":
+        print(json.dumps({
+            "problems": [problem._asdict() for problem in problems],
+            "remaining": [problem._asdict() for problem in remaining] if repair else None,
+        }, indent=2))
+    else:
+        print_problems(problems)
+        counts = metrics.counters
+        print(f"{COLOR_CYAN}Audited {counts.get('files_hashed', 0)} file(s) ({counts.get('bytes_read', 0)} bytes): {len(problems)} problem(s).{COLOR_RESET}")
+        if repair and problems:
+            if remaining:
+                print(f"{COLOR_YELLOW}{len(remaining)} problem(s) remain after repair:{COLOR_RESET}")
+                print_problems(remaining)
+            else:
+                print(f"{COLOR_GREEN}Repaired; the index is consistent now.{COLOR_RESET}")
+    return 1 if remaining else 0
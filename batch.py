@@ -0,0 +1,335 @@
+import os
+import sys
+import json
+import tomllib
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from .main import (
+        COLOR_RESET, COLOR_GREEN, COLOR_RED, COLOR_CYAN,
+        is_valid_retention_policy, parse_matrix_axes,
+        generate_pyproject_toml, generate_workflow_yml, write_generated_files, ARTIFACT_STORAGE_CHOICES, WORKFLOW_PROFILE_CHOICES,
+    )
+    from .metrics import Metrics
+    from .validation import FieldError, check_fields, validate_pyproject
+except ImportError:
+    from main import (
+        COLOR_RESET, COLOR_GREEN, COLOR_RED, COLOR_CYAN,
+        is_valid_retention_policy, parse_matrix_axes,
+        generate_pyproject_toml, generate_workflow_yml, write_generated_files, ARTIFACT_STORAGE_CHOICES, WORKFLOW_PROFILE_CHOICES,
+    )
+    from metrics import Metrics
+    from validation import FieldError, check_fields, validate_pyproject
+
+# Shared GitHub settings and the environment variables the interactive setup pre-fills them from.
+SHARED_FIELDS = {
+    "github_username": "GITHUB_USERNAME",
+    "pypi_index_repo_name": "PYPI_INDEX_REPO_NAME",
+    "pat_secret_name": "PAT_SECRET_NAME",
+}
+
+# Per-package fields that must be present; their formats are checked by validation.FIELD_VALIDATORS.
+MANDATORY_FIELDS = (
+    "package_name",
+    "package_version",
+    "your_name",
+    "your_email",
+    "short_description",
+    "package_github_url",
+)
+
+
+class ManifestError(Exception):
+    """Raised when a manifest cannot be read or the shared settings cannot be resolved."""
+
+
+def load_manifest(path):
+    """
+    Loads a manifest and returns (shared, records).
+    TOML: an optional [shared] table and a [[package]] array of tables.
+    JSON: either a list of records or {"shared": {...}, "packages": [...]}.
+    JSONL: one record per line; a line of the form {"shared": {...}} sets the shared settings.
+    """
+    shared = {}
+    try:
+        if path.endswith(".toml"):
+            with open(path, "rb") as f:
+                data = tomllib.load(f)
+            shared = data.get("shared", {})
+            records = data.get("package", [])
+        elif path.endswith(".jsonl"):
+            records = []
+            with open(path, "r") as f:
+                for line_number, line in enumerate(f, start=1):
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError as e:
+                        raise ManifestError(f"{path}:{line_number}: {e}") from e
+                    if not isinstance(record, dict):
+                        raise ManifestError(f"{path}:{line_number}: expected a JSON object, got {json.dumps(record)}")
+                    if set(record) == {"shared"}:
+                        shared = record["shared"]
+                    else:
+                        records.append(record)
+        elif path.endswith(".json"):
+            with open(path, "r") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                shared = data.get("shared", {})
+                records = data.get("packages", [])
+            else:
+                records = data
+        else:
+            raise ManifestError(f"Unsupported manifest format: '{path}' (expected .toml, .json or .jsonl).")
+    except (OSError, ValueError) as e:
+        raise ManifestError(f"Could not read manifest '{path}': {e}") from e
+
+    if not isinstance(shared, dict) or not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+        raise ManifestError(f"Malformed manifest '{path}': expected a 'shared' table and a list of package records.")
+    return shared, records
+
+
+def resolve_shared(shared):
+    """Resolves the shared GitHub settings once for the whole batch: manifest first, then environment variables."""
+    resolved = {}
+    missing = []
+    for field, env_var_name in SHARED_FIELDS.items():
+        value = shared.get(field) or os.environ.get(env_var_name)
+        if not value:
+            missing.append(f"{field} (or ${env_var_name})")
+        resolved[field] = value
+    if missing:
+        raise ManifestError("Missing shared settings: " + ", ".join(missing))
+    return resolved
+
+
+def validate_record(record):
+    """
+    Validates one manifest record with the same rules as the interactive prompts.
+    Returns a list of validation.FieldError, one per problem (empty if the record is valid).
+    """
+    errors = check_fields(record, MANDATORY_FIELDS)
+
+    cli_command_name = record.get("cli_command_name")
+    cli_entry_point = record.get("cli_entry_point")
+    if bool(cli_command_name) != bool(cli_entry_point):
+        errors.append(FieldError("cli_command_name", cli_command_name, "cli_command_name and cli_entry_point must be given together"))
+
+    output_dir = record.get("output_dir")
+    if output_dir is not None and (not isinstance(output_dir, str) or os.path.isabs(output_dir) or os.path.normpath(output_dir).split(os.sep)[0] == os.pardir):
+        errors.append(FieldError("output_dir", output_dir, "must be a relative path inside the batch output directory"))
+
+    artifact_storage = record.get("artifact_storage", "index")
+    if artifact_storage not in ARTIFACT_STORAGE_CHOICES:
+        errors.append(FieldError("artifact_storage", artifact_storage, f"must be one of {', '.join(ARTIFACT_STORAGE_CHOICES)}"))
+    profile = record.get("profile", "standard")
+    if profile not in WORKFLOW_PROFILE_CHOICES:
+        errors.append(FieldError("profile", profile, f"must be one of {', '.join(WORKFLOW_PROFILE_CHOICES)}"))
+    retention = record.get("retention")
+    if retention and not is_valid_retention_policy(retention):
+        errors.append(FieldError("retention", retention, f"invalid policy '{retention}'"))
+    try:
+        record_matrix(record)
+    except ValueError as e:
+        errors.append(FieldError("matrix", record.get("matrix"), str(e)))
+    return errors
+
+
+def validate_records(records):
+    """Validates many records in one pass. Returns [(record index, package name, [FieldError])] for the invalid ones."""
+    report = []
+    for position, record in enumerate(records):
+        errors = validate_record(record)
+        if errors:
+            report.append((position, record.get("package_name") or "<unnamed>", errors))
+    return report
+
+
+def validate_file(path):
+    """
+    Validates a manifest (every record) or a pyproject.toml, in the form returned by validate_records;
+    a pyproject.toml is reported as record None. Raises ManifestError if the file can't be read.
+    """
+    if os.path.basename(path) == "pyproject.toml":
+        try:
+            with open(path, "rb") as f:
+                data = tomllib.load(f)
+        except (OSError, ValueError) as e:
+            raise ManifestError(f"Could not read '{path}': {e}") from e
+        errors = validate_pyproject(data)
+        project = data.get("project")
+        name = project.get("name") if isinstance(project, dict) else None
+        return [(None, name or "<unnamed>", errors)] if errors else []
+    _, records = load_manifest(path)
+    return validate_records(records)
+
+
+def run_validate(paths, output_format="text"):
+    """
+    Validates manifests and pyproject.toml files without rendering anything (e.g. as a pre-commit hook).
+    Prints every problem and returns 1 if any were found, 2 if a file couldn't be read, else 0.
+    """
+    problems = []
+    unreadable = 0
+    for path in paths:
+        try:
+            results = validate_file(path)
+        except ManifestError as e:
+            unreadable += 1
+            print(f"{COLOR_RED}{e}{COLOR_RESET}", file=sys.stderr)
+            continue
+        for position, name, errors in results:
+            problems += [
+                {"path": path, "record": position, "package": name, "field": error.field, "value": error.value, "message": error.message}
+                for error in errors
+            ]
+
+    if output_format == "json":
+        print(json.dumps(problems, indent=2, default=str))
+    else:
+        for problem in problems:
+            location = f"{problem['path']}[{problem['record']}] ({problem['package']})" if problem["record"] is not None else problem["path"]
+            print(f"{COLOR_RED}{location}{COLOR_RESET}: {problem['field']}: {problem['message']}")
+        print(f"{COLOR_CYAN}Checked {len(paths)} file(s): {len(problems)} problem(s).{COLOR_RESET}")
+    if unreadable:
+        return 2
+    return 1 if problems else 0
+
+
+def record_matrix(record):
+    """
+    Returns the build matrix of a record as {axis: [values]}, or None. The manifest may give it as a
+    table/object of lists or in the interactive 'axis=v1,v2;axis2=...' form. Raises ValueError if malformed.
+    """
+    matrix = record.get("matrix")
+    if not matrix:
+        return None
+    if isinstance(matrix, str):
+        return parse_matrix_axes(matrix)
+    if not isinstance(matrix, dict) or not all(isinstance(values, list) and values for values in matrix.values()):
+        raise ValueError("expected a table of non-empty lists or an 'axis=v1,v2;...' string")
+    return parse_matrix_axes(";".join(f"{axis}={','.join(str(value) for value in values)}" for axis, values in matrix.items()))
+
+
+def record_output_dir(record, output_root):
+    """
+    Returns the output directory of a record below 'output_root'. Raises ValueError if it resolves
+    (e.g. through '..' or a symlink) to a location outside 'output_root'.
+    """
+    output_dir = os.path.join(output_root, record.get("output_dir") or record["package_name"].strip())
+    root = os.path.realpath(output_root)
+    if os.path.commonpath([root, os.path.realpath(output_dir)]) != root:
+        raise ValueError(f"output_dir: '{record.get('output_dir')}' is outside the output directory '{output_root}'")
+    return output_dir
+
+
+def find_output_collisions(records, output_root):
+    """
+    Resolves the output directory of every valid record before anything is rendered. Returns
+    {record index: message} for the records that share their output directory with another record.
+    """
+    owners = {}
+    for position, record in enumerate(records):
+        if validate_record(record):
+            continue # Not written; render_record reports its errors
+        try:
+            output_dir = record_output_dir(record, output_root)
+        except ValueError:
+            continue
+        owners.setdefault(os.path.normcase(os.path.realpath(output_dir)), []).append((position, output_dir))
+
+    collisions = {}
+    for owner in owners.values():
+        if len(owner) < 2:
+            continue
+        for position, output_dir in owner:
+            others = ", ".join(f"record {other} ({records[other]['package_name']})" for other, _ in owner if other != position)
+            collisions[position] = f"output directory {output_dir} is also used by {others}"
+    return collisions
+
+
+def render_record(record, shared, output_root):
+    """Validates and renders one record into its output directory. Runs in a worker process."""
+    name = record.get("package_name") or "<unnamed>"
+    errors = validate_record(record)
+    if errors:
+        return name, False, "; ".join(str(error) for error in errors)
+
+    pyproject_content = generate_pyproject_toml(
+        package_name=record["package_name"].strip(),
+        package_version=record["package_version"].strip(),
+        your_name=record["your_name"].strip(),
+        your_email=record["your_email"].strip(),
+        short_description=record["short_description"].strip(),
+        package_github_url=record["package_github_url"].strip(),
+        cli_command_name=record.get("cli_command_name"),
+        cli_entry_point=record.get("cli_entry_point")
+    )
+    workflow_content = generate_workflow_yml(
+        github_username=shared["github_username"],
+        pypi_index_repo_name=shared["pypi_index_repo_name"],
+        pat_secret_name=shared["pat_secret_name"],
+        artifact_storage=record.get("artifact_storage", "index"),
+        retention=record.get("retention"),
+        profile=record.get("profile", "standard"),
+        full_history=bool(record.get("full_history")),
+        matrix=record_matrix(record)
+    )
+    try:
+        tomllib.loads(pyproject_content)
+    except tomllib.TOMLDecodeError as e:
+        return name, False, f"generated pyproject.toml is not valid TOML: {e}"
+    try:
+        output_dir = record_output_dir(record, output_root)
+    except ValueError as e:
+        return name, False, str(e)
+    try:
+        write_generated_files(output_dir, pyproject_content, workflow_content)
+    except OSError as e:
+        return name, False, str(e)
+    return name, True, output_dir
+
+
+def run_batch(manifest_path, output_root=".", jobs=None, metrics=None):
+    """
+    Renders every record of a manifest in parallel, prints a report and returns the exit code.
+    Phase timings and record counters are added to 'metrics' when given.
+    """
+    metrics = metrics or Metrics()
+    try:
+        with metrics.phase("load_manifest"):
+            shared, records = load_manifest(manifest_path)
+            shared = resolve_shared(shared)
+    except ManifestError as e:
+        print(f"{COLOR_RED}{e}{COLOR_RESET}", file=sys.stderr)
+        return 2
+
+    print(f"{COLOR_GREEN}--- Batch: {len(records)} package(s) from {manifest_path} ---{COLOR_RESET}")
+    failures = 0
+    metrics.count("records", len(records))
+    if records:
+        # Records writing to the same directory would overwrite each other in whichever order the workers finish
+        collisions = find_output_collisions(records, output_root)
+        pending = [record for position, record in enumerate(records) if position not in collisions]
+        chunksize = max(1, len(pending) // ((jobs or os.cpu_count() or 1) * 4))
+        with metrics.phase("render"), ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = executor.map(
+                render_record, pending, [shared] * len(pending), [output_root] * len(pending), chunksize=chunksize
+            )
+            for position, record in enumerate(records):
+                if position in collisions:
+                    name, ok, message = record["package_name"], False, collisions[position]
+                else:
+                    name, ok, message = next(results)
+                if ok:
+                    print(f"{COLOR_GREEN}  OK    {COLOR_RESET}{name} -> {message}")
+                else:
+                    failures += 1
+                    print(f"{COLOR_RED}  FAIL  {COLOR_RESET}{name}: {message}")
+
+    metrics.count("records_failed", failures)
+    print(f"{COLOR_CYAN}{len(records) - failures} succeeded, {failures} failed.{COLOR_RESET}")
+    return 1 if failures else 0
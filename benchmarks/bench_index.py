@@ -0,0 +1,200 @@
+"""
+Benchmark for the index builder at scale.
+
+Synthesizes an index repository with a configurable number of projects, distributions per project
+and distribution size, then times the scenarios a release pipeline goes through:
+
+    cold      first build of every project page and the root index (nothing cached)
+    warm      the same rebuild again, with every digest cached
+    release   one new distribution added to one project, as in a normal release
+    root      re-rendering the root index.html/index.json from the manifest
+
+Each scenario runs in a fresh process so its peak RSS is its own. Results are printed and, with
+--output, appended as JSON lines (one per scenario, tagged with the git commit) so runs can be
+compared between commits with --compare.
+
+    python benchmarks/bench_index.py --projects 100 --files-per-project 100 --file-size 65536 --output bench.jsonl
+    python benchmarks/bench_index.py --projects 100 --files-per-project 100 --file-size 65536 --compare bench.jsonl
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import zipfile
+import argparse
+import resource
+import tempfile
+import contextlib
+import subprocess
+import multiprocessing
+from datetime import datetime, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import index # noqa: E402 (the repository root is the package directory)
+
+SCENARIOS = ("cold", "warm", "release", "root")
+
+
+def project_name(number):
+    return f"bench-pkg-{number:05d}"
+
+
+def write_wheel(path, name, version, size):
+    """Writes a minimal valid wheel whose payload makes the file roughly 'size' bytes."""
+    dist_name = name.replace("-", "_")
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED) as wheel:
+        wheel.writestr(f"{dist_name}-{version}.dist-info/METADATA", f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\nRequires-Python: >=3.8\n\n")
+        wheel.writestr(f"{dist_name}/payload.bin", os.urandom(max(0, size - 400)))
+
+
+def synthesize(root, projects, files_per_project, file_size):
+    """Creates the package directories of a synthetic index. Returns the total bytes written."""
+    total = 0
+    for number in range(projects):
+        name = project_name(number)
+        package_dir = os.path.join(root, name)
+        os.makedirs(package_dir, exist_ok=True)
+        for release in range(files_per_project):
+            path = os.path.join(package_dir, f"{name.replace('-', '_')}-0.{release // 100}.{release % 100}-py3-none-any.whl")
+            write_wheel(path, name, f"0.{release // 100}.{release % 100}", file_size)
+            total += os.path.getsize(path)
+    return total
+
+
+def update_all(root, projects, workers):
+    """Runs the per-package update for every project. Returns the summed statistics."""
+    totals = {"files": 0, "hashed": 0, "bytes_hashed": 0}
+    for number in range(projects):
+        stats = index.update_index(root, project_name(number), workers=workers)
+        for key in totals:
+            totals[key] += stats[key]
+    return totals
+
+
+def run_scenario(scenario, root, params):
+    """Runs one scenario in the current (fresh) process and returns its measurements."""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        started = time.perf_counter()
+        if scenario in ("cold", "warm"):
+            totals = update_all(root, params["projects"], params["workers"])
+        elif scenario == "release":
+            name = project_name(0)
+            version = f"9.0.{int(time.time() * 1000) % 100000}"
+            write_wheel(os.path.join(root, name, f"{name.replace('-', '_')}-{version}-py3-none-any.whl"), name, version, params["file_size"])
+            started = time.perf_counter() # Writing the artifact is not part of the index update
+            stats = index.update_index(root, name, workers=params["workers"])
+            totals = {key: stats[key] for key in ("files", "hashed", "bytes_hashed")}
+        else:
+            projects = index.load_root_manifest(root)
+            index.write_root_index(root, projects)
+            totals = {"files": len(projects), "hashed": 0, "bytes_hashed": 0}
+        wall_seconds = time.perf_counter() - started
+
+    return {
+        "scenario": scenario,
+        "wall_seconds": round(wall_seconds, 4),
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024),
+        "files": totals["files"],
+        "files_hashed": totals["hashed"],
+        "bytes_hashed": totals["bytes_hashed"],
+    }
+
+
+def run_isolated(scenario, root, params):
+    """Runs a scenario in a child process so peak RSS is measured per scenario."""
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        return pool.apply(run_scenario, (scenario, root, params))
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_baseline(path, params):
+    """Returns {scenario: result} from the most recent run in 'path' with the same parameters."""
+    baseline = {}
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    if record.get("params") == params:
+                        baseline[record["scenario"]] = record
+    except FileNotFoundError:
+        pass
+    return baseline
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the index builder on a synthetic index.")
+    parser.add_argument("--projects", type=int, default=20, help="Number of projects (default: 20).")
+    parser.add_argument("--files-per-project", type=int, default=50, help="Distributions per project (default: 50).")
+    parser.add_argument("--file-size", type=int, default=64 * 1024, help="Approximate size of each distribution in bytes (default: 65536).")
+    parser.add_argument("--workers", type=int, default=None, help="Hashing threads (default: index.default_workers()).")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"Comma-separated scenarios to run (default: {','.join(SCENARIOS)}).")
+    parser.add_argument("--workdir", default=None, help="Directory for the synthetic index (default: a temporary directory).")
+    parser.add_argument("--keep", action="store_true", help="Keep the synthetic index after the run.")
+    parser.add_argument("--output", default=None, help="Append results as JSON lines to this file.")
+    parser.add_argument("--compare", default=None, help="Compare against the latest results with the same parameters in this JSON lines file.")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="Relative wall-time increase that --compare reports as a failure (default: 0.25).")
+    args = parser.parse_args(argv)
+
+    scenarios = [scenario.strip() for scenario in args.scenarios.split(",") if scenario.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+    params = {
+        "projects": args.projects,
+        "files_per_project": args.files_per_project,
+        "file_size": args.file_size,
+        "workers": args.workers or index.default_workers(),
+    }
+
+    root = args.workdir or tempfile.mkdtemp(prefix="py-toml-builder-bench-")
+    os.makedirs(root, exist_ok=True)
+    try:
+        started = time.perf_counter()
+        total_bytes = synthesize(root, args.projects, args.files_per_project, args.file_size)
+        print(f"Synthesized {args.projects * args.files_per_project} distributions ({total_bytes} bytes) in {time.perf_counter() - started:.1f}s at {root}")
+
+        commit = git_commit()
+        timestamp = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        results = []
+        print(f"{'scenario':<10}{'wall s':>10}{'peak RSS MiB':>14}{'files':>10}{'hashed':>10}{'MiB hashed':>12}")
+        for scenario in scenarios:
+            result = run_isolated(scenario, root, params)
+            result.update({"commit": commit, "timestamp": timestamp, "params": params})
+            results.append(result)
+            print(f"{scenario:<10}{result['wall_seconds']:>10.3f}{result['peak_rss_bytes'] / 2**20:>14.1f}{result['files']:>10}{result['files_hashed']:>10}{result['bytes_hashed'] / 2**20:>12.1f}")
+    finally:
+        if not args.keep and not args.workdir:
+            shutil.rmtree(root, ignore_errors=True)
+
+    exit_code = 0
+    if args.compare:
+        baseline = load_baseline(args.compare, params)
+        for result in results:
+            previous = baseline.get(result["scenario"])
+            if not previous or not previous["wall_seconds"]:
+                continue
+            change = result["wall_seconds"] / previous["wall_seconds"] - 1
+            regressed = change > args.max_regression
+            exit_code = exit_code or int(regressed)
+            print(f"{result['scenario']:<10} {change:+.1%} vs {previous.get('commit')}{'  REGRESSION' if regressed else ''}")
+
+    if args.output:
+        with open(args.output, "a") as f:
+            for result in results:
+                f.write(json.dumps(result, sort_keys=True) + "\n")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,696 @@
+"""
+Builds the static PEP 503 index pages inside a checkout of the PyPI index repository.
+
+The generated GitHub workflow runs, after building the package:
+
+    python -m py_toml_builder.index <package> --root <index-repo> --dist dist [--url-base <assets-url>]
+
+which copies the distributions into '<index-repo>/<package>/' (or, with --url-base, links them
+where they are hosted, e.g. as GitHub release assets, so the index repo only holds pages).
+
+Digests are cached in '<package>/.digests.json', keyed by filename, size and git blob id
+(or mtime outside git), so each run only hashes the artifacts added by the current release.
+The list of projects lives in '.packages.json' at the repository root and the root index.html
+is re-rendered from it, so adding a package never parses the existing HTML.
+Every HTML page has a PEP 691 'index.json' twin next to it, and each wheel's METADATA is
+published as a PEP 658 '<wheel>.metadata' sidecar so resolvers don't download whole wheels.
+"""
+import os
+import sys
+import argparse
+import json
+import html
+import hashlib
+import shutil
+import tarfile
+import zipfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.parser import HeaderParser
+
+try:
+    from .retention import parse_policy, select_pruned_versions, YANK_REASON
+    from .metrics import Metrics
+    from .validation import normalize_name
+except ImportError:
+    from retention import parse_policy, select_pruned_versions, YANK_REASON
+    from metrics import Metrics
+    from validation import normalize_name
+from html.parser import HTMLParser
+from urllib.parse import quote
+
+DIST_EXTENSIONS = (".whl", ".tar.gz")
+HASH_CHUNK_SIZE = 1024 * 1024 # Bytes read per hashing step; peak memory is about workers * chunk size
+DIGEST_CACHE_FILENAME = ".digests.json" # Dotfile, so GitHub Pages (Jekyll) doesn't publish it
+DIGEST_CACHE_VERSION = 1
+ROOT_MANIFEST_FILENAME = ".packages.json" # Canonical list of projects; the root index.html is rendered from it
+ROOT_MANIFEST_VERSION = 1
+
+METADATA_SUFFIX = ".metadata" # PEP 658 core-metadata sidecar, served next to each wheel
+SIMPLE_API_VERSION = "1.1" # PEP 691 JSON pages, with the PEP 700 'versions', 'size' and 'upload-time' fields
+
+
+def default_workers():
+    """Number of hashing threads. hashlib releases the GIL, so threads hash in parallel."""
+    return min(32, (os.cpu_count() or 1) + 4)
+
+
+def hash_file(path, chunk_size=HASH_CHUNK_SIZE):
+    """Returns the SHA-256 hex digest of a file, reading it in fixed-size chunks into a reused buffer."""
+    digest = hashlib.sha256()
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            digest.update(view[:read])
+    return digest.hexdigest()
+
+
+def digest_file(path, chunk_size=HASH_CHUNK_SIZE):
+    """
+    Returns (sha256 hex digest, git blob id) of a file in a single streaming pass.
+    The blob id lets later runs recognise the file from 'git ls-files' without reading it.
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.sha256()
+    blob = hashlib.sha1(f"blob {size}\0".encode())
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            digest.update(view[:read])
+            blob.update(view[:read])
+    return digest.hexdigest(), blob.hexdigest()
+
+
+def map_files(function, paths, workers=None):
+    """Applies an I/O-bound function to files across a thread pool. Returns {path: function(path)}."""
+    paths = list(paths)
+    if not paths:
+        return {}
+    with ThreadPoolExecutor(max_workers=workers or default_workers()) as executor:
+        return dict(zip(paths, executor.map(function, paths)))
+
+
+def hash_files(paths, workers=None, hasher=hash_file):
+    """Hashes files across a thread pool. Returns {path: hasher(path)}."""
+    return map_files(hasher, paths, workers=workers)
+
+
+def read_core_metadata(path):
+    """
+    Returns the raw core metadata of a distribution: '*.dist-info/METADATA' of a wheel or the top-level
+    'PKG-INFO' of an sdist. Returns None if the archive has none or can't be read.
+    """
+    try:
+        if path.endswith(".whl"):
+            with zipfile.ZipFile(path) as archive:
+                for name in archive.namelist():
+                    parts = name.split("/")
+                    if len(parts) == 2 and parts[0].endswith(".dist-info") and parts[1] == "METADATA":
+                        return archive.read(name)
+        else:
+            with tarfile.open(path, "r:gz") as archive:
+                for member in archive:
+                    parts = member.name.split("/")
+                    if len(parts) == 2 and parts[1] == "PKG-INFO" and member.isfile():
+                        return archive.extractfile(member).read()
+    except (OSError, zipfile.BadZipFile, tarfile.TarError, EOFError):
+        return None
+    return None
+
+
+def extract_metadata(path):
+    """
+    Reads a distribution's core metadata once and returns {"requires_python", "metadata_sha256"}.
+    For wheels the metadata is also written to the PEP 658 sidecar '<file>.metadata'; zipfile only
+    reads the central directory and that one member, so the wheel is never unpacked.
+    """
+    metadata = read_core_metadata(path)
+    if metadata is None:
+        return {"requires_python": None, "metadata_sha256": None}
+
+    metadata_sha256 = None
+    if path.endswith(".whl"):
+        with open(path + METADATA_SUFFIX, "wb") as f:
+            f.write(metadata)
+        metadata_sha256 = hashlib.sha256(metadata).hexdigest()
+    requires_python = HeaderParser().parsestr(metadata.decode("utf-8", "replace")).get("Requires-Python")
+    return {"requires_python": requires_python, "metadata_sha256": metadata_sha256}
+
+
+def version_from_filename(filename):
+    """Extracts the version from a wheel ('name-version-...whl') or sdist ('name-version.tar.gz') filename."""
+    if filename.endswith(".whl"):
+        parts = filename.split("-")
+        return parts[1] if len(parts) >= 5 else None
+    stem = filename[:-len(".tar.gz")]
+    return stem.rsplit("-", 1)[1] if "-" in stem else None
+
+
+def legacy_directory_name(package_name):
+    """Directory name the workflows before PEP 503 normalization used: '_' replaced by '-', lowercased."""
+    return package_name.replace("_", "-").lower()
+
+
+def legacy_package_dirs(index_root, project):
+    """Existing directories of the index root that normalize to 'project' without being its normalized form."""
+    try:
+        names = os.listdir(index_root)
+    except OSError:
+        return []
+    return sorted(
+        name for name in names
+        if name != project and normalize_name(name) == project and os.path.isdir(os.path.join(index_root, name))
+    )
+
+
+def migrate_legacy_dirs(index_root, project):
+    """
+    Moves a package's legacy directories (e.g. 'my.pkg/' from before PEP 503 normalization) into its
+    normalized directory, so earlier releases stay listed. A lone legacy directory is renamed; otherwise
+    its distributions, sidecars and digest cache entries are merged in and the rest (old pages) is dropped.
+    Returns the migrated directory names.
+    """
+    package_dir = os.path.join(index_root, project)
+    legacy_dirs = legacy_package_dirs(index_root, project)
+    for name in legacy_dirs:
+        legacy_dir = os.path.join(index_root, name)
+        if not os.path.exists(package_dir):
+            os.rename(legacy_dir, package_dir)
+            continue
+        cache = load_digest_cache(package_dir)
+        legacy_cache = load_digest_cache(legacy_dir)
+        for filename in list_distributions(legacy_dir):
+            if os.path.exists(os.path.join(package_dir, filename)):
+                continue
+            for moved in (filename, filename + METADATA_SUFFIX):
+                if os.path.exists(os.path.join(legacy_dir, moved)):
+                    os.replace(os.path.join(legacy_dir, moved), os.path.join(package_dir, moved))
+            if filename in legacy_cache:
+                cache[filename] = legacy_cache[filename]
+        save_digest_cache(package_dir, cache)
+        shutil.rmtree(legacy_dir)
+    return legacy_dirs
+
+
+def list_distributions(package_dir):
+    """Returns the sorted distribution filenames (.whl/.tar.gz) in a package directory."""
+    if not os.path.isdir(package_dir):
+        return []
+    return sorted(name for name in os.listdir(package_dir) if name.endswith(DIST_EXTENSIONS))
+
+
+def write_simple_page(path, title, links):
+    """
+    Streams a PEP 503 page to 'path'. 'links' is an iterable of (href, text, attributes) tuples,
+    written one anchor per line as they are produced; all values are HTML-escaped.
+    """
+    title = html.escape(title)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"<!DOCTYPE html>\n<html>\n<head>\n<meta name=\"pypi:repository-version\" content=\"1.0\">\n<title>{title}</title>\n</head>\n<body>\n<h1>{title}</h1>\n")
+        for href, text, attributes in links:
+            extra = "".join(f' {name}="{html.escape(str(value))}"' for name, value in (attributes or {}).items())
+            f.write(f'<a href="{html.escape(href)}"{extra}>{html.escape(text)}</a><br>\n')
+        f.write("</body>\n</html>\n")
+
+
+class _HrefCollector(HTMLParser):
+    """Collects the href of every anchor in a page."""
+
+    def __init__(self):
+        super().__init__()
+        self.hrefs = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            href = dict(attrs).get("href")
+            if href:
+                self.hrefs.append(href)
+
+
+def read_links(path):
+    """Returns the anchor hrefs of an existing HTML page, or an empty list if it doesn't exist."""
+    collector = _HrefCollector()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            collector.feed(f.read())
+    except FileNotFoundError:
+        return []
+    return collector.hrefs
+
+
+def link_attributes(entry):
+    """PEP 503 data attributes for a file's anchor."""
+    attributes = {}
+    if entry.get("requires_python"):
+        attributes["data-requires-python"] = entry["requires_python"]
+    if entry.get("metadata_sha256"):
+        # PEP 714 renamed the attribute; the old name is kept for older pip versions
+        attributes["data-dist-info-metadata"] = f"sha256={entry['metadata_sha256']}"
+        attributes["data-core-metadata"] = f"sha256={entry['metadata_sha256']}"
+    if entry.get("yanked"):
+        attributes["data-yanked"] = entry["yanked"]
+    return attributes
+
+
+def file_url(filename, entry):
+    """URL of a distribution: the release asset URL for remote entries, otherwise relative to the page."""
+    return entry.get("url") or quote(filename)
+
+
+def write_package_index(package_dir, package_name, entries):
+    """Regenerates '<package>/index.html' with one '#sha256=' link per distribution file."""
+    package_index_html_path = os.path.join(package_dir, "index.html")
+    write_simple_page(
+        package_index_html_path,
+        f"Links for {package_name}",
+        ((f"{file_url(filename, entry)}#sha256={entry['sha256']}", filename, link_attributes(entry)) for filename, entry in entries.items())
+    )
+    return package_index_html_path
+
+
+def write_json(path, document):
+    """Writes a JSON document compactly; key order follows the document, so output is deterministic."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(document, f, separators=(",", ":"))
+        f.write("\n")
+
+
+def file_json(filename, entry):
+    """PEP 691 file entry for one distribution."""
+    document = {
+        "filename": filename,
+        "url": file_url(filename, entry),
+        "hashes": {"sha256": entry["sha256"]},
+    }
+    if entry.get("requires_python"):
+        document["requires-python"] = entry["requires_python"]
+    if entry.get("metadata_sha256"):
+        document["core-metadata"] = {"sha256": entry["metadata_sha256"]}
+        document["dist-info-metadata"] = {"sha256": entry["metadata_sha256"]}
+    document["size"] = entry["size"]
+    if entry.get("upload_time"):
+        document["upload-time"] = entry["upload_time"]
+    document["yanked"] = entry.get("yanked") or False
+    return document
+
+
+def write_package_json(package_dir, project, entries):
+    """Writes '<package>/index.json' in the PEP 691 JSON format (API version 1.1, with PEP 700 fields)."""
+    versions = sorted({version for version in map(version_from_filename, entries) if version})
+    write_json(os.path.join(package_dir, "index.json"), {
+        "meta": {"api-version": SIMPLE_API_VERSION},
+        "name": project,
+        "versions": versions,
+        "files": [file_json(filename, entry) for filename, entry in entries.items()],
+    })
+
+
+def utc_timestamp():
+    """Current UTC time as an ISO 8601 string with a 'Z' suffix."""
+    return datetime.now(timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z")
+
+
+def load_root_manifest(index_root):
+    """
+    Loads the root manifest as {normalized name: {"name", "last_updated", "files"}}.
+    If there is no manifest yet, it is seeded once from the links of an existing root index.html;
+    files are counted in the directory a link points to, which may still be a legacy (unnormalized) one.
+    """
+    try:
+        with open(os.path.join(index_root, ROOT_MANIFEST_FILENAME), "r") as f:
+            manifest = json.load(f)
+        if isinstance(manifest, dict) and manifest.get("version") == ROOT_MANIFEST_VERSION:
+            return manifest.get("projects", {})
+    except (OSError, ValueError):
+        pass
+
+    projects = {}
+    for href in read_links(os.path.join(index_root, "index.html")):
+        name = href.split("#", 1)[0].strip("/")
+        if name and "/" not in name:
+            project = normalize_name(name)
+            directory = name if os.path.isdir(os.path.join(index_root, name)) else project
+            projects.setdefault(project, {
+                "name": name,
+                "last_updated": None,
+                "files": len(list_distributions(os.path.join(index_root, directory))),
+            })
+    return projects
+
+
+def save_root_manifest(index_root, projects):
+    """Writes the root manifest in a stable order."""
+    manifest = {"version": ROOT_MANIFEST_VERSION, "projects": projects}
+    with open(os.path.join(index_root, ROOT_MANIFEST_FILENAME), "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+        f.write("\n")
+
+
+def write_root_index(index_root, projects):
+    """Renders the root 'index.html' and PEP 691 'index.json' from the manifest, sorted by normalized name."""
+    write_simple_page(
+        os.path.join(index_root, "index.html"),
+        "Simple Index",
+        ((f"{project}/", projects[project]["name"], None) for project in sorted(projects))
+    )
+    write_json(os.path.join(index_root, "index.json"), {
+        "meta": {"api-version": SIMPLE_API_VERSION},
+        "projects": [{"name": projects[project]["name"]} for project in sorted(projects)],
+    })
+
+
+def update_root_index(index_root, package_name, file_count):
+    """
+    Records the package in the root manifest and re-renders the root 'index.html' when the set of
+    projects changed. Returns True if the package was new to the index.
+    """
+    projects = load_root_manifest(index_root)
+    project = normalize_name(package_name)
+    is_new = project not in projects
+    previous_name = None if is_new else projects[project]["name"]
+    projects[project] = {"name": package_name, "last_updated": utc_timestamp(), "files": file_count}
+    save_root_manifest(index_root, projects)
+    if is_new or previous_name != package_name or not all(
+        os.path.exists(os.path.join(index_root, page)) for page in ("index.html", "index.json")
+    ):
+        write_root_index(index_root, projects)
+    return is_new
+
+
+def git_blob_ids(directory):
+    """
+    Returns {filename: blob id} for files directly in 'directory' that are tracked by git and unmodified.
+    Returns None when git is unavailable or the directory is not inside a work tree.
+    """
+    def git(*args):
+        result = subprocess.run(["git", *args], cwd=directory, capture_output=True, check=True)
+        return [entry for entry in result.stdout.decode("utf-8", "surrogateescape").split("\0") if entry]
+
+    try:
+        staged = git("ls-files", "--stage", "-z", "--", ".")
+        modified = set(git("ls-files", "--modified", "-z", "--", "."))
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    blob_ids = {}
+    for entry in staged:
+        info, path = entry.split("\t", 1)
+        if "/" not in path and path not in modified:
+            blob_ids[path] = info.split()[1]
+    return blob_ids
+
+
+def load_digest_cache(package_dir):
+    """Loads '<package>/.digests.json'. A missing, unreadable or outdated cache yields an empty one."""
+    try:
+        with open(os.path.join(package_dir, DIGEST_CACHE_FILENAME), "r") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get("version") != DIGEST_CACHE_VERSION:
+        return {}
+    return cache.get("files", {})
+
+
+def save_digest_cache(package_dir, entries):
+    """Writes the digest cache in a stable order so unchanged caches produce no git diff."""
+    cache = {"version": DIGEST_CACHE_VERSION, "files": entries}
+    with open(os.path.join(package_dir, DIGEST_CACHE_FILENAME), "w") as f:
+        json.dump(cache, f, indent=1, sort_keys=True)
+        f.write("\n")
+
+
+def is_cache_entry_current(entry, size, blob_id, mtime_ns):
+    """A cached digest is reused only if the size matches and the git blob id (or, outside git, the mtime) does too."""
+    if not isinstance(entry, dict) or not entry.get("sha256") or entry.get("size") != size:
+        return False
+    if blob_id:
+        return entry.get("blob") == blob_id
+    return entry.get("mtime_ns") == mtime_ns
+
+
+def needs_metadata_extraction(package_dir, filename, entry):
+    """True if the cache entry has no extracted metadata yet, or a wheel's '.metadata' sidecar is missing."""
+    if "requires_python" not in entry or "metadata_sha256" not in entry:
+        return True
+    return bool(entry["metadata_sha256"]) and not os.path.exists(os.path.join(package_dir, filename + METADATA_SUFFIX))
+
+
+def refresh_digests(package_dir, filenames, workers=None):
+    """
+    Returns ({filename: cache entry}, stats), hashing only files that are new or changed since the cached run.
+    New files also get their core metadata extracted and their upload time recorded.
+    Entries of remote artifacts (with a 'url', see ingest_remote_dists) are kept as they are.
+    Cache entries and '.metadata' sidecars of local files that no longer exist are pruned.
+    """
+    cached = load_digest_cache(package_dir)
+    blob_ids = git_blob_ids(package_dir)
+    in_git = blob_ids is not None
+    blob_ids = blob_ids or {}
+    entries = {}
+    to_hash = []
+    for filename in filenames:
+        stat = os.stat(os.path.join(package_dir, filename))
+        entry = cached.get(filename)
+        if is_cache_entry_current(entry, stat.st_size, blob_ids.get(filename), stat.st_mtime_ns):
+            entries[filename] = entry
+        else:
+            to_hash.append((filename, stat))
+
+    hashed = hash_files([os.path.join(package_dir, name) for name, _ in to_hash], workers=workers, hasher=digest_file)
+    now = utc_timestamp()
+    for filename, stat in to_hash:
+        sha256_hash, blob_id = hashed[os.path.join(package_dir, filename)]
+        previous = cached.get(filename) or {}
+        entry = {"sha256": sha256_hash, "size": stat.st_size, "blob": blob_id, "upload_time": previous.get("upload_time") or now}
+        if not in_git:
+            entry["mtime_ns"] = stat.st_mtime_ns # Outside git the mtime is the only cheap change signal
+        entries[filename] = entry
+
+    # Metadata is extracted once per artifact; older cache entries and missing sidecars are filled in here
+    needs_metadata = [name for name in filenames if needs_metadata_extraction(package_dir, name, entries[name])]
+    extracted = map_files(extract_metadata, [os.path.join(package_dir, name) for name in needs_metadata], workers=workers)
+    for filename in needs_metadata:
+        entries[filename] = dict(entries[filename], **extracted[os.path.join(package_dir, filename)])
+
+    for filename, entry in cached.items():
+        if filename not in entries and entry.get("url"):
+            entries[filename] = entry
+
+    pruned = set(cached) - set(entries)
+    for filename in pruned:
+        sidecar_path = os.path.join(package_dir, filename + METADATA_SUFFIX)
+        if os.path.exists(sidecar_path):
+            os.remove(sidecar_path)
+
+    stats = {
+        "files": len(entries),
+        "hashed": len(to_hash),
+        "cached": len(filenames) - len(to_hash),
+        "bytes_hashed": sum(stat.st_size for _, stat in to_hash),
+        "pruned": len(pruned),
+    }
+    if entries != cached:
+        save_digest_cache(package_dir, entries)
+    return {name: entries[name] for name in sorted(entries)}, stats
+
+
+def copy_dists(dist_dir, package_dir):
+    """Copies the built distributions into the package directory. Returns the copied filenames."""
+    filenames = list_distributions(dist_dir)
+    for filename in filenames:
+        shutil.copy2(os.path.join(dist_dir, filename), os.path.join(package_dir, filename))
+    return filenames
+
+
+def write_metadata_sidecars(dist_dir, workers=None):
+    """Writes the '.metadata' sidecars of the wheels in 'dist_dir' (for uploading them as release assets)."""
+    map_files(extract_metadata, [os.path.join(dist_dir, name) for name in list_distributions(dist_dir)], workers=workers)
+
+
+def ingest_remote_dists(package_dir, dist_dir, url_base, workers=None):
+    """
+    Records distributions that are hosted elsewhere (e.g. as GitHub release assets under 'url_base')
+    in the digest cache, without copying them into the index. Wheel '.metadata' sidecars are written
+    next to the distributions in 'dist_dir', since resolvers fetch them from '<file url>.metadata';
+    they have to be uploaded together with the distributions. Returns (files hashed, bytes hashed).
+    """
+    filenames = list_distributions(dist_dir)
+    paths = [os.path.join(dist_dir, name) for name in filenames]
+    hashed = hash_files(paths, workers=workers)
+    extracted = map_files(extract_metadata, paths, workers=workers)
+
+    entries = load_digest_cache(package_dir)
+    now = utc_timestamp()
+    for filename, path in zip(filenames, paths):
+        previous = entries.get(filename) or {}
+        entries[filename] = {
+            "sha256": hashed[path],
+            "size": os.path.getsize(path),
+            "upload_time": previous.get("upload_time") or now,
+            "url": f"{url_base.rstrip('/')}/{quote(filename)}",
+            **extracted[path],
+        }
+    save_digest_cache(package_dir, entries)
+    return len(paths), sum(os.path.getsize(path) for path in paths)
+
+
+def local_size(package_dir, filename):
+    """Size of a file in the package directory, or 0 if it isn't stored there (e.g. remote artifacts)."""
+    try:
+        return os.path.getsize(os.path.join(package_dir, filename))
+    except OSError:
+        return 0
+
+
+def apply_retention(package_dir, entries, policy, dry_run=False):
+    """
+    Prunes the versions the retention policy removes: their files are deleted (local files together
+    with their '.metadata' sidecars, remote entries are only unlisted) or, with 'yank', marked as yanked.
+    Returns (remaining entries, report); with dry_run nothing is changed.
+    """
+    versions = {}
+    for filename, entry in entries.items():
+        version = version_from_filename(filename)
+        if version is None:
+            continue
+        published = entry.get("upload_time")
+        if version not in versions or (published and (versions[version] is None or published < versions[version])):
+            versions[version] = published
+
+    pruned_versions = select_pruned_versions(versions, policy)
+    pruned_files = [name for name in entries if version_from_filename(name) in pruned_versions]
+    if policy["yank"]:
+        pruned_files = [name for name in pruned_files if not entries[name].get("yanked")]
+    report = {
+        "versions": sorted(pruned_versions),
+        "files": len(pruned_files),
+        "action": "yank" if policy["yank"] else "delete",
+        "bytes_reclaimable": 0 if policy["yank"] else sum(
+            local_size(package_dir, name) + local_size(package_dir, name + METADATA_SUFFIX) for name in pruned_files
+        ),
+        "dry_run": dry_run,
+    }
+    if dry_run or not pruned_files:
+        return entries, report
+
+    entries = dict(entries)
+    for filename in pruned_files:
+        if policy["yank"]:
+            entries[filename] = dict(entries[filename], yanked=YANK_REASON)
+            continue
+        for path in (os.path.join(package_dir, filename), os.path.join(package_dir, filename + METADATA_SUFFIX)):
+            if os.path.exists(path):
+                os.remove(path)
+        del entries[filename]
+    save_digest_cache(package_dir, entries)
+    return entries, report
+
+
+def update_index(index_root, package_name, dist_dir=None, url_base=None, retention=None, dry_run=False, workers=None, metrics=None):
+    """
+    Refreshes the package's digests, rewrites its index pages and records it in the root index.
+    'package_name' may be given in any form; the package directory is its PEP 503 normalized name,
+    and legacy directories of the package (see migrate_legacy_dirs) are moved into it first.
+    With 'dist_dir' the new distributions are copied into the package directory first, or, with
+    'url_base', recorded as remote files at '<url_base>/<filename>' and not copied at all.
+    'retention' is a policy string (see retention.py); with dry_run the retention report is printed
+    and no pages are written.
+    Phase timings and file counters are added to 'metrics' (a metrics.Metrics) when given.
+    Returns the refresh statistics, or None if there is nothing to index.
+    """
+    metrics = metrics or Metrics()
+    package_dir = os.path.join(index_root, normalize_name(package_name))
+    if not dry_run:
+        for legacy_name in migrate_legacy_dirs(index_root, normalize_name(package_name)):
+            print(f"Moved the legacy directory '{legacy_name}/' into '{normalize_name(package_name)}/'")
+    elif not os.path.isdir(package_dir) and legacy_package_dirs(index_root, normalize_name(package_name)):
+        package_dir = os.path.join(index_root, legacy_package_dirs(index_root, normalize_name(package_name))[0])
+    remote_hashed, remote_bytes_hashed = 0, 0
+    if dist_dir:
+        os.makedirs(package_dir, exist_ok=True)
+        with metrics.phase("ingest"):
+            if url_base:
+                remote_hashed, remote_bytes_hashed = ingest_remote_dists(package_dir, dist_dir, url_base, workers=workers)
+            else:
+                copy_dists(dist_dir, package_dir)
+    if not os.path.isdir(package_dir):
+        print(f"Warning: Package directory '{package_dir}' not found within index repo. Skipping package index creation.")
+        return None
+
+    with metrics.phase("hash"):
+        entries, stats = refresh_digests(package_dir, list_distributions(package_dir), workers=workers)
+    stats["hashed"] += remote_hashed
+    stats["bytes_hashed"] += remote_bytes_hashed
+    metrics.count("files_scanned", stats["hashed"] + stats["cached"])
+    metrics.count("files_hashed", stats["hashed"])
+    metrics.count("files_cached", stats["cached"])
+    metrics.count("bytes_read", stats["bytes_hashed"])
+    print(f"Hashed {stats['hashed']} file(s) ({stats['bytes_hashed']} bytes), reused {stats['cached']} cached digest(s), pruned {stats['pruned']} stale entr{'y' if stats['pruned'] == 1 else 'ies'}.")
+
+    if retention:
+        with metrics.phase("retention"):
+            entries, report = apply_retention(package_dir, entries, parse_policy(retention), dry_run=dry_run)
+        stats["retention"] = report
+        metrics.count("files_pruned", report["files"])
+        verb = "Would" if dry_run else "Did"
+        print(f"Retention ({retention}): {verb} {report['action']} {report['files']} file(s) of {len(report['versions'])} version(s), {report['bytes_reclaimable']} bytes reclaimable.")
+        if report["versions"]:
+            print(f"  Versions: {', '.join(report['versions'])}")
+    if dry_run:
+        return stats
+
+    with metrics.phase("render"):
+        package_index_html_path = write_package_index(package_dir, package_name, entries)
+        write_package_json(package_dir, normalize_name(package_name), entries)
+        is_new = update_root_index(index_root, package_name, len(entries))
+    print(f"Successfully updated {package_index_html_path} and index.json ({len(entries)} file(s))")
+
+    if is_new:
+        print(f"Added new link for {package_name} to the root index.html")
+    else:
+        print(f"Link for {package_name} already exists in the root index.html. Updated its manifest entry.")
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m py_toml_builder.index", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("package", help="Package name as in pyproject.toml; its PEP 503 normalized form is the directory inside the index repository.")
+    parser.add_argument("--root", default=".", help="Path to the index repository checkout (default: current directory).")
+    parser.add_argument("--dist", default=None, help="Directory with the newly built distributions to add (e.g. 'dist').")
+    parser.add_argument("--url-base", default=None, help="Don't copy the distributions from --dist; link them at '<URL_BASE>/<filename>' (e.g. release assets). Their .metadata sidecars are written into --dist for upload.")
+    parser.add_argument("--retention", default=None, help="Retention policy, e.g. 'keep-last=10,keep-latest-patch,yank' (see retention.py).")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what the retention policy would prune; no index pages are written.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of hashing threads.")
+    parser.add_argument("--metrics", default=None, help="Merge phase timings and counters into this JSON file (see metrics.py).")
+    args = parser.parse_args(argv)
+    if args.url_base and not args.dist:
+        parser.error("--url-base requires --dist")
+    if args.dry_run and args.dist:
+        parser.error("--dry-run can't be combined with --dist")
+    if args.retention:
+        try:
+            parse_policy(args.retention)
+        except ValueError as e:
+            parser.error(f"--retention: {e}")
+
+    print(f"Processing package: {args.package}")
+    metrics = Metrics()
+    stats = update_index(args.root, args.package, dist_dir=args.dist, url_base=args.url_base,
+                         retention=args.retention, dry_run=args.dry_run, workers=args.workers, metrics=metrics)
+    if args.metrics:
+        metrics.write_json(args.metrics)
+    return 0 if stats is not None else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,20 @@
 import os
 import sys
 import re
+import json
+import argparse
+import importlib
+
+try:
+    from .validation import (
+        is_valid_project_name, is_valid_email, is_valid_version, is_valid_github_url, is_valid_script_name, is_valid_entry_point,
+    )
+    from .retention import parse_policy
+except ImportError:
+    from validation import (
+        is_valid_project_name, is_valid_email, is_valid_version, is_valid_github_url, is_valid_script_name, is_valid_entry_point,
+    )
+    from retention import parse_policy
 
 # --- ANSI Color Codes ---
 COLOR_RESET = "\033[0m"
@@ -11,28 +25,61 @@ COLOR_MAGENTA = "\033[95m"
 COLOR_CYAN = "\033[96m"
 COLOR_RED = "\033[91m"
 
-# --- Validation Functions ---
-def is_valid_email(email):
-    """Basic validation for email format."""
-    return re.match(r"[^@]+@[^@]+\.[^@]+", email)
+# --- Generated File Locations ---
+PYPROJECT_PATH = "pyproject.toml"
+WORKFLOW_DIR = os.path.join(".github", "workflows")
+WORKFLOW_PATH = os.path.join(WORKFLOW_DIR, "publish_to_pypi_pages.yml")
+
+# Version of this tool; the release tag 'v<VERSION>' is what generated workflows install
+VERSION = "0.2.0"
+
+# Installed by the generated workflow to provide 'python -m py_toml_builder.index'. Pinned to the
+# release tag of the version that generated the workflow, so a downstream release never picks up main
+INDEX_BUILDER_REQUIREMENT = f"py-toml-builder @ git+https://github.com/tugapse/py-toml-builder@v{VERSION}"
+
+# Where the generated workflow stores built distributions (see generate_workflow_yml)
+ARTIFACT_STORAGE_CHOICES = ("index", "release")
+
+# Workflow profiles (see generate_setup_steps)
+WORKFLOW_PROFILE_CHOICES = ("standard", "fast")
 
-def is_valid_version(version):
-    """Basic validation for semantic versioning (X.Y.Z, X.Y.Z-pre.N, etc.)."""
-    return re.match(r"^\d+\.\d+\.\d+(?:[-_][a-zA-Z0-9.]+)?$", version)
+# Phase timings and counters of a workflow run accumulate here (see metrics.py)
+WORKFLOW_METRICS_FILE = "$RUNNER_TEMP/release-metrics.json"
+WORKFLOW_METRICS_COMMAND = f'python -m py_toml_builder.metrics --file "{WORKFLOW_METRICS_FILE}"'
 
-def is_valid_github_url(url):
-    """Basic validation for GitHub repository URL format."""
-    return re.match(r"^https://github\.com/[a-zA-Z0-9_-]+/[a-zA-Z0-9_.-]+/?$", url)
+# Keys that may be written without quotes in TOML
+TOML_BARE_KEY_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+# --- Validation Functions ---
+# Email, PEP 440 version, GitHub URL and command name checks are validation.py's own functions
+def is_valid_package_name(name):
+    """Validates a project name as defined by PEP 508 (letters, digits, '.', '_' and '-')."""
+    return is_valid_project_name(name)
 
 def is_valid_python_entrypoint_reference(ref):
     """
     Validates if a string is a valid Python entry point reference.
     Format: importable.module:object.attr
     """
-    # Requires at least one colon. Parts can contain alphanumeric, underscore, dot.
-    # Starts with a letter or underscore, followed by alphanumeric, underscore, dot.
-    # Colon separates module path from object/function name.
-    return re.match(r"^[a-zA-Z_][a-zA-Z0-9_.]*:[a-zA-Z_][a-zA-Z0-9_.]*$", ref)
+    return is_valid_entry_point(ref)
+
+
+def is_valid_retention_policy(spec):
+    """Validates a retention policy such as 'keep-last=10,keep-latest-patch,yank'."""
+    try:
+        parse_policy(spec)
+    except ValueError:
+        return False
+    return True
+
+
+def is_valid_matrix_spec(spec):
+    """Validates build matrix axes such as 'python-version=3.11,3.12;os=ubuntu-latest,windows-latest'."""
+    try:
+        parse_matrix_axes(spec)
+    except ValueError:
+        return False
+    return True
 
 
 def get_input_with_env_default(prompt_text, env_var_name, description, clarification_text=None, mandatory=False, validator=None):
@@ -90,20 +137,28 @@ def get_mandatory_input(prompt_text, clarification_text=None, validator=None):
         else:
             return value
 
+def toml_string(value):
+    """Renders a TOML basic string (JSON string escapes are valid TOML)."""
+    return json.dumps(value, ensure_ascii=False)
+
+def toml_key(key, quoted=False):
+    """Renders a TOML key, bare if possible unless 'quoted' is set."""
+    return key if not quoted and TOML_BARE_KEY_PATTERN.match(key) else toml_string(key)
+
 def generate_pyproject_toml(package_name, package_version, your_name, your_email, short_description, package_github_url, cli_command_name=None, cli_entry_point=None):
-    """Generates the content for pyproject.toml."""
+    """Generates the content for pyproject.toml. Values are rendered as escaped TOML strings."""
     pyproject_content = f"""
 [build-system]
 requires = ["setuptools>=61.0"]
 build-backend = "setuptools.build_meta"
 
 [project]
-name = "{package_name}"
-version = "{package_version}"
+name = {toml_string(package_name)}
+version = {toml_string(package_version)}
 authors = [
-  {{ name="{your_name}", email="{your_email}" }},
+  {{ name={toml_string(your_name)}, email={toml_string(your_email)} }},
 ]
-description = "{short_description}"
+description = {toml_string(short_description)}
 readme = "README.md"
 
 # Optional: Define minimum Python version, classifiers, and dependencies.
@@ -136,33 +191,41 @@ readme = "README.md"
     if cli_command_name and cli_entry_point:
         pyproject_content += f"""
 [project.scripts]
-{cli_command_name} = "{cli_entry_point}"
+{toml_key(cli_command_name)} = {toml_string(cli_entry_point)}
 """
 
     pyproject_content += f"""
 [project.urls]
-"Homepage" = "{package_github_url}"
-"Bug Tracker" = "{package_github_url}/issues"
+"Homepage" = {toml_string(package_github_url)}
+"Bug Tracker" = {toml_string(package_github_url + "/issues")}
 """
     return pyproject_content.strip()
 
-def generate_workflow_yml(github_username, pypi_index_repo_name, pat_secret_name):
-    """Generates the content for the GitHub Actions workflow file."""
-    workflow_content = f"""
-name: Publish to GitHub Pages PyPI Index
-
-on:
-  release:
-    types: [published] # This workflow runs when a new GitHub Release is published
-  workflow_dispatch: # Allows manual triggering from GitHub Actions tab
-
-jobs:
-  build_and_publish:
-    runs-on: ubuntu-latest
-    permissions:
-      contents: write # Needed for actions/checkout and git push
-
-    steps:
+def generate_setup_steps(profile="standard", full_history=None, python_version="3.12", build_target=None, install_index_builder=True, build_source=None):
+    """
+    Generates the checkout, tool installation and build steps for a workflow profile.
+    'standard' uses a full clone and a cold pip install; 'fast' clones shallowly (unless
+    full_history is set, e.g. for setuptools-scm), caches downloads and build environments
+    keyed on pyproject.toml and builds with uv.
+    build_target: None builds sdist and wheel, 'wheel' or 'sdist' builds only that one.
+    python_version may be a version or a workflow expression such as '${{ matrix.python-version }}'.
+    With install_index_builder the build is timed as the 'build' phase of the release metrics.
+    build_source: directory of the package inside the repository (e.g. in a monorepo); the
+    distributions are still written to the top-level 'dist/'.
+    """
+    if profile not in WORKFLOW_PROFILE_CHOICES:
+        raise ValueError(f"Unknown workflow profile '{profile}' (expected one of {', '.join(WORKFLOW_PROFILE_CHOICES)}).")
+
+    python_version_line = f"'{python_version}' # Use a specific Python version, e.g., '3.10'" if "${{" not in python_version else python_version
+    build_flag = f" --{build_target}" if build_target else ""
+    build_name = {None: "sdist and wheel", "wheel": "wheel", "sdist": "sdist"}[build_target]
+    index_builder = f' "{INDEX_BUILDER_REQUIREMENT}"' if install_index_builder else ""
+    timed = f"{WORKFLOW_METRICS_COMMAND} time build -- " if install_index_builder else ""
+    source = f' "{build_source}"' if build_source else ""
+    pyproject_glob = f"{build_source}/pyproject.toml" if build_source else "pyproject.toml"
+
+    if profile == "standard":
+        return f"""
       - name: Checkout Package Repository
         uses: actions/checkout@v4
         with:
@@ -172,16 +235,198 @@ jobs:
       - name: Set up Python
         uses: actions/setup-python@v5
         with:
-          python-version: '3.12' # Use a specific Python version, e.g., '3.10'
+          python-version: {python_version_line}
 
-      - name: Install build tools and HTML parser
+      - name: Install build tools{" and index builder" if install_index_builder else ""}
         run: |
-          pip install build twine wheel toml beautifulsoup4
+          pip install build wheel{index_builder}
 
-      - name: Build sdist and wheel
+      - name: Build {build_name}
         run: |
-          python -m build
+          {timed}python -m build{source}{" --outdir dist" if build_source else ""}{build_flag}
         # The built packages will be in the 'dist/' directory of the package repo
+"""
+
+    fetch_depth = "0 # Full history for the versioning plugin" if full_history else "1 # Shallow clone; the build doesn't need history"
+    install_step = f"""
+      - name: Install index builder
+        run: |
+          uv pip install --system{index_builder}
+""" if install_index_builder else ""
+    return f"""
+      - name: Checkout Package Repository
+        uses: actions/checkout@v4
+        with:
+          fetch-depth: {fetch_depth}
+
+      - name: Set up Python
+        uses: actions/setup-python@v5
+        with:
+          python-version: {python_version_line}
+
+      - name: Set up uv with a persistent cache
+        uses: astral-sh/setup-uv@v5
+        with:
+          # Caches downloaded wheels and the build-isolation environments between releases
+          enable-cache: true
+          cache-dependency-glob: "{pyproject_glob}"
+{install_step}
+      - name: Build {build_name}
+        run: |
+          {timed}uv build{source} --out-dir dist{build_flag}
+        # The built packages will be in the 'dist/' directory of the package repo
+"""
+
+def parse_matrix_axes(spec):
+    """
+    Parses build matrix axes written as 'python-version=3.11,3.12;os=ubuntu-latest,windows-latest'
+    into {axis: [values]}. Raises ValueError for malformed input.
+    """
+    axes = {}
+    for part in filter(None, (part.strip() for part in spec.split(";"))):
+        axis, separator, values = part.partition("=")
+        axis = axis.strip()
+        values = [value.strip() for value in values.split(",") if value.strip()]
+        if not separator or not re.match(r"^[A-Za-z_][A-Za-z0-9_-]*$", axis) or not values:
+            raise ValueError(f"Invalid matrix axis '{part}' (expected 'axis=value1,value2').")
+        if axis in axes:
+            raise ValueError(f"Duplicate matrix axis '{axis}'.")
+        axes[axis] = values
+    if not axes:
+        raise ValueError("The build matrix needs at least one axis.")
+    return axes
+
+def generate_matrix_build_job(matrix, profile="standard", full_history=None):
+    """
+    Generates a job that builds wheels in parallel for every combination of the matrix axes and
+    uploads each job's wheels as an artifact. 'os' selects the runner and 'python-version' the
+    interpreter; other axes are available to the build as 'matrix.<axis>'.
+    """
+    axes = "\n".join(f"        {axis}: [{', '.join(repr(str(value)) for value in values)}]" for axis, values in matrix.items())
+    runs_on = "${{ matrix.os }}" if "os" in matrix else "ubuntu-latest"
+    python_version = "${{ matrix.python-version }}" if "python-version" in matrix else "3.12"
+    steps = generate_setup_steps(profile, full_history, python_version=python_version, build_target="wheel", install_index_builder=False).strip("\n")
+    return f"""
+  build_wheels:
+    runs-on: {runs_on}
+    strategy:
+      fail-fast: true # A release is only indexed if every wheel builds
+      matrix:
+{axes}
+
+    steps:
+{steps}
+
+      - name: Upload wheels
+        uses: actions/upload-artifact@v4
+        with:
+          name: dist-${{{{ strategy.job-index }}}}
+          path: dist/*.whl
+          if-no-files-found: error
+"""
+
+def generate_publish_settings(artifact_storage="index", retention=None):
+    """
+    Returns (extra triggers, release asset upload step, publish.py options) for an artifact storage
+    mode and retention policy; shared by the single-package and monorepo workflows.
+    """
+    if artifact_storage not in ARTIFACT_STORAGE_CHOICES:
+        raise ValueError(f"Unknown artifact storage '{artifact_storage}' (expected one of {', '.join(ARTIFACT_STORAGE_CHOICES)}).")
+    if artifact_storage == "release":
+        trigger = """
+  workflow_dispatch: # Allows manual triggering from GitHub Actions tab
+    inputs:
+      tag:
+        description: 'Existing release tag whose assets should be (re)published'
+        required: true"""
+        upload_step = f"""
+      - name: Upload distributions as release assets
+        env:
+          GH_TOKEN: ${{{{ github.token }}}}
+        run: |
+          # Wheel .metadata sidecars are written into dist/ first, so they are uploaded next to the wheels
+          python -c "import sys; from py_toml_builder.index import write_metadata_sidecars; write_metadata_sidecars(sys.argv[1])" dist
+          {WORKFLOW_METRICS_COMMAND} time upload_assets -- gh release upload "${{{{ github.event.release.tag_name || inputs.tag }}}}" dist/* --clobber
+"""
+        publish_options = ' --url-base "https://github.com/${{ github.repository }}/releases/download/${{ github.event.release.tag_name || inputs.tag }}"'
+    else:
+        trigger = """
+  workflow_dispatch: # Allows manual triggering from GitHub Actions tab"""
+        upload_step = ""
+        publish_options = ""
+    if retention:
+        if not is_valid_retention_policy(retention):
+            raise ValueError(f"Invalid retention policy '{retention}'.")
+        publish_options += f' --retention "{retention}"'
+    return trigger, upload_step, publish_options
+
+def generate_workflow_yml(github_username, pypi_index_repo_name, pat_secret_name, artifact_storage="index", retention=None,
+                          profile="standard", full_history=None, matrix=None):
+    """
+    Generates the content for the GitHub Actions workflow file.
+    artifact_storage: 'index' commits the distributions into the index repository,
+    'release' uploads them as assets of the GitHub Release and the index only links to them.
+    retention: optional retention policy applied on every release, e.g. 'keep-last=10,yank'.
+    profile / full_history: see generate_setup_steps.
+    matrix: optional {axis: [values]}; wheels are then built in parallel by a matrix job and a single
+    fan-in job builds the sdist, collects all wheels and updates the index once.
+    """
+    if matrix:
+        build_job = generate_matrix_build_job(matrix, profile, full_history)
+        fan_in = """
+    needs: build_wheels"""
+        setup_steps = generate_setup_steps(profile, full_history, build_target="sdist").strip("\n") + """
+
+      - name: Download wheels from all matrix jobs
+        uses: actions/download-artifact@v4
+        with:
+          pattern: dist-*
+          path: dist
+          merge-multiple: true"""
+    else:
+        build_job = ""
+        fan_in = ""
+        setup_steps = generate_setup_steps(profile, full_history).strip("\n")
+    trigger, upload_step, publish_options = generate_publish_settings(artifact_storage, retention)
+
+    workflow_content = f"""
+name: Publish to GitHub Pages PyPI Index
+
+on:
+  release:
+    types: [published] # This workflow runs when a new GitHub Release is published{trigger}
+
+# Serializes releases of this package; releases of other packages into the same index
+# are handled by the retrying publish step
+concurrency:
+  group: pypi-index-{github_username}-{pypi_index_repo_name}-${{{{ github.repository }}}}
+  cancel-in-progress: false
+
+jobs:{build_job}
+  build_and_publish:{fan_in}
+    runs-on: ubuntu-latest
+    permissions:
+      contents: write # Needed for actions/checkout, release uploads and git push
+
+    steps:
+{setup_steps}
+
+      - name: Read package name
+        id: package
+        run: |
+          # Get the package name directly from pyproject.toml; the index directory is its normalized form
+          # ('legacy' is the directory older workflows used; the index builder moves it on the next release)
+          python - <<'EOF' >> "$GITHUB_OUTPUT"
+          import tomllib
+          from py_toml_builder.index import normalize_name, legacy_directory_name
+          name = tomllib.load(open("pyproject.toml", "rb"))["project"]["name"]
+          print(f"name={{name}}")
+          print(f"normalized={{normalize_name(name)}}")
+          print(f"legacy={{legacy_directory_name(name)}}")
+          EOF
+{upload_step}
+      - name: Start timing the index checkout
+        run: {WORKFLOW_METRICS_COMMAND} start clone_index
 
       - name: Checkout PyPI Index Repository
         uses: actions/checkout@v4
@@ -189,114 +434,284 @@ jobs:
           repository: {github_username}/{pypi_index_repo_name}
           path: my-python-index-repo # Local path to clone the index repo
           token: ${{{{ secrets.{pat_secret_name} }}}}
+          # Only this package's directory and the root index files are checked out
+          filter: blob:none
+          sparse-checkout: |
+            ${{{{ steps.package.outputs.normalized }}}}
+            ${{{{ steps.package.outputs.legacy }}}}
+          sparse-checkout-cone-mode: true
+
+      - name: Update and push PyPI Index
+        run: |
+          {WORKFLOW_METRICS_COMMAND} stop clone_index
+          echo "Processing package: ${{{{ steps.package.outputs.name }}}}"
+          cd my-python-index-repo
+          git config user.email "github-actions[bot]@users.noreply.github.com"
+          git config user.name "github-actions[bot]"
+          # Retryable transaction: on a rejected push, rebase onto the latest index, redo this package's update and push again
+          python -m py_toml_builder.publish "${{{{ steps.package.outputs.name }}}}" --dist ../dist{publish_options} \\
+            --metrics "{WORKFLOW_METRICS_FILE}" \\
+            --message "Auto-update PyPI index for ${{{{ github.event.repository.name }}}} ${{{{ github.event.release.tag_name || inputs.tag || 'latest' }}}} [skip ci]"
 
-      - name: Copy dists and Update PyPI Index HTML Files
+      - name: Report release metrics
+        if: always()
         run: |
-          # Get the package name directly from the original pyproject.toml
-          # The original repo is one directory level up from 'my-python-index-repo'
-          PACKAGE_NAME_RAW=$(python -c "import toml; print(toml.load('./pyproject.toml')['project']['name'])")
-          PACKAGE_NAME=$(echo "$PACKAGE_NAME_RAW" | tr '_' '-' | tr '[:upper:]' '[:lower:]')
-          export PACKAGE_NAME # Make it available as an environment variable for the Python script
+          # Per-phase timings and counters (files hashed vs. cached, bytes read, push retries) go to the job summary
+          {WORKFLOW_METRICS_COMMAND} summary
+
+      - name: Upload release metrics
+        if: always()
+        uses: actions/upload-artifact@v4
+        with:
+          name: release-metrics
+          path: ${{{{ runner.temp }}}}/release-metrics.json
+          if-no-files-found: ignore
+"""
+    return workflow_content.strip()
+
+def generate_monorepo_workflow_yml(github_username, pypi_index_repo_name, pat_secret_name, artifact_storage="index", retention=None,
+                                   profile="standard", full_history=None):
+    """
+    Generates the workflow for a repository with many packages (see monorepo.py). A 'detect' job
+    lists the packages whose directory changed since their last '<name>-v<version>' tag; a matrix
+    job then builds and indexes only those, in parallel, and tags each released version.
+    Unchanged packages cost one tree-id lookup. Other settings as in generate_workflow_yml.
+    """
+    trigger, upload_step, publish_options = generate_publish_settings(artifact_storage, retention)
+    setup_steps = generate_setup_steps(profile, full_history, build_source="${{ matrix.package.path }}").strip("\n")
 
-          echo "Processing package: $PACKAGE_NAME"
+    workflow_content = f"""
+name: Publish changed packages to GitHub Pages PyPI Index
 
-          # Create package-specific directory in the index repo
-          mkdir -p my-python-index-repo/$PACKAGE_NAME
+on:
+  release:
+    types: [published] # This workflow runs when a new GitHub Release is published{trigger}
 
-          # Copy built distribution files into the package-specific directory
-          cp dist/* my-python-index-repo/$PACKAGE_NAME/
+# Serializes releases of this repository; the packages of one release are published in parallel and
+# concurrent writers to the same index are handled by the retrying publish step
+concurrency:
+  group: pypi-index-{github_username}-{pypi_index_repo_name}-${{{{ github.repository }}}}
+  cancel-in-progress: false
 
-          # Navigate into the cloned index repo to perform HTML updates
-          cd my-python-index-repo
+jobs:
+  detect:
+    runs-on: ubuntu-latest
+    outputs:
+      packages: ${{{{ steps.detect.outputs.packages }}}}
+      any: ${{{{ steps.detect.outputs.any }}}}
 
-          # Execute Python script to handle HTML updates
-          python - <<EOF
-          import os
-          import hashlib
-          from bs4 import BeautifulSoup
-          import sys
-
-          # PACKAGE_NAME is now available as a shell variable, passed into the script
-          PACKAGE_NAME = os.environ.get("PACKAGE_NAME")
-          if not PACKAGE_NAME:
-              print("Error: PACKAGE_NAME environment variable is not set for the Python script.")
-              sys.exit(1)
-
-          print(f"Python script processing for package: {{PACKAGE_NAME}}")
-
-          # --- Handle package-specific index.html ---
-          package_dir_path = PACKAGE_NAME # Relative path within my-python-index-repo
-          package_index_html_path = os.path.join(package_dir_path, "index.html")
-
-          # Always regenerate the package's index.html to ensure it's up-to-date with current dist files
-          html_content = f\"\"\"
-          <!DOCTYPE html>
-          <html>
-          <head>
-              <title>Links for {{PACKAGE_NAME}}</title>
-          </head>
-          <body>
-              <h1>Links for {{PACKAGE_NAME}}</h1>
-          </body>
-          </html>
-          \"\"\"
-          soup = BeautifulSoup(html_content, 'html.parser')
-          body = soup.find('body')
-
-          if os.path.exists(package_dir_path):
-              for filename in sorted(os.listdir(package_dir_path)):
-                  if filename.endswith(('.whl', '.tar.gz')):
-                      filepath = os.path.join(package_dir_path, filename)
-                      with open(filepath, 'rb') as f:
-                          sha256_hash = hashlib.sha256(f.read()).hexdigest()
-                      link = soup.new_tag("a", href=f"{{filename}}#sha256={{sha256_hash}}")
-                      link.string = filename
-                      body.append(link)
-                      body.append(soup.new_tag("br"))
-          else:
-              print(f"Warning: Package directory '{{package_dir_path}}' not found within index repo. Skipping package index creation.")
-
-          with open(package_index_html_path, "w") as f:
-              f.write(str(soup))
-          print(f"Successfully updated {{package_index_html_path}}")
-
-          # --- Update the root index.html ---
-          root_index_path = "index.html"
-          root_soup = None
-          if os.path.exists(root_index_path):
-              with open(root_index_path, "r") as f:
-                  root_soup = BeautifulSoup(f, 'html.parser')
-          else:
-              root_soup = BeautifulSoup("<!DOCTYPE html><html><head><title>Simple Index</title></head><body><h1>Simple Index</h1></body></html>", 'html.parser')
-
-          root_body = root_soup.find('body')
-
-          # Check if link already exists for this package
-          existing_link = root_body.find('a', href=f"{{PACKAGE_NAME}}/".lower()) # Ensure lowercase for comparison
-          if not existing_link:
-              link_tag = root_soup.new_tag("a", href=f"{{PACKAGE_NAME}}/")
-              link_tag.string = PACKAGE_NAME
-              root_body.append(link_tag)
-              root_body.append(soup.new_tag("br")) # Use soup.new_tag for <br>
-              with open(root_index_path, "w") as f:
-                  f.write(str(root_soup))
-              print(f"Added new link for {{PACKAGE_NAME}} to {{root_index_path}}")
-          else:
-              print(f"Link for {{PACKAGE_NAME}} already exists in {{root_index_path}}. No update needed for root index.")
-          EOF
+    steps:
+      - name: Checkout Repository
+        uses: actions/checkout@v4
+        with:
+          # Release tags and trees are needed to compare each package with its last release; file contents are not
+          fetch-depth: 0
+          filter: blob:none
+
+      - name: Set up Python
+        uses: actions/setup-python@v5
+        with:
+          python-version: '3.12'
+
+      - name: Install index builder
+        run: |
+          pip install "{INDEX_BUILDER_REQUIREMENT}"
 
-      - name: Configure Git for committing
+      - name: Detect changed packages
+        id: detect
         run: |
+          python -m py_toml_builder.monorepo changed --root . --github-output "$GITHUB_OUTPUT"
+
+  build_and_publish:
+    needs: detect
+    if: needs.detect.outputs.any == 'true'
+    runs-on: ubuntu-latest
+    permissions:
+      contents: write # Needed for actions/checkout, release uploads, git push and release tags
+    strategy:
+      fail-fast: false # One package failing doesn't hold back the others
+      matrix:
+        package: ${{{{ fromJSON(needs.detect.outputs.packages) }}}}
+
+    steps:
+{setup_steps}
+{upload_step}
+      - name: Start timing the index checkout
+        run: {WORKFLOW_METRICS_COMMAND} start clone_index
+
+      - name: Checkout PyPI Index Repository
+        uses: actions/checkout@v4
+        with:
+          repository: {github_username}/{pypi_index_repo_name}
+          path: my-python-index-repo # Local path to clone the index repo
+          token: ${{{{ secrets.{pat_secret_name} }}}}
+          # Only this package's directory and the root index files are checked out
+          filter: blob:none
+          sparse-checkout: |
+            ${{{{ matrix.package.normalized }}}}
+            ${{{{ matrix.package.legacy }}}}
+          sparse-checkout-cone-mode: true
+
+      - name: Update and push PyPI Index
+        run: |
+          {WORKFLOW_METRICS_COMMAND} stop clone_index
+          echo "Processing package: ${{{{ matrix.package.name }}}} ${{{{ matrix.package.version }}}}"
           cd my-python-index-repo
           git config user.email "github-actions[bot]@users.noreply.github.com"
           git config user.name "github-actions[bot]"
-          git add .
-          git commit -m "Auto-update PyPI index for ${{{{ github.event.repository.name }}}} v${{{{ github.event.release.tag_name || 'latest' }}}} [skip ci]" || echo "No changes to commit" # '|| echo' prevents failure if no changes
-          git push
+          # Retryable transaction: the packages of this release push to the same index in parallel
+          python -m py_toml_builder.publish "${{{{ matrix.package.name }}}}" --dist ../dist{publish_options} \\
+            --metrics "{WORKFLOW_METRICS_FILE}" \\
+            --message "Auto-update PyPI index for ${{{{ matrix.package.name }}}} ${{{{ matrix.package.version }}}} [skip ci]"
+
+      - name: Tag the released version
+        run: |
+          # The next run compares this package against this tag and skips it if nothing changed
+          git tag "${{{{ matrix.package.tag }}}}"
+          git push origin "refs/tags/${{{{ matrix.package.tag }}}}"
+
+      - name: Report release metrics
+        if: always()
+        run: |
+          {WORKFLOW_METRICS_COMMAND} summary --title "Release metrics: ${{{{ matrix.package.name }}}}"
+
+      - name: Upload release metrics
+        if: always()
+        uses: actions/upload-artifact@v4
+        with:
+          name: release-metrics-${{{{ matrix.package.normalized }}}}
+          path: ${{{{ runner.temp }}}}/release-metrics.json
+          if-no-files-found: ignore
 """
     return workflow_content.strip()
 
-def run():
+def import_sibling(name):
+    """Imports a sibling module both when installed as a package and when run as 'python main.py'."""
+    if __package__:
+        return importlib.import_module(f".{name}", __package__)
+    return importlib.import_module(name)
+
+def write_generated_files(output_dir, pyproject_content, workflow_content):
+    """Writes pyproject.toml and the workflow file below output_dir. Returns both paths."""
+    pyproject_path = os.path.join(output_dir, PYPROJECT_PATH)
+    workflow_path = os.path.join(output_dir, WORKFLOW_PATH)
+    os.makedirs(os.path.join(output_dir, WORKFLOW_DIR), exist_ok=True)
+    with open(pyproject_path, "w") as f:
+        f.write(pyproject_content)
+    with open(workflow_path, "w") as f:
+        f.write(workflow_content)
+    return pyproject_path, workflow_path
+
+def build_arg_parser():
+    """Builds the parser for the non-interactive subcommands."""
+    parser = argparse.ArgumentParser(
+        prog="py-toml-builder",
+        description="Generate pyproject.toml and the GitHub Pages PyPI index workflow. Run without arguments for the interactive setup."
+    )
+    parser.add_argument("--metrics", default=None, metavar="FILE", help="Record phase timings and counters of the subcommand in this JSON file and in $GITHUB_STEP_SUMMARY.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    batch_parser = subparsers.add_parser("batch", help="Render files for every package in a TOML/JSON/JSONL manifest.")
+    batch_parser.add_argument("manifest", help="Path to a .toml, .json or .jsonl manifest (one package per record).")
+    batch_parser.add_argument("-o", "--output-dir", default=".", help="Root directory for the per-package output directories (default: current directory).")
+    batch_parser.add_argument("-j", "--jobs", type=int, default=None, help="Number of worker processes (default: number of CPUs).")
+
+    validate_parser = subparsers.add_parser("validate", help="Check manifests and pyproject.toml files without rendering anything (e.g. as a pre-commit hook).")
+    validate_parser.add_argument("paths", nargs="+", help="Manifests (.toml, .json, .jsonl) and/or pyproject.toml files.")
+    validate_parser.add_argument("--format", choices=("text", "json"), default="text", help="Report format (default: text).")
+
+    update_parser = subparsers.add_parser("update", help="Patch the version, scripts, URLs or authors of existing pyproject.toml files in place.")
+    update_parser.add_argument("paths", nargs="+", help="pyproject.toml files or directories containing one.")
+    version_group = update_parser.add_mutually_exclusive_group()
+    version_group.add_argument("--version", default=None, help="Set project.version.")
+    version_group.add_argument("--bump", choices=("major", "minor", "patch"), default=None, help="Increment project.version.")
+    update_parser.add_argument("--script", action="append", metavar="NAME=MODULE:OBJECT", help="Add or change a [project.scripts] entry (repeatable).")
+    update_parser.add_argument("--url", action="append", metavar="LABEL=URL", help="Add or change a [project.urls] entry (repeatable).")
+    update_parser.add_argument("--author", action="append", metavar="'NAME <EMAIL>'", help="Replace project.authors (repeatable, in order).")
+    update_parser.add_argument("--dry-run", action="store_true", help="Report the changes without writing any file.")
+    update_parser.add_argument("-j", "--jobs", type=int, default=None, help="Number of worker threads.")
+
+    monorepo_parser = subparsers.add_parser("monorepo", help="Discover the packages of a repository and generate a workflow that releases only the changed ones.")
+    monorepo_parser.add_argument("root", nargs="?", default=".", help="Repository root (default: current directory).")
+    monorepo_parser.add_argument("--github-username", default=os.environ.get("GITHUB_USERNAME"), help="Owner of the index repository (default: $GITHUB_USERNAME).")
+    monorepo_parser.add_argument("--index-repo", default=os.environ.get("PYPI_INDEX_REPO_NAME"), help="Name of the index repository (default: $PYPI_INDEX_REPO_NAME).")
+    monorepo_parser.add_argument("--pat-secret", default=os.environ.get("PAT_SECRET_NAME"), help="Secret holding the token for the index repository (default: $PAT_SECRET_NAME).")
+    monorepo_parser.add_argument("--artifact-storage", choices=ARTIFACT_STORAGE_CHOICES, default="index", help="Where distributions are stored (default: index).")
+    monorepo_parser.add_argument("--retention", default=None, help="Retention policy applied on every release, e.g. 'keep-last=10,yank'.")
+    monorepo_parser.add_argument("--profile", choices=WORKFLOW_PROFILE_CHOICES, default="standard", help="Workflow profile (default: standard).")
+    monorepo_parser.add_argument("--full-history", action="store_true", help="Fetch full history in the fast profile (e.g. for setuptools-scm).")
+    monorepo_parser.add_argument("--dry-run", action="store_true", help="Only report the packages and their changes; don't write the workflow.")
+
+    audit_parser = subparsers.add_parser("audit", help="Verify every artifact of an index directory against its pages and digest cache.")
+    audit_parser.add_argument("index_dir", help="Path to the index directory (a checkout of the index repository).")
+    audit_parser.add_argument("--repair", action="store_true", help="Regenerate the pages of the affected packages (and the root) from the files on disk.")
+    audit_parser.add_argument("--workers", type=int, default=None, help="Number of hashing threads.")
+    audit_parser.add_argument("--format", choices=("text", "json"), default="text", help="Report format (default: text).")
+
+    serve_parser = subparsers.add_parser("serve", help="Serve a generated index directory as a local PEP 503/691 endpoint.")
+    serve_parser.add_argument("index_dir", help="Path to the index directory (a checkout of the index repository).")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="Address to bind (default: 127.0.0.1).")
+    serve_parser.add_argument("--port", type=int, default=8000, help="Port to listen on (default: 8000, 0 picks a free port).")
+    serve_parser.add_argument("--quiet", action="store_true", help="Don't log every request (useful for load tests).")
+    serve_parser.add_argument("--workers", type=int, default=64, help="Number of threads handling connections (default: 64).")
+    return parser
+
+def run_command(argv):
+    """Runs a non-interactive subcommand and returns its exit code."""
+    parser = build_arg_parser()
+    args = parser.parse_args(argv)
+    if args.command == "update":
+        update_module = import_sibling("update")
+        try:
+            changes = update_module.build_changes(args.version, args.bump, args.script, args.url, args.author)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.command == "monorepo":
+        missing = [option for option, value in (("--github-username", args.github_username), ("--index-repo", args.index_repo), ("--pat-secret", args.pat_secret)) if not value]
+        if missing:
+            parser.error(f"monorepo: missing {', '.join(missing)} (or the matching environment variables)")
+        if args.retention and not is_valid_retention_policy(args.retention):
+            parser.error(f"monorepo: invalid retention policy '{args.retention}'")
+    metrics_module = import_sibling("metrics")
+    metrics = metrics_module.Metrics()
+    exit_code = 2
+    try:
+        if args.command == "batch":
+            exit_code = import_sibling("batch").run_batch(args.manifest, args.output_dir, jobs=args.jobs, metrics=metrics)
+        elif args.command == "validate":
+            with metrics.phase("validate"):
+                exit_code = import_sibling("batch").run_validate(args.paths, output_format=args.format)
+        elif args.command == "update":
+            exit_code = update_module.run_update(args.paths, changes, jobs=args.jobs, dry_run=args.dry_run, metrics=metrics)
+        elif args.command == "monorepo":
+            with metrics.phase("monorepo"):
+                settings = {"github_username": args.github_username, "pypi_index_repo_name": args.index_repo, "pat_secret_name": args.pat_secret}
+                exit_code = import_sibling("monorepo").run_monorepo(args.root, settings, artifact_storage=args.artifact_storage, retention=args.retention,
+                                                                    profile=args.profile, full_history=args.full_history, dry_run=args.dry_run)
+        elif args.command == "audit":
+            exit_code = import_sibling("audit").run_audit(args.index_dir, repair=args.repair, workers=args.workers, output_format=args.format, metrics=metrics)
+        elif args.command == "serve":
+            with metrics.phase("serve"):
+                exit_code = import_sibling("server").serve(args.index_dir, host=args.host, port=args.port, quiet=args.quiet, workers=args.workers)
+    finally:
+        if args.metrics:
+            report = metrics.write_json(args.metrics)
+            metrics_module.write_step_summary(report, f"py-toml-builder {args.command}")
+    return exit_code
+
+def run(argv=None):
+    """Entry point. Without arguments runs the interactive setup, otherwise dispatches to a subcommand."""
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv:
+        try:
+            sys.exit(run_command(argv))
+        except KeyboardInterrupt:
+            print(f"\n{COLOR_GREEN}Closing script!{COLOR_RESET}")
+            sys.exit(130)
+    run_interactive()
+
+def run_interactive():
     try:
 
         while True: # Loop for restart option
@@ -307,7 +722,8 @@ def run():
             # Part 1: Your Python Package Details (All mandatory with validation)
             package_name = get_mandatory_input(
                 "1. What is the name of your Python package?",
-                clarification_text="(This will be used in pyproject.toml and for the index URL, e.g., 'my-awesome-package')"
+                clarification_text="(This will be used in pyproject.toml and for the index URL, e.g., 'my-awesome-package')",
+                validator=is_valid_package_name
             )
             package_version = get_mandatory_input(
                 "2. What is the initial version of your package?",
@@ -344,7 +760,8 @@ def run():
             if has_cli:
                 cli_command_name = get_mandatory_input(
                     "   What is the command name?", 
-                    clarification_text="   (e.g., 'your-cli-command')"
+                    clarification_text="   (e.g., 'your-cli-command')",
+                    validator=is_valid_script_name
                 )
                 cli_entry_point = get_mandatory_input(
                     "   What is the Python path to the entry function?", 
@@ -357,6 +774,50 @@ def run():
                 clarification_text="(e.g., 'https://github.com/your-username/your-package-repo')",
                 validator=is_valid_github_url
             )
+
+            # Question 8 defaults to 'index' if empty
+            while True:
+                print(f"{COLOR_CYAN}8. Where should the built distributions be stored? (index/release) [index]{COLOR_RESET}")
+                print(f"{COLOR_BLUE}(index = committed into the index repo, release = uploaded as GitHub Release assets; the index repo then only holds small HTML/JSON pages){COLOR_RESET}")
+                artifact_storage = input(f"{COLOR_YELLOW}> {COLOR_RESET}").strip().lower() or "index"
+                if artifact_storage in ARTIFACT_STORAGE_CHOICES:
+                    break
+                print(f"{COLOR_RED}Invalid input. Please enter 'index' or 'release'.{COLOR_RESET}")
+
+            retention = get_input_with_env_default(
+                "9. Retention policy for old releases (optional, leave empty to keep everything)",
+                "PYPI_INDEX_RETENTION",
+                "  * Bounds how many releases the index keeps for this package.",
+                clarification_text="    (e.g., 'keep-last=10', 'keep-since=2024-01-01', 'keep-latest-patch', add 'yank' to yank instead of delete)",
+                validator=is_valid_retention_policy
+            ) or None
+
+            # Question 10 defaults to 'standard' if empty
+            full_history = False
+            while True:
+                print(f"{COLOR_CYAN}10. Which workflow profile should be generated? (standard/fast) [standard]{COLOR_RESET}")
+                print(f"{COLOR_BLUE}(fast = shallow clone, cached downloads and build environments, builds with uv){COLOR_RESET}")
+                profile = input(f"{COLOR_YELLOW}> {COLOR_RESET}").strip().lower() or "standard"
+                if profile in WORKFLOW_PROFILE_CHOICES:
+                    break
+                print(f"{COLOR_RED}Invalid input. Please enter 'standard' or 'fast'.{COLOR_RESET}")
+            if profile == "fast":
+                while True:
+                    history_input = input("    Does your build derive the version from git history (e.g. setuptools-scm)? (y/N): ").strip().lower()
+                    if history_input in ('y', 'n', ''):
+                        full_history = history_input == 'y'
+                        break
+                    print(f"{COLOR_RED}Invalid input. Please enter 'y' or 'n'.{COLOR_RESET}")
+
+            # Question 11 is optional: an empty answer keeps the single build job
+            while True:
+                print(f"{COLOR_CYAN}11. Build matrix for parallel wheel builds (optional, leave empty for a single build job){COLOR_RESET}")
+                print(f"{COLOR_BLUE}(e.g., 'python-version=3.11,3.12;os=ubuntu-latest,windows-latest'){COLOR_RESET}")
+                matrix_spec = input(f"{COLOR_YELLOW}> {COLOR_RESET}").strip()
+                if not matrix_spec or is_valid_matrix_spec(matrix_spec):
+                    break
+                print(f"{COLOR_RED}Invalid format. Please check the required format and try again.{COLOR_RESET}")
+            matrix = parse_matrix_axes(matrix_spec) if matrix_spec else None
             print("-" * 60)
 
             # Part 2: Shared GitHub Configuration (Environment Variable Pre-fill & Confirm)
@@ -405,6 +866,11 @@ def run():
             print(f"  GitHub Username:      {github_username}")
             print(f"  PyPI Index Repo:      {pypi_index_repo_name}")
             print(f"  PAT Secret Name:      {pat_secret_name}")
+            print(f"  Artifact Storage:     {artifact_storage}")
+            print(f"  Retention Policy:     {retention or 'keep everything'}")
+            print(f"  Workflow Profile:     {profile}{' (full history)' if full_history else ''}")
+            if matrix:
+                print(f"  Build Matrix:         {matrix_spec}")
             print("-" * 60)
 
             # Apply the two-line treatment to the final confirmation question
@@ -437,26 +903,20 @@ def run():
         workflow_content = generate_workflow_yml(
             github_username=github_username,
             pypi_index_repo_name=pypi_index_repo_name,
-            pat_secret_name=pat_secret_name
+            pat_secret_name=pat_secret_name,
+            artifact_storage=artifact_storage,
+            retention=retention,
+            profile=profile,
+            full_history=full_history,
+            matrix=matrix
         )
 
-        # Create files
-        pyproject_path = "pyproject.toml"
-        workflow_dir = os.path.join(".github", "workflows")
-        workflow_path = os.path.join(workflow_dir, "publish_to_pypi_pages.yml")
-
-        # Write pyproject.toml
-        with open(pyproject_path, "w") as f:
-            f.write(pyproject_content)
-        print(f"\n{COLOR_GREEN}Created: {pyproject_path}{COLOR_RESET}")
-
-        # Create .github/workflows directory if it doesn't exist
-        os.makedirs(workflow_dir, exist_ok=True)
-
-        # Write workflow YAML
-        with open(workflow_path, "w") as f:
-            f.write(workflow_content)
-        print(f"{COLOR_GREEN}Created: {workflow_path}{COLOR_RESET}")
+        # Create files (the .github/workflows directory is created if it doesn't exist)
+        if os.path.exists(PYPROJECT_PATH):
+            print(f"{COLOR_YELLOW}Overwriting the existing {PYPROJECT_PATH}. To change only some fields (version, scripts, URLs, authors) and keep the rest, use 'py-toml-builder update' instead.{COLOR_RESET}")
+        pyproject_path, workflow_path = write_generated_files(".", pyproject_content, workflow_content)
+        print(f"\n{COLOR_GREEN}Created: {os.path.normpath(pyproject_path)}{COLOR_RESET}")
+        print(f"{COLOR_GREEN}Created: {os.path.normpath(workflow_path)}{COLOR_RESET}")
 
         print(f"\n{COLOR_GREEN}--- Setup Complete! ---{COLOR_RESET}")
         print("Please follow these crucial next steps:")
@@ -0,0 +1,152 @@
+"""
+Per-phase timings and counters for the index update, the generated workflow and the CLI.
+
+Metrics are collected in a Metrics object and written to a JSON file; when the file already exists
+the new values are merged into it, so the separate steps of a workflow job can accumulate into one
+report. The same report can be rendered as a Markdown table into $GITHUB_STEP_SUMMARY.
+
+From a workflow step:
+
+    python -m py_toml_builder.metrics --file metrics.json time build -- python -m build
+    python -m py_toml_builder.metrics --file metrics.json start clone_index
+    python -m py_toml_builder.metrics --file metrics.json stop clone_index
+    python -m py_toml_builder.metrics --file metrics.json summary
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from contextlib import contextmanager
+
+STEP_SUMMARY_ENV = "GITHUB_STEP_SUMMARY"
+
+
+class Metrics:
+    """Accumulates phase durations (seconds) and counters."""
+
+    def __init__(self):
+        self.phases = {}
+        self.counters = {}
+
+    @contextmanager
+    def phase(self, name):
+        """Times the enclosed block and adds the duration to the phase (phases may repeat, e.g. on retries)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - started)
+
+    def add_time(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_dict(self):
+        return {
+            "phases": {name: round(seconds, 4) for name, seconds in self.phases.items()},
+            "counters": dict(self.counters),
+        }
+
+    def write_json(self, path):
+        """Merges these metrics into the JSON file at 'path' (creating it if needed) and returns the merged report."""
+        report = read_report(path)
+        for name, seconds in self.phases.items():
+            report["phases"][name] = round(report["phases"].get(name, 0.0) + seconds, 4)
+        for name, value in self.counters.items():
+            report["counters"][name] = report["counters"].get(name, 0) + value
+        write_report(path, report)
+        return report
+
+
+def read_report(path):
+    """Reads a metrics report, or returns an empty one if the file doesn't exist or is unreadable."""
+    try:
+        with open(path, "r") as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        report = {}
+    report.setdefault("phases", {})
+    report.setdefault("counters", {})
+    report.setdefault("started", {})
+    return report
+
+
+def write_report(path, report):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if not report.get("started"):
+        report.pop("started", None) # Only phases still running across workflow steps are kept
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2) # Phases stay in the order they ran
+        f.write("\n")
+
+
+def format_markdown(report, title="Release metrics"):
+    """Renders a report as Markdown tables."""
+    lines = [f"### {title}", "", "| Phase | Seconds |", "| --- | ---: |"]
+    lines += [f"| {name} | {seconds:.2f} |" for name, seconds in report["phases"].items()]
+    lines += [f"| **total** | **{sum(report['phases'].values()):.2f}** |", ""]
+    if report["counters"]:
+        lines += ["| Counter | Value |", "| --- | ---: |"]
+        lines += [f"| {name} | {value} |" for name, value in sorted(report["counters"].items())]
+        lines.append("")
+    return "\n".join(lines) + "\n"
+
+
+def write_step_summary(report, title="Release metrics"):
+    """Appends the report to $GITHUB_STEP_SUMMARY. Returns False when not running on GitHub Actions."""
+    summary_path = os.environ.get(STEP_SUMMARY_ENV)
+    if not summary_path:
+        return False
+    with open(summary_path, "a") as f:
+        f.write(format_markdown(report, title))
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m py_toml_builder.metrics", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--file", required=True, help="Metrics JSON file to update.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    time_parser = subparsers.add_parser("time", help="Run a command and record its duration as a phase.")
+    time_parser.add_argument("phase")
+    time_parser.add_argument("cmd", nargs=argparse.REMAINDER, help="Command to run (after '--').")
+    for name in ("start", "stop"):
+        subparsers.add_parser(name, help=f"{name.capitalize()} timing a phase that spans workflow steps.").add_argument("phase")
+    summary_parser = subparsers.add_parser("summary", help="Print the report and append it to $GITHUB_STEP_SUMMARY.")
+    summary_parser.add_argument("--title", default="Release metrics")
+    args = parser.parse_args(argv)
+
+    if args.command == "time":
+        cmd = args.cmd[1:] if args.cmd[:1] == ["--"] else args.cmd
+        if not cmd:
+            parser.error("time needs a command after '--'")
+        metrics = Metrics()
+        with metrics.phase(args.phase):
+            returncode = subprocess.call(cmd)
+        metrics.write_json(args.file)
+        return returncode
+
+    report = read_report(args.file)
+    if args.command == "start":
+        report["started"][args.phase] = time.time()
+        write_report(args.file, report)
+    elif args.command == "stop":
+        started = report["started"].pop(args.phase, None)
+        if started is None:
+            print(f"Warning: phase '{args.phase}' was never started.", file=sys.stderr)
+            return 0
+        report["phases"][args.phase] = round(report["phases"].get(args.phase, 0.0) + time.time() - started, 4)
+        write_report(args.file, report)
+    else:
+        print(format_markdown(report, args.title))
+        write_step_summary(report, args.title)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
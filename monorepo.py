@@ -0,0 +1,265 @@
+"""
+Monorepo support: discovers the packages of a repository and works out which of them changed since
+their last release, so a release only builds and indexes those.
+
+A package is any directory with a pyproject.toml that has a [project] table. Its releases are tagged
+'<normalized name>-v<version>' (the generated workflow pushes the tag after publishing). A package has
+changed when it was never released, or when the git tree id of its directory at HEAD differs from the
+one at its last release tag. Tree ids are content hashes, so this needs neither a build nor a diff.
+A package whose directory contains other packages (e.g. one at the repository root) is compared with
+'git diff' instead, excluding those packages' directories, so their releases don't count as its changes.
+
+The generated workflow's first job runs:
+
+    python -m py_toml_builder.monorepo changed --root . --github-output "$GITHUB_OUTPUT"
+"""
+import os
+import sys
+import json
+import tomllib
+import argparse
+import subprocess
+
+try:
+    from .main import COLOR_RESET, COLOR_GREEN, COLOR_YELLOW, COLOR_RED, COLOR_CYAN, WORKFLOW_DIR, WORKFLOW_PATH, generate_monorepo_workflow_yml
+    from .validation import normalize_name, parse_version, validate_pyproject
+    from .retention import version_key
+    from .index import legacy_directory_name
+except ImportError:
+    from main import COLOR_RESET, COLOR_GREEN, COLOR_YELLOW, COLOR_RED, COLOR_CYAN, WORKFLOW_DIR, WORKFLOW_PATH, generate_monorepo_workflow_yml
+    from validation import normalize_name, parse_version, validate_pyproject
+    from retention import version_key
+    from index import legacy_directory_name
+
+TAG_SEPARATOR = "-v"
+# Directories that never contain packages of the repository itself
+SKIP_DIRECTORIES = {
+    ".git", ".hg", ".svn", ".tox", ".nox", ".venv", "venv", "env", "node_modules", "build", "dist",
+    "__pycache__", "site-packages", ".mypy_cache", ".pytest_cache", ".ruff_cache",
+}
+
+# Detection results; only CHANGED and NEW packages are released
+CHANGED, NEW, UNCHANGED, NOT_BUMPED, DYNAMIC_VERSION, INVALID = "changed", "new", "unchanged", "version-not-bumped", "dynamic-version", "invalid"
+RELEASED_STATUSES = (CHANGED, NEW)
+
+
+def release_tag(normalized, version):
+    return f"{normalized}{TAG_SEPARATOR}{version}"
+
+
+def discover_packages(root):
+    """
+    Finds the package roots below 'root'. Returns a list of dicts sorted by path with 'name',
+    'normalized', 'path' (POSIX, relative to root; '.' for the root itself), 'version' (None if
+    dynamic) and 'errors' (validation.FieldError list).
+    """
+    packages = []
+    for directory, subdirectories, filenames in os.walk(root):
+        subdirectories[:] = sorted(name for name in subdirectories if name not in SKIP_DIRECTORIES and not name.startswith("."))
+        if "pyproject.toml" not in filenames:
+            continue
+        path = os.path.join(directory, "pyproject.toml")
+        try:
+            with open(path, "rb") as f:
+                data = tomllib.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: skipping {path}: {e}", file=sys.stderr)
+            continue
+        project = data.get("project")
+        if not isinstance(project, dict):
+            continue # Tool configuration only (e.g. a workspace root), not a package
+        name = project.get("name")
+        name = name if isinstance(name, str) else ""
+        version = project.get("version")
+        packages.append({
+            "name": name,
+            "normalized": normalize_name(name),
+            "path": os.path.relpath(directory, root).replace(os.sep, "/"),
+            "version": version if isinstance(version, str) else None,
+            "errors": validate_pyproject(data),
+        })
+    return sorted(packages, key=lambda package: package["path"])
+
+
+def git_lines(root, *args, input=None):
+    """Runs a git command in 'root' and returns its output lines. Raises CalledProcessError on failure."""
+    result = subprocess.run(["git", *args], cwd=root, capture_output=True, text=True, input=input, check=True)
+    return result.stdout.splitlines()
+
+
+def tree_ids(root, revisions_and_paths):
+    """Resolves many '<revision>:./<path>' tree ids with a single 'git cat-file --batch-check'. Missing trees map to None."""
+    names = [f"{revision}:./{'' if path == '.' else path}" for revision, path in revisions_and_paths]
+    if not names:
+        return {}
+    output = git_lines(root, "cat-file", "--batch-check=%(objectname) %(objecttype)", input="\n".join(names) + "\n")
+    resolved = {}
+    for key, line in zip(revisions_and_paths, output):
+        object_id, _, object_type = line.partition(" ")
+        resolved[key] = object_id if object_type == "tree" else None
+    return resolved
+
+
+def nested_package_paths(package, packages):
+    """Paths of the other packages inside the package's directory (every other package for the root)."""
+    prefix = "" if package["path"] == "." else package["path"] + "/"
+    return [other["path"] for other in packages if other is not package and other["path"] != "." and other["path"].startswith(prefix)]
+
+
+def changed_outside(root, tag, path, excluded):
+    """True if 'path' differs between 'tag' and HEAD, ignoring the 'excluded' subdirectories."""
+    pathspecs = [path] + [f":(exclude){subdirectory}" for subdirectory in excluded]
+    result = subprocess.run(["git", "diff", "--quiet", tag, "HEAD", "--", *pathspecs], cwd=root, capture_output=True, text=True)
+    if result.returncode not in (0, 1):
+        raise subprocess.CalledProcessError(result.returncode, result.args, result.stdout, result.stderr)
+    return result.returncode == 1
+
+
+def last_release_tags(root, packages):
+    """Returns {normalized name: newest '<name>-v<version>' tag reachable from HEAD}."""
+    prefixes = {package["normalized"] + TAG_SEPARATOR for package in packages}
+    latest = {}
+    for tag in git_lines(root, "tag", "--list", "--merged", "HEAD"):
+        prefix, separator, version = tag.rpartition(TAG_SEPARATOR)
+        # 'foo-viz-v1.0' must not count as a release of 'foo', so the suffix has to be a version
+        if not separator or prefix + separator not in prefixes or parse_version(version) is None:
+            continue
+        if prefix not in latest or version_key(version) > version_key(latest[prefix].rpartition(TAG_SEPARATOR)[2]):
+            latest[prefix] = tag
+    return latest
+
+
+def detect_changes(root, packages, force=False):
+    """
+    Classifies every package (see the status constants) and returns [(package, status, last tag)].
+    With force every valid package with a static version is released, changed or not.
+    """
+    latest = last_release_tags(root, packages)
+    all_tags = set(git_lines(root, "tag", "--list"))
+    lookups = [("HEAD", package["path"]) for package in packages]
+    lookups += [(latest[package["normalized"]], package["path"]) for package in packages if package["normalized"] in latest]
+    trees = tree_ids(root, lookups)
+
+    def unchanged(package, tag):
+        nested = nested_package_paths(package, packages)
+        if nested:
+            return not changed_outside(root, tag, package["path"], nested)
+        return trees.get((tag, package["path"])) == trees[("HEAD", package["path"])]
+
+    results = []
+    for package in packages:
+        tag = latest.get(package["normalized"])
+        if package["errors"]:
+            status = INVALID
+        elif package["version"] is None:
+            status = DYNAMIC_VERSION
+        elif tag is None:
+            status = NEW
+        elif not force and unchanged(package, tag):
+            status = UNCHANGED
+        elif release_tag(package["normalized"], package["version"]) in all_tags:
+            status = NOT_BUMPED # Content changed, but this version was already released
+        else:
+            status = CHANGED
+        results.append((package, status, tag))
+    return results
+
+
+def release_matrix(results):
+    """Matrix entries (name, normalized, legacy index directory, path, version, tag) for the packages to release."""
+    return [
+        {
+            "name": package["name"],
+            "normalized": package["normalized"],
+            "legacy": legacy_directory_name(package["name"]),
+            "path": package["path"],
+            "version": package["version"],
+            "tag": release_tag(package["normalized"], package["version"]),
+        }
+        for package, status, _ in results if status in RELEASED_STATUSES
+    ]
+
+
+def print_report(results):
+    for package, status, tag in results:
+        detail = f" (last release {tag})" if tag else ""
+        if status == INVALID:
+            detail = ": " + "; ".join(str(error) for error in package["errors"])
+        elif status == NOT_BUMPED:
+            detail = f": {release_tag(package['normalized'], package['version'])} already exists; bump the version (py-toml-builder update {package['path']} --bump patch)"
+        print(f"  {status:<20}{package['name'] or '<unnamed>'} [{package['path']}]{detail}")
+
+
+def run_monorepo(root, settings, artifact_storage="index", retention=None, profile="standard", full_history=None, dry_run=False):
+    """
+    Discovers the packages below 'root', reports what a release would publish now and writes the
+    monorepo workflow to '<root>/.github/workflows/'. 'settings' holds github_username,
+    pypi_index_repo_name and pat_secret_name. Returns the exit code (1 if any package is invalid).
+    """
+    packages = discover_packages(root)
+    if not packages:
+        print(f"{COLOR_RED}No packages (pyproject.toml with a [project] table) found under '{root}'.{COLOR_RESET}", file=sys.stderr)
+        return 1
+    print(f"{COLOR_GREEN}--- Monorepo: {len(packages)} package(s) under {root} ---{COLOR_RESET}")
+    try:
+        print_report(detect_changes(root, packages))
+    except (OSError, subprocess.CalledProcessError):
+        print(f"{COLOR_YELLOW}Not a git repository (or git is unavailable); change detection skipped.{COLOR_RESET}")
+        for package in packages:
+            print(f"  {package['name'] or '<unnamed>'} [{package['path']}]")
+
+    workflow_content = generate_monorepo_workflow_yml(
+        github_username=settings["github_username"],
+        pypi_index_repo_name=settings["pypi_index_repo_name"],
+        pat_secret_name=settings["pat_secret_name"],
+        artifact_storage=artifact_storage,
+        retention=retention,
+        profile=profile,
+        full_history=full_history
+    )
+    if not dry_run:
+        os.makedirs(os.path.join(root, WORKFLOW_DIR), exist_ok=True)
+        with open(os.path.join(root, WORKFLOW_PATH), "w") as f:
+            f.write(workflow_content)
+        print(f"{COLOR_GREEN}Created: {os.path.normpath(os.path.join(root, WORKFLOW_PATH))}{COLOR_RESET}")
+        print(f"{COLOR_CYAN}Each release now publishes only the packages whose directory changed since their last '<name>-v<version>' tag.{COLOR_RESET}")
+
+    invalid = sum(1 for package in packages if package["errors"])
+    if invalid:
+        print(f"{COLOR_RED}{invalid} package(s) have invalid metadata and won't be released until fixed.{COLOR_RESET}")
+    return 1 if invalid else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m py_toml_builder.monorepo", description=__doc__.strip().splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    changed_parser = subparsers.add_parser("changed", help="List the packages that changed since their last release tag.")
+    changed_parser.add_argument("--root", default=".", help="Repository root to search for packages (default: current directory).")
+    changed_parser.add_argument("--all", action="store_true", help="Release every package, changed or not.")
+    changed_parser.add_argument("--github-output", default=None, help="Append 'packages' (JSON matrix) and 'any' outputs to this file ($GITHUB_OUTPUT).")
+    args = parser.parse_args(argv)
+
+    packages = discover_packages(args.root)
+    try:
+        results = detect_changes(args.root, packages, force=args.all)
+    except subprocess.CalledProcessError as e:
+        print(f"Error: git {' '.join(e.cmd[1:])} failed: {e.stderr.strip()}", file=sys.stderr)
+        return 1
+    print(f"Found {len(packages)} package(s) under {args.root}:")
+    print_report(results)
+    if os.environ.get("GITHUB_ACTIONS"):
+        for package, status, _ in results:
+            if status in (NOT_BUMPED, DYNAMIC_VERSION, INVALID):
+                print(f"::warning title=Not released::{package['name'] or package['path']} is {status}")
+
+    matrix = release_matrix(results)
+    print(f"{len(matrix)} package(s) to release: {', '.join(entry['name'] for entry in matrix) or 'none'}")
+    if args.github_output:
+        with open(args.github_output, "a") as f:
+            f.write(f"packages={json.dumps(matrix, separators=(',', ':'))}\n")
+            f.write(f"any={'true' if matrix else 'false'}\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
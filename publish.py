@@ -0,0 +1,139 @@
+"""
+Publishes a package to the index repository as a retryable transaction.
+
+Several packages can release at the same time against one shared index repository. Instead of a
+plain 'git push' that fails on non-fast-forward, each attempt:
+
+    1. resets the checkout onto the latest remote branch,
+    2. re-runs this package's incremental index update (see index.update_index),
+    3. commits and pushes,
+
+and retries with bounded exponential backoff when the push is rejected. Only this package's
+directory and the root manifest change; the root pages are re-rendered from the merged manifest,
+so concurrent writers never need a hand merge.
+
+    python -m py_toml_builder.publish <package> --root <index-repo> --dist dist [--url-base <assets-url>]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import subprocess
+
+try:
+    from .index import update_index
+    from .metrics import Metrics
+except ImportError:
+    from index import update_index
+    from metrics import Metrics
+
+DEFAULT_ATTEMPTS = 8
+DEFAULT_BACKOFF = 1.0 # Seconds before the first retry; doubled on every attempt
+MAX_BACKOFF = 30.0
+
+
+class PublishError(Exception):
+    """Raised when the index update could not be pushed within the allowed attempts."""
+
+
+def git(repo, *args, check=True):
+    """Runs a git command in the index repository and returns its stripped stdout."""
+    result = subprocess.run(["git", *args], cwd=repo, capture_output=True, text=True)
+    if check and result.returncode != 0:
+        raise subprocess.CalledProcessError(result.returncode, ["git", *args], result.stdout, result.stderr)
+    return result.stdout.strip()
+
+
+def current_branch(repo):
+    """Name of the checked-out branch of the index repository."""
+    return git(repo, "rev-parse", "--abbrev-ref", "HEAD")
+
+
+def sync_with_remote(repo, remote, branch):
+    """Discards local changes and moves the checkout onto the latest remote branch."""
+    git(repo, "fetch", "--quiet", remote, branch)
+    git(repo, "reset", "--quiet", "--hard", "FETCH_HEAD")
+    git(repo, "clean", "--quiet", "-fd")
+
+
+def publish(repo, package_name, dist_dir=None, url_base=None, retention=None, message=None, remote="origin",
+            attempts=DEFAULT_ATTEMPTS, backoff=DEFAULT_BACKOFF, workers=None, metrics=None):
+    """
+    Updates the index for one package and pushes it, retrying on rejected pushes.
+    Phase timings (summed over attempts) and push counters are added to 'metrics' when given.
+    Returns {"attempts", "retries", "pushed", "stats"}; raises PublishError when all attempts fail.
+    """
+    metrics = metrics or Metrics()
+    dist_dir = os.path.abspath(dist_dir) if dist_dir else None
+    branch = current_branch(repo)
+    message = message or f"Auto-update PyPI index for {package_name} [skip ci]"
+
+    for attempt in range(1, attempts + 1):
+        metrics.count("push_attempts")
+        metrics.count("push_retries", int(attempt > 1))
+        if attempt > 1:
+            with metrics.phase("sync"):
+                sync_with_remote(repo, remote, branch)
+
+        stats = update_index(repo, package_name, dist_dir=dist_dir, url_base=url_base, retention=retention, workers=workers, metrics=metrics)
+        if stats is None:
+            raise PublishError(f"Nothing to index for {package_name}.")
+
+        with metrics.phase("commit"):
+            git(repo, "add", "--all", ".")
+            changed = git(repo, "status", "--porcelain")
+            if changed:
+                git(repo, "commit", "--quiet", "-m", message)
+        if not changed:
+            print("No changes to commit")
+            return {"attempts": attempt, "retries": attempt - 1, "pushed": False, "stats": stats}
+
+        with metrics.phase("push"):
+            push = subprocess.run(["git", "push", "--quiet", remote, f"HEAD:{branch}"], cwd=repo, capture_output=True, text=True)
+        if push.returncode == 0:
+            print(f"Pushed index update for {package_name} (attempt {attempt}/{attempts}).")
+            return {"attempts": attempt, "retries": attempt - 1, "pushed": True, "stats": stats}
+
+        if attempt < attempts:
+            delay = min(MAX_BACKOFF, backoff * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+            print(f"Push rejected (attempt {attempt}/{attempts}), retrying in {delay:.1f}s: {push.stderr.strip().splitlines()[0] if push.stderr.strip() else 'unknown error'}")
+            with metrics.phase("backoff"):
+                time.sleep(delay)
+
+    raise PublishError(f"Could not push the index update for {package_name} after {attempts} attempt(s).")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m py_toml_builder.publish", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("package", help="Package name as in pyproject.toml.")
+    parser.add_argument("--root", default=".", help="Path to the index repository checkout (default: current directory).")
+    parser.add_argument("--dist", default=None, help="Directory with the newly built distributions to add (e.g. 'dist').")
+    parser.add_argument("--url-base", default=None, help="Link the distributions at '<URL_BASE>/<filename>' instead of committing them.")
+    parser.add_argument("--retention", default=None, help="Retention policy applied to the package, e.g. 'keep-last=10,yank'.")
+    parser.add_argument("--message", default=None, help="Commit message for the index update.")
+    parser.add_argument("--remote", default="origin", help="Remote to fetch from and push to (default: origin).")
+    parser.add_argument("--attempts", type=int, default=DEFAULT_ATTEMPTS, help=f"Maximum number of push attempts (default: {DEFAULT_ATTEMPTS}).")
+    parser.add_argument("--backoff", type=float, default=DEFAULT_BACKOFF, help=f"Initial retry delay in seconds (default: {DEFAULT_BACKOFF}).")
+    parser.add_argument("--workers", type=int, default=None, help="Number of hashing threads.")
+    parser.add_argument("--metrics", default=None, help="Merge phase timings and counters into this JSON file (see metrics.py).")
+    args = parser.parse_args(argv)
+    if args.url_base and not args.dist:
+        parser.error("--url-base requires --dist")
+
+    metrics = Metrics()
+    try:
+        publish(args.root, args.package, dist_dir=args.dist, url_base=args.url_base, retention=args.retention, message=args.message,
+                remote=args.remote, attempts=args.attempts, backoff=args.backoff, workers=args.workers, metrics=metrics)
+    except (PublishError, subprocess.CalledProcessError, ValueError) as e:
+        detail = getattr(e, "stderr", None)
+        print(f"Error: {e}" + (f"\n{detail.strip()}" if detail else ""), file=sys.stderr)
+        return 1
+    finally:
+        if args.metrics:
+            metrics.write_json(args.metrics)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
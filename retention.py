@@ -0,0 +1,102 @@
+"""
+Retention policies that bound how many releases a package keeps in the index.
+
+A policy is written as a comma-separated list of rules, e.g. 'keep-last=10,keep-latest-patch,yank':
+
+    keep-last=N        keep the N newest versions
+    keep-since=DATE    keep versions first published on or after DATE (YYYY-MM-DD)
+    keep-latest-patch  keep the newest patch release of every major.minor series
+    yank               mark pruned files as yanked (PEP 592) instead of deleting them
+
+A version is kept if any keep rule matches it; the newest version is always kept.
+"""
+from datetime import date
+
+try:
+    from .validation import parse_version
+except ImportError:
+    from validation import parse_version
+
+RULES = ("keep-last", "keep-since", "keep-latest-patch", "yank")
+YANK_REASON = "Removed by retention policy"
+
+_PRE_ORDER = {"a": 0, "b": 1, "rc": 2}
+
+
+def version_key(version):
+    """
+    Sort key following PEP 440 ordering (epoch, release, pre, post, dev; local labels are ignored).
+    Unparseable versions sort before every valid one.
+    """
+    parsed = parse_version(version)
+    if parsed is None:
+        return (-1, (), version)
+    release = parsed.release
+    while len(release) > 1 and release[-1] == 0:
+        release = release[:-1]
+    if parsed.pre:
+        pre = (_PRE_ORDER[parsed.pre[0]], parsed.pre[1])
+    elif parsed.dev is not None and parsed.post is None:
+        pre = (-1, 0) # X.Y.devN sorts before X.YaN
+    else:
+        pre = (3, 0) # Final release
+    post = parsed.post if parsed.post is not None else -1
+    dev = parsed.dev if parsed.dev is not None else float("inf")
+    return (parsed.epoch, release, pre, post, dev)
+
+
+def parse_policy(spec):
+    """Parses a policy string into a dict. Raises ValueError for unknown rules or bad values."""
+    policy = {"keep_last": None, "keep_since": None, "keep_latest_patch": False, "yank": False}
+    for rule in filter(None, (part.strip() for part in (spec or "").split(","))):
+        name, _, value = rule.partition("=")
+        name = name.strip().lower()
+        value = value.strip()
+        if name == "keep-last":
+            if not value.isdigit() or int(value) < 1:
+                raise ValueError(f"keep-last expects a positive integer, got '{value}'")
+            policy["keep_last"] = int(value)
+        elif name == "keep-since":
+            try:
+                policy["keep_since"] = date.fromisoformat(value)
+            except ValueError:
+                raise ValueError(f"keep-since expects a date (YYYY-MM-DD), got '{value}'") from None
+        elif name in ("keep-latest-patch", "yank"):
+            if value:
+                raise ValueError(f"{name} takes no value")
+            policy[name.replace("-", "_")] = True
+        else:
+            raise ValueError(f"Unknown retention rule '{name}' (expected one of {', '.join(RULES)})")
+    return policy
+
+
+def has_keep_rules(policy):
+    """True if the policy restricts anything; a policy with only 'yank' keeps every version."""
+    return bool(policy["keep_last"] or policy["keep_since"] or policy["keep_latest_patch"])
+
+
+def select_pruned_versions(versions, policy):
+    """
+    Returns the versions the policy removes. 'versions' maps each version to the ISO 8601 time it
+    was first published (or None if unknown; such versions are kept by 'keep-since').
+    """
+    if not versions or not has_keep_rules(policy):
+        return set()
+
+    ordered = sorted(versions, key=version_key, reverse=True)
+    kept = {ordered[0]}
+    if policy["keep_last"]:
+        kept.update(ordered[:policy["keep_last"]])
+    if policy["keep_since"]:
+        for version, published in versions.items():
+            if published is None or date.fromisoformat(published[:10]) >= policy["keep_since"]:
+                kept.add(version)
+    if policy["keep_latest_patch"]:
+        seen_series = set()
+        for version in ordered:
+            key = version_key(version)
+            series = (key[0], (key[1] + (0, 0))[:2])
+            if series not in seen_series:
+                seen_series.add(series)
+                kept.add(version)
+    return set(versions) - kept
@@ -0,0 +1,297 @@
+"""
+Local PEP 503/691 server for a generated index directory.
+
+Serves the HTML/JSON pages, '.metadata' sidecars and artifacts the same way GitHub Pages does, plus:
+
+    - content negotiation between 'index.html' and 'index.json' for directory URLs (PEP 691),
+    - strong ETags (content SHA-256, taken from the '.digests.json' cache for artifacts) with
+      'If-None-Match' / 304 responses,
+    - single-range 'Range' requests (206/416) for artifacts,
+    - a bounded pool of worker threads, so many resolvers can hit it at once without a thread each.
+
+Dotfiles and dot directories ('.git', '.digests.json', ...) are not served, as on GitHub Pages.
+
+    py-toml-builder serve <index-dir> [--host 127.0.0.1] [--port 8000] [--workers 64]
+"""
+import os
+import sys
+import mimetypes
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from http.server import HTTPServer, SimpleHTTPRequestHandler
+from urllib.parse import unquote, urlsplit
+
+try:
+    from .index import DIGEST_CACHE_FILENAME, hash_file, load_digest_cache
+except ImportError:
+    from index import DIGEST_CACHE_FILENAME, hash_file, load_digest_cache
+
+DEFAULT_WORKERS = 64
+KEEP_ALIVE_TIMEOUT = 15 # Seconds an idle keep-alive connection may hold a worker
+
+JSON_CONTENT_TYPE = "application/vnd.pypi.simple.v1+json"
+HTML_CONTENT_TYPE = "application/vnd.pypi.simple.v1+html"
+# Served representation and file for each media type a resolver may ask for
+PAGE_TYPES = {
+    JSON_CONTENT_TYPE: ("index.json", JSON_CONTENT_TYPE),
+    "application/vnd.pypi.simple.latest+json": ("index.json", JSON_CONTENT_TYPE),
+    HTML_CONTENT_TYPE: ("index.html", HTML_CONTENT_TYPE),
+    "application/vnd.pypi.simple.latest+html": ("index.html", HTML_CONTENT_TYPE),
+    "text/html": ("index.html", "text/html"),
+}
+# Order in which equally preferred types are chosen (JSON first, as pip and uv prefer it)
+PAGE_TYPE_PREFERENCE = list(PAGE_TYPES)
+
+
+def negotiate_page(accept_header):
+    """
+    Picks (filename, content type) for a directory URL from an Accept header, following the q-values.
+    Without an Accept header the HTML page is served; returns None if nothing acceptable exists.
+    """
+    if not accept_header:
+        return PAGE_TYPES["text/html"]
+
+    candidates = []
+    for item in accept_header.split(","):
+        media_type, *params = [part.strip() for part in item.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality <= 0:
+            continue
+        if media_type in ("*/*", "application/*", "text/*"):
+            candidates.append((quality, len(PAGE_TYPE_PREFERENCE), "text/html"))
+        elif media_type in PAGE_TYPES:
+            candidates.append((quality, PAGE_TYPE_PREFERENCE.index(media_type), media_type))
+    if not candidates:
+        return None
+    _, _, media_type = max(candidates, key=lambda candidate: (candidate[0], -candidate[1]))
+    return PAGE_TYPES[media_type]
+
+
+class ETagCache:
+    """
+    Content-hash ETags, recomputed only when a file's size or mtime changes. Artifacts reuse the
+    digest of their package's '.digests.json' when the size matches, so they are never hashed here.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._digest_caches = {}
+
+    def cached_digest(self, path, stat):
+        """SHA-256 of an artifact from its package's digest cache, or None if it isn't cached with this size."""
+        directory, filename = os.path.split(path)
+        try:
+            cache_stat = os.stat(os.path.join(directory, DIGEST_CACHE_FILENAME))
+        except OSError:
+            return None
+        key = (cache_stat.st_size, cache_stat.st_mtime_ns)
+        with self._lock:
+            cached = self._digest_caches.get(directory)
+        if not cached or cached[0] != key:
+            cached = (key, load_digest_cache(directory))
+            with self._lock:
+                self._digest_caches[directory] = cached
+        entry = cached[1].get(filename)
+        if isinstance(entry, dict) and not entry.get("url") and entry.get("sha256") and entry.get("size") == stat.st_size:
+            return entry["sha256"]
+        return None
+
+    def get(self, path, stat):
+        key = (stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            cached = self._entries.get(path)
+        if cached and cached[0] == key:
+            return cached[1]
+        etag = f'"{self.cached_digest(path, stat) or hash_file(path)}"'
+        with self._lock:
+            self._entries[path] = (key, etag)
+        return etag
+
+
+def parse_range(header, size):
+    """
+    Parses a single 'bytes=' range. Returns (start, end) inclusive, None to serve the whole file
+    (missing, multi-range or non-byte ranges), or False if the range can't be satisfied.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start_text, _, end_text = header[len("bytes="):].strip().partition("-")
+    try:
+        if not start_text:
+            length = int(end_text)
+            if length <= 0:
+                return False
+            return max(0, size - length), size - 1
+        start = int(start_text)
+        end = int(end_text) if end_text else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        return False
+    return start, min(end, size - 1)
+
+
+class IndexRequestHandler(SimpleHTTPRequestHandler):
+    """Serves an index directory with PEP 691 content negotiation, ETags and Range support."""
+
+    protocol_version = "HTTP/1.1" # Keep-alive, so resolvers reuse connections
+    timeout = KEEP_ALIVE_TIMEOUT
+    etags = ETagCache()
+    copy_chunk_size = 1024 * 1024
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        self.serve(send_body=True)
+
+    def do_HEAD(self):
+        self.serve(send_body=False)
+
+    def resolve(self):
+        """
+        Maps the request path to (file path, content type), applying content negotiation to directories.
+        Paths with a dot-prefixed segment (dotfiles, '.git', '..') map to None.
+        """
+        url_path = unquote(urlsplit(self.path).path)
+        if any(segment.startswith(".") for segment in url_path.split("/")):
+            return None, None
+        relative = os.path.normpath(url_path.lstrip("/")) if url_path.strip("/") else ""
+        path = os.path.join(self.directory, relative)
+
+        if os.path.isdir(path):
+            if not url_path.endswith("/"):
+                return path, "redirect"
+            page = negotiate_page(self.headers.get("Accept"))
+            if page is None:
+                return path, "not-acceptable"
+            filename, content_type = page
+            return os.path.join(path, filename), content_type
+
+        if path.endswith(".metadata"):
+            return path, "text/plain; charset=utf-8"
+        if path.endswith("index.json"):
+            return path, JSON_CONTENT_TYPE
+        return path, mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+    def serve(self, send_body):
+        path, content_type = self.resolve()
+        if path is None:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        if content_type == "redirect":
+            self.send_response(HTTPStatus.MOVED_PERMANENTLY)
+            self.send_header("Location", urlsplit(self.path).path + "/")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if content_type == "not-acceptable":
+            self.send_error(HTTPStatus.NOT_ACCEPTABLE)
+            return
+
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        if not os.path.isfile(path):
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+
+        etag = self.etags.get(path, stat)
+        if etag in [tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")]:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.send_header("Vary", "Accept")
+            self.end_headers()
+            return
+
+        size = stat.st_size
+        byte_range = parse_range(self.headers.get("Range"), size)
+        if_range = self.headers.get("If-Range")
+        if if_range and if_range.strip() != etag:
+            byte_range = None # The client's partial copy is stale; send the whole file
+        if byte_range is False:
+            self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        start, end = byte_range if byte_range else (0, size - 1)
+        length = end - start + 1 if size else 0
+        self.send_response(HTTPStatus.PARTIAL_CONTENT if byte_range else HTTPStatus.OK)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(length))
+        self.send_header("ETag", etag)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Vary", "Accept")
+        self.send_header("Last-Modified", self.date_time_string(int(stat.st_mtime)))
+        if byte_range:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.end_headers()
+        if send_body and length:
+            self.copy_range(path, start, length)
+
+    def copy_range(self, path, start, length):
+        """Streams 'length' bytes from 'start' in fixed-size chunks."""
+        with open(path, "rb") as f:
+            f.seek(start)
+            while length > 0:
+                chunk = f.read(min(self.copy_chunk_size, length))
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                length -= len(chunk)
+
+
+class IndexServer(HTTPServer):
+    """HTTP server that handles connections on a bounded thread pool; further connections wait in its queue."""
+
+    request_queue_size = 1024 # Listen backlog for load tests with many concurrent clients
+
+    def __init__(self, address, directory, quiet=False, workers=DEFAULT_WORKERS):
+        self.quiet = quiet
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="index-server")
+        handler = lambda *args, **kwargs: IndexRequestHandler(*args, directory=directory, **kwargs)
+        super().__init__(address, handler)
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self.process_request_in_worker, request, client_address)
+
+    def process_request_in_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def serve(directory, host="127.0.0.1", port=8000, quiet=False, workers=DEFAULT_WORKERS):
+    """Serves an index directory until interrupted. Returns the exit code."""
+    if not os.path.isdir(directory):
+        print(f"Error: '{directory}' is not a directory.", file=sys.stderr)
+        return 2
+    with IndexServer((host, port), os.path.abspath(directory), quiet=quiet, workers=workers) as server:
+        print(f"Serving {directory} at http://{host}:{server.server_address[1]}/ with {workers} worker threads (Ctrl+C to stop)")
+        print(f"    pip download --index-url http://{host}:{server.server_address[1]}/ <package>")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    return 0
@@ -0,0 +1,84 @@
+"""
+Shared fixtures. The modules are imported from the repository root (the package directory), the
+same way the scripts and benchmarks/bench_index.py import them.
+"""
+import io
+import os
+import re
+import sys
+import tarfile
+import zipfile
+import subprocess
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+
+def run_git(cwd, *args):
+    """Runs git in 'cwd' and returns its stripped stdout."""
+    return subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True, check=True).stdout.strip()
+
+
+def distribution_name(name):
+    """Distribution filename form of a project name (runs of '-', '_' and '.' become '_')."""
+    return re.sub(r"[-_.]+", "_", name)
+
+
+def write_wheel(directory, name, version, requires_python=None, payload=b"payload"):
+    """Writes a minimal wheel with a METADATA file and returns its path."""
+    dist_name = distribution_name(name)
+    path = os.path.join(directory, f"{dist_name}-{version}-py3-none-any.whl")
+    metadata = f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n"
+    if requires_python:
+        metadata += f"Requires-Python: {requires_python}\n"
+    with zipfile.ZipFile(path, "w") as wheel:
+        wheel.writestr(f"{dist_name}-{version}.dist-info/METADATA", metadata + "\n")
+        wheel.writestr(f"{dist_name}/payload.bin", payload)
+    return path
+
+
+def write_sdist(directory, name, version):
+    """Writes a minimal sdist with a PKG-INFO file and returns its path."""
+    dist_name = distribution_name(name)
+    path = os.path.join(directory, f"{dist_name}-{version}.tar.gz")
+    pkg_info = f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n\n".encode()
+    with tarfile.open(path, "w:gz") as archive:
+        member = tarfile.TarInfo(f"{dist_name}-{version}/PKG-INFO")
+        member.size = len(pkg_info)
+        archive.addfile(member, io.BytesIO(pkg_info))
+    return path
+
+
+@pytest.fixture(autouse=True)
+def git_identity(monkeypatch):
+    """Lets tests (and the subprocesses they start) commit without a global git configuration."""
+    for variable in ("GIT_AUTHOR_NAME", "GIT_COMMITTER_NAME"):
+        monkeypatch.setenv(variable, "Test")
+    for variable in ("GIT_AUTHOR_EMAIL", "GIT_COMMITTER_EMAIL"):
+        monkeypatch.setenv(variable, "test@example.com")
+
+
+@pytest.fixture
+def index_remote(tmp_path):
+    """A bare index repository with one commit on 'main', standing in for the GitHub index repository."""
+    remote = tmp_path / "index.git"
+    run_git(tmp_path, "init", "--quiet", "--bare", "--initial-branch=main", str(remote))
+    seed = tmp_path / "seed"
+    run_git(tmp_path, "clone", "--quiet", str(remote), str(seed))
+    (seed / "README.md").write_text("Python index\n")
+    run_git(seed, "add", "README.md")
+    run_git(seed, "commit", "--quiet", "-m", "Initial commit")
+    run_git(seed, "push", "--quiet", "origin", "HEAD:main")
+    return remote
+
+
+@pytest.fixture
+def clone_index(tmp_path, index_remote):
+    """Returns a function that clones the index repository into a new directory below tmp_path."""
+    def clone(name):
+        path = tmp_path / name
+        run_git(tmp_path, "clone", "--quiet", "--branch", "main", str(index_remote), str(path))
+        return path
+    return clone
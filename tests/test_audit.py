@@ -0,0 +1,133 @@
+import os
+import json
+import shutil
+
+import pytest
+
+import audit
+import index
+from conftest import run_git, write_sdist, write_wheel
+
+
+@pytest.fixture
+def index_root(tmp_path):
+    """An index with one package (a wheel and an sdist), committed to git."""
+    root = tmp_path / "index"
+    dist = tmp_path / "dist"
+    dist.mkdir()
+    write_wheel(str(dist), "my-pkg", "1.0")
+    write_sdist(str(dist), "my-pkg", "1.0")
+    index.update_index(str(root), "my-pkg", dist_dir=str(dist))
+    run_git(root, "init", "--quiet")
+    run_git(root, "add", ".")
+    run_git(root, "commit", "--quiet", "-m", "Index")
+    return root
+
+
+SDIST = os.path.join("my-pkg", "my_pkg-1.0.tar.gz")
+WHEEL = os.path.join("my-pkg", "my_pkg-1.0-py3-none-any.whl")
+
+
+def kinds(problems):
+    return sorted((problem.package, problem.filename, problem.kind) for problem in problems)
+
+
+def page_files(root):
+    return {name: (root / "my-pkg" / name).read_bytes() for name in ("index.html", "index.json", index.DIGEST_CACHE_FILENAME)}
+
+
+def test_consistent_index_has_no_problems(index_root):
+    assert audit.audit_index(str(index_root)) == []
+    assert audit.run_audit(str(index_root)) == 0
+
+
+def test_corrupted_artifact_is_restored_from_git(index_root):
+    original = (index_root / SDIST).read_bytes()
+    with open(index_root / SDIST, "ab") as f:
+        f.write(b"garbage")
+
+    assert kinds(audit.audit_index(str(index_root))) == [("my-pkg", "my_pkg-1.0.tar.gz", audit.CORRUPT_FILE)]
+    assert audit.run_audit(str(index_root), repair=True) == 0
+
+    assert (index_root / SDIST).read_bytes() == original
+    # Only the root manifest's last_updated timestamp may change
+    assert run_git(index_root, "status", "--porcelain", "--", "my-pkg") == ""
+
+
+def test_corrupted_artifact_without_a_good_copy_is_not_republished(index_root, capsys):
+    # The corruption is committed too, so git has no copy that matches the published digest
+    with open(index_root / SDIST, "ab") as f:
+        f.write(b"garbage")
+    run_git(index_root, "commit", "--quiet", "-am", "Corrupt")
+    pages = page_files(index_root)
+
+    assert audit.run_audit(str(index_root), repair=True) == 1
+
+    assert page_files(index_root) == pages
+    assert "Not regenerating my-pkg" in capsys.readouterr().out
+    assert kinds(audit.audit_index(str(index_root))) == [("my-pkg", "my_pkg-1.0.tar.gz", audit.CORRUPT_FILE)]
+
+
+def test_corrupted_artifact_outside_git_is_not_republished(index_root):
+    shutil.rmtree(index_root / ".git")
+    (index_root / SDIST).write_bytes(b"replaced")
+    pages = page_files(index_root)
+
+    assert audit.run_audit(str(index_root), repair=True) == 1
+    assert page_files(index_root) == pages
+
+
+def test_stale_pages_are_regenerated(index_root):
+    sha256 = index.hash_file(str(index_root / WHEEL))
+    page = index_root / "my-pkg" / "index.html"
+    page.write_text(page.read_text().replace(sha256, "0" * 64))
+    (index_root / "my-pkg" / "index.json").unlink()
+
+    assert kinds(audit.audit_index(str(index_root))) == [
+        ("my-pkg", "index.json", audit.MISSING_PAGE),
+        ("my-pkg", "my_pkg-1.0-py3-none-any.whl", audit.DIGEST_MISMATCH),
+        ("my-pkg", "my_pkg-1.0-py3-none-any.whl", audit.UNLISTED_FILE),
+        ("my-pkg", "my_pkg-1.0.tar.gz", audit.UNLISTED_FILE),
+    ]
+    assert audit.run_audit(str(index_root), repair=True) == 0
+    assert f"#sha256={sha256}" in page.read_text()
+
+
+def test_missing_artifact_is_restored_from_git(index_root):
+    original = (index_root / WHEEL).read_bytes()
+    (index_root / WHEEL).unlink()
+
+    assert kinds(audit.audit_index(str(index_root))) == [("my-pkg", "my_pkg-1.0-py3-none-any.whl", audit.MISSING_FILE)]
+    assert audit.run_audit(str(index_root), repair=True) == 0
+    assert (index_root / WHEEL).read_bytes() == original
+
+
+def test_unlisted_files_and_projects_are_indexed(index_root, tmp_path):
+    write_wheel(str(index_root / "my-pkg"), "my-pkg", "1.1")
+    (index_root / "other").mkdir()
+    write_wheel(str(index_root / "other"), "other", "2.0")
+    manifest = json.loads((index_root / index.ROOT_MANIFEST_FILENAME).read_text())
+    manifest["projects"]["dead"] = {"name": "dead", "last_updated": None, "files": 1}
+    (index_root / index.ROOT_MANIFEST_FILENAME).write_text(json.dumps(manifest))
+
+    assert kinds(audit.audit_index(str(index_root))) == [
+        ("<root>", "dead", audit.DEAD_PROJECT),
+        ("<root>", "other", audit.UNLISTED_PROJECT),
+        ("my-pkg", "my_pkg-1.1-py3-none-any.whl", audit.UNLISTED_FILE),
+        ("other", "index.html", audit.MISSING_PAGE),
+        ("other", "index.json", audit.MISSING_PAGE),
+        ("other", "other-2.0-py3-none-any.whl", audit.UNLISTED_FILE),
+    ]
+    assert audit.run_audit(str(index_root), repair=True) == 0
+    assert sorted(index.load_root_manifest(str(index_root))) == ["my-pkg", "other"]
+
+
+def test_json_report_is_a_single_document(index_root, capsys):
+    with open(index_root / SDIST, "ab") as f:
+        f.write(b"garbage")
+
+    assert audit.run_audit(str(index_root), repair=True, output_format="json") == 0
+
+    report = json.loads(capsys.readouterr().out)
+    assert [problem["kind"] for problem in report["problems"]] == [audit.CORRUPT_FILE]
+    assert report["remaining"] == []
@@ -0,0 +1,130 @@
+import os
+import json
+import tomllib
+
+import pytest
+
+import batch
+
+SHARED = {"github_username": "me", "pypi_index_repo_name": "my-python-index", "pat_secret_name": "INDEX_PAT"}
+
+
+def make_record(**fields):
+    record = {
+        "package_name": "my-pkg",
+        "package_version": "0.1.0",
+        "your_name": "Jane Doe",
+        "your_email": "jane@example.com",
+        "short_description": "A tool.",
+        "package_github_url": "https://github.com/me/my-pkg",
+    }
+    record.update(fields)
+    return record
+
+
+def error_fields(record):
+    return [error.field for error in batch.validate_record(record)]
+
+
+def test_render_record_escapes_toml_strings(tmp_path):
+    description = 'Says "hello" \\ and\tmore'
+    record = make_record(your_name='Jane "JD" Doe', short_description=description, cli_command_name="my.cli", cli_entry_point="my_pkg.main:run")
+
+    name, ok, output_dir = batch.render_record(record, SHARED, str(tmp_path))
+
+    assert ok, output_dir
+    with open(os.path.join(output_dir, "pyproject.toml"), "rb") as f:
+        project = tomllib.load(f)["project"]
+    assert project["description"] == description
+    assert project["authors"] == [{"name": 'Jane "JD" Doe', "email": "jane@example.com"}]
+    assert project["scripts"] == {"my.cli": "my_pkg.main:run"}
+
+
+@pytest.mark.parametrize("output_dir", ["../escaped", "a/../../escaped", "/tmp/escaped"])
+def test_output_dir_outside_the_output_root_is_rejected(tmp_path, output_dir):
+    root = tmp_path / "out"
+    root.mkdir()
+    record = make_record(output_dir=output_dir)
+
+    assert "output_dir" in error_fields(record)
+    name, ok, message = batch.render_record(record, SHARED, str(root))
+    assert not ok
+    assert not (tmp_path / "escaped").exists()
+
+
+def test_output_dir_symlink_out_of_the_output_root_is_rejected(tmp_path):
+    root = tmp_path / "out"
+    root.mkdir()
+    (tmp_path / "elsewhere").mkdir()
+    (root / "link").symlink_to(tmp_path / "elsewhere")
+
+    name, ok, message = batch.render_record(make_record(output_dir="link"), SHARED, str(root))
+
+    assert not ok
+    assert "outside the output directory" in message
+    assert os.listdir(tmp_path / "elsewhere") == []
+
+
+def test_output_dir_inside_the_output_root_is_accepted(tmp_path):
+    name, ok, output_dir = batch.render_record(make_record(output_dir="services/my-pkg"), SHARED, str(tmp_path))
+
+    assert ok
+    assert os.path.exists(os.path.join(tmp_path, "services", "my-pkg", "pyproject.toml"))
+
+
+@pytest.mark.parametrize("cli_command_name", [5, "my cli", "my=cli", '"quoted"'])
+def test_invalid_cli_command_names_are_rejected(cli_command_name):
+    record = make_record(cli_command_name=cli_command_name, cli_entry_point="my_pkg.main:run")
+
+    assert "cli_command_name" in error_fields(record)
+
+
+def test_valid_record_has_no_errors():
+    assert batch.validate_record(make_record(cli_command_name="my-cli", cli_entry_point="my_pkg.main:run")) == []
+
+
+@pytest.mark.parametrize("line", ["5", "null", '"my-pkg"', "[]"])
+def test_jsonl_lines_that_are_not_objects_are_reported_with_their_line_number(tmp_path, line):
+    manifest = tmp_path / "packages.jsonl"
+    manifest.write_text('{"shared": {}}\n\n' + line + "\n")
+
+    with pytest.raises(batch.ManifestError, match=r"packages\.jsonl:3: expected a JSON object"):
+        batch.load_manifest(str(manifest))
+    assert batch.run_batch(str(manifest), str(tmp_path / "out")) == 2
+
+
+def test_records_with_the_same_output_directory_all_fail(tmp_path, capsys):
+    manifest = tmp_path / "packages.json"
+    manifest.write_text(json.dumps({"shared": SHARED, "packages": [
+        make_record(package_name="a"),
+        make_record(package_name="b"),
+        make_record(package_name="a", short_description="Another a."),
+        make_record(package_name="c", output_dir="b"),
+    ]}))
+    output_root = tmp_path / "out"
+
+    assert batch.run_batch(str(manifest), str(output_root), jobs=2) == 1
+
+    output = capsys.readouterr().out
+    assert output.count("FAIL") == 4
+    assert "is also used by record 2 (a)" in output and "is also used by record 0 (a)" in output
+    assert "is also used by record 3 (c)" in output and "is also used by record 1 (b)" in output
+    assert "0 succeeded, 4 failed." in output
+    assert not output_root.exists() or os.listdir(output_root) == []
+
+
+def test_records_with_distinct_output_directories_succeed(tmp_path, capsys):
+    manifest = tmp_path / "packages.json"
+    manifest.write_text(json.dumps({"shared": SHARED, "packages": [
+        make_record(package_name="a"),
+        make_record(package_name="b", output_dir="services/b"),
+        make_record(package_name="c", package_version="one"),
+        make_record(package_name="c", output_dir="c"),
+    ]}))
+
+    assert batch.run_batch(str(manifest), str(tmp_path / "out"), jobs=2) == 1
+
+    output = capsys.readouterr().out
+    assert "3 succeeded, 1 failed." in output
+    assert "not a valid PEP 440 version" in output
+    assert os.path.exists(tmp_path / "out" / "services" / "b" / "pyproject.toml")
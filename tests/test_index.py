@@ -0,0 +1,153 @@
+import os
+import json
+import hashlib
+import subprocess
+
+import pytest
+
+import index
+from conftest import run_git, write_sdist, write_wheel
+
+CHUNK_SIZE = 64
+
+
+@pytest.mark.parametrize("size", [0, 1, CHUNK_SIZE - 1, CHUNK_SIZE, CHUNK_SIZE + 1, 3 * CHUNK_SIZE + 5])
+def test_hash_file_matches_hashlib_across_chunk_boundaries(tmp_path, size):
+    data = os.urandom(size)
+    path = tmp_path / "artifact.bin"
+    path.write_bytes(data)
+
+    assert index.hash_file(str(path), chunk_size=CHUNK_SIZE) == hashlib.sha256(data).hexdigest()
+
+
+@pytest.mark.parametrize("size", [0, CHUNK_SIZE, 3 * CHUNK_SIZE + 5])
+def test_digest_file_returns_sha256_and_git_blob_id(tmp_path, size):
+    data = os.urandom(size)
+    path = tmp_path / "artifact.bin"
+    path.write_bytes(data)
+
+    sha256, blob_id = index.digest_file(str(path), chunk_size=CHUNK_SIZE)
+
+    assert sha256 == hashlib.sha256(data).hexdigest()
+    assert blob_id == subprocess.run(["git", "hash-object", str(path)], capture_output=True, text=True, check=True).stdout.strip()
+
+
+def test_hash_files_uses_thread_pool_and_keeps_paths(tmp_path):
+    expected = {}
+    for number in range(50):
+        data = os.urandom(number * 37)
+        path = tmp_path / f"file-{number}.bin"
+        path.write_bytes(data)
+        expected[str(path)] = hashlib.sha256(data).hexdigest()
+
+    assert index.hash_files(list(expected), workers=4) == expected
+    assert index.hash_files([], workers=4) == {}
+
+
+def test_git_blob_ids_match_the_digest_cache(tmp_path):
+    run_git(tmp_path, "init", "--quiet")
+    wheel = write_wheel(str(tmp_path), "foo", "1.0")
+    run_git(tmp_path, "add", ".")
+
+    assert index.git_blob_ids(str(tmp_path)) == {os.path.basename(wheel): index.digest_file(wheel)[1]}
+
+
+def read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def test_cli_builds_pages_and_reuses_cached_digests(tmp_path):
+    dist = tmp_path / "dist"
+    dist.mkdir()
+    wheel = write_wheel(str(dist), "My.Pkg", "1.0", requires_python=">=3.8")
+    sdist = write_sdist(str(dist), "My.Pkg", "1.0")
+    root = tmp_path / "index"
+    root.mkdir()
+    metrics_path = tmp_path / "metrics.json"
+
+    assert index.main(["My.Pkg", "--root", str(root), "--dist", str(dist), "--metrics", str(metrics_path)]) == 0
+
+    package_dir = root / "my-pkg"
+    wheel_name, sdist_name = os.path.basename(wheel), os.path.basename(sdist)
+    page = (package_dir / "index.html").read_text()
+    assert f'href="{wheel_name}#sha256={index.hash_file(wheel)}"' in page
+    assert 'data-requires-python="&gt;=3.8"' in page
+    assert f'href="{sdist_name}#sha256={index.hash_file(sdist)}"' in page
+    document = read_json(package_dir / "index.json")
+    assert document["name"] == "my-pkg"
+    assert document["versions"] == ["1.0"]
+    assert sorted(entry["filename"] for entry in document["files"]) == sorted([sdist_name, wheel_name])
+    assert (package_dir / (wheel_name + index.METADATA_SUFFIX)).exists()
+    assert read_json(root / index.ROOT_MANIFEST_FILENAME)["projects"]["my-pkg"]["files"] == 2
+    assert 'href="my-pkg/"' in (root / "index.html").read_text()
+    assert read_json(metrics_path)["counters"]["files_hashed"] == 2
+
+    metrics_path.unlink()
+    assert index.main(["My.Pkg", "--root", str(root), "--metrics", str(metrics_path)]) == 0
+    counters = read_json(metrics_path)["counters"]
+    assert counters["files_hashed"] == 0
+    assert counters["files_cached"] == 2
+
+
+def test_cli_rejects_url_base_without_dist(tmp_path):
+    with pytest.raises(SystemExit) as error:
+        index.main(["foo", "--root", str(tmp_path), "--url-base", "https://example.com/assets"])
+    assert error.value.code == 2
+
+
+def test_cli_fails_without_a_package_directory(tmp_path):
+    assert index.main(["missing", "--root", str(tmp_path)]) == 1
+
+
+def write_legacy_index(root, directory, links):
+    """An index as the workflows before PEP 503 normalization left it: no manifest, hand-built root page."""
+    os.makedirs(root / directory, exist_ok=True)
+    index.write_simple_page(str(root / "index.html"), "Simple Index", ((f"{link}/", link, None) for link in links))
+
+
+def test_manifest_seeding_counts_files_in_the_linked_directory(tmp_path):
+    write_legacy_index(tmp_path, "my.pkg", ["my.pkg"])
+    write_wheel(str(tmp_path / "my.pkg"), "my.pkg", "0.9")
+
+    assert index.load_root_manifest(str(tmp_path)) == {"my-pkg": {"name": "my.pkg", "last_updated": None, "files": 1}}
+
+
+def test_update_moves_a_legacy_directory_and_keeps_its_releases(tmp_path):
+    root = tmp_path / "index"
+    write_legacy_index(root, "my.pkg", ["my.pkg"])
+    old_wheel = os.path.basename(write_wheel(str(root / "my.pkg"), "my.pkg", "0.9"))
+    dist = tmp_path / "dist"
+    dist.mkdir()
+    new_wheel = os.path.basename(write_wheel(str(dist), "my.pkg", "1.0"))
+
+    index.update_index(str(root), "my.pkg", dist_dir=str(dist))
+
+    assert not (root / "my.pkg").exists()
+    assert index.list_distributions(str(root / "my-pkg")) == [old_wheel, new_wheel]
+    assert read_json(root / "my-pkg" / "index.json")["versions"] == ["0.9", "1.0"]
+    assert index.read_links(str(root / "index.html")) == ["my-pkg/"]
+    assert read_json(root / index.ROOT_MANIFEST_FILENAME)["projects"]["my-pkg"]["files"] == 2
+
+
+def test_update_merges_a_legacy_directory_into_an_existing_one(tmp_path):
+    root = tmp_path / "index"
+    dist = tmp_path / "dist"
+    dist.mkdir()
+    write_wheel(str(dist), "my.pkg", "1.0")
+    index.update_index(str(root), "my.pkg", dist_dir=str(dist))
+    upload_times = {name: entry["upload_time"] for name, entry in index.load_digest_cache(str(root / "my-pkg")).items()}
+    # A legacy directory appearing next to the normalized one, e.g. from a concurrent old-style workflow
+    (root / "my.pkg").mkdir()
+    write_wheel(str(root / "my.pkg"), "my.pkg", "0.9")
+    write_wheel(str(root / "my.pkg"), "my.pkg", "1.0", payload=b"different build")
+    (root / "my.pkg" / "index.html").write_text("stale page")
+
+    index.update_index(str(root), "my.pkg")
+
+    assert not (root / "my.pkg").exists()
+    cache = index.load_digest_cache(str(root / "my-pkg"))
+    assert sorted(cache) == ["my_pkg-0.9-py3-none-any.whl", "my_pkg-1.0-py3-none-any.whl"]
+    # The normalized directory's copy of a release wins over the legacy one
+    assert cache["my_pkg-1.0-py3-none-any.whl"]["upload_time"] == upload_times["my_pkg-1.0-py3-none-any.whl"]
+    assert cache["my_pkg-1.0-py3-none-any.whl"]["sha256"] == index.hash_file(str(dist / "my_pkg-1.0-py3-none-any.whl"))
@@ -0,0 +1,118 @@
+import os
+import sys
+import json
+import subprocess
+
+import metrics
+from conftest import REPO_ROOT
+
+
+def run_metrics(path, *args, env=None):
+    """Runs the metrics CLI in its own process, as each workflow step does."""
+    return subprocess.run(
+        [sys.executable, os.path.join(REPO_ROOT, "metrics.py"), "--file", str(path), *args],
+        capture_output=True, text=True, env=env,
+    )
+
+
+def read(path):
+    return json.loads(path.read_text())
+
+
+def test_write_json_merges_into_an_existing_file(tmp_path):
+    path = tmp_path / "out" / "metrics.json"
+    first = metrics.Metrics()
+    first.add_time("build", 1.5)
+    first.count("files_hashed", 3)
+    first.write_json(str(path))
+
+    second = metrics.Metrics()
+    second.add_time("build", 0.25)
+    second.add_time("push", 2.0)
+    second.count("files_hashed", 2)
+    second.count("push_retries")
+    report = second.write_json(str(path))
+
+    assert report == read(path) == {"phases": {"build": 1.75, "push": 2.0}, "counters": {"files_hashed": 5, "push_retries": 1}}
+
+
+def test_phase_accumulates_repeated_blocks():
+    collected = metrics.Metrics()
+    for _ in range(3):
+        with collected.phase("push"):
+            pass
+
+    assert list(collected.phases) == ["push"]
+    assert collected.to_dict()["phases"]["push"] >= 0
+
+
+def test_unreadable_file_starts_a_new_report(tmp_path):
+    path = tmp_path / "metrics.json"
+    path.write_text("not json")
+    collected = metrics.Metrics()
+    collected.count("records", 2)
+
+    assert collected.write_json(str(path)) == {"phases": {}, "counters": {"records": 2}}
+
+
+def test_start_and_stop_across_processes(tmp_path):
+    path = tmp_path / "metrics.json"
+
+    assert run_metrics(path, "start", "clone_index").returncode == 0
+    assert list(read(path)["started"]) == ["clone_index"]
+    assert run_metrics(path, "time", "build", "--", sys.executable, "-c", "pass").returncode == 0
+    assert run_metrics(path, "stop", "clone_index").returncode == 0
+
+    report = read(path)
+    assert "started" not in report
+    assert list(report["phases"]) == ["build", "clone_index"]
+    assert report["phases"]["clone_index"] >= report["phases"]["build"] >= 0
+
+
+def test_stop_without_start_warns(tmp_path):
+    path = tmp_path / "metrics.json"
+
+    result = run_metrics(path, "stop", "push")
+
+    assert result.returncode == 0
+    assert "phase 'push' was never started" in result.stderr
+    assert not path.exists()
+
+
+def test_time_propagates_the_exit_code(tmp_path):
+    path = tmp_path / "metrics.json"
+
+    result = run_metrics(path, "time", "build", "--", sys.executable, "-c", "import sys; print('built'); sys.exit(3)")
+
+    assert result.returncode == 3
+    assert "built" in result.stdout
+    assert list(read(path)["phases"]) == ["build"]
+
+
+def test_time_without_a_command_is_an_error(tmp_path):
+    assert run_metrics(tmp_path / "metrics.json", "time", "build", "--").returncode == 2
+
+
+def test_summary_appends_to_the_step_summary(tmp_path):
+    path = tmp_path / "metrics.json"
+    path.write_text(json.dumps({"phases": {"build": 12.345, "push": 1}, "counters": {"push_attempts": 2}}))
+    summary = tmp_path / "step_summary.md"
+    summary.write_text("Earlier step\n")
+    env = dict(os.environ, **{metrics.STEP_SUMMARY_ENV: str(summary)})
+
+    result = run_metrics(path, "summary", "--title", "Release metrics for my-pkg", env=env)
+    assert result.returncode == 0
+    assert run_metrics(path, "summary", env=env).returncode == 0
+
+    content = summary.read_text()
+    assert content.startswith("Earlier step\n### Release metrics for my-pkg\n")
+    assert "| build | 12.35 |" in content and "| **total** | **13.35** |" in content
+    assert "| push_attempts | 2 |" in content
+    assert content.count("| Phase | Seconds |") == 2
+    assert "### Release metrics for my-pkg" in result.stdout
+
+
+def test_write_step_summary_outside_github_actions(monkeypatch):
+    monkeypatch.delenv(metrics.STEP_SUMMARY_ENV, raising=False)
+
+    assert metrics.write_step_summary({"phases": {}, "counters": {}}) is False
@@ -0,0 +1,155 @@
+import pytest
+
+import monorepo
+from conftest import run_git
+
+
+def write_project(directory, name, version="1.0", extra=""):
+    directory.mkdir(parents=True, exist_ok=True)
+    version_line = f'version = "{version}"\n' if version else 'dynamic = ["version"]\n'
+    (directory / "pyproject.toml").write_text(f'[project]\nname = "{name}"\n{version_line}{extra}')
+
+
+def commit(repo, message="Change"):
+    run_git(repo, "add", "--all")
+    run_git(repo, "commit", "--quiet", "--allow-empty", "-m", message)
+
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    run_git(repo, "init", "--quiet")
+    return repo
+
+
+def statuses(repo, force=False):
+    packages = monorepo.discover_packages(str(repo))
+    return {package["path"]: (status, tag) for package, status, tag in monorepo.detect_changes(str(repo), packages, force=force)}
+
+
+def test_root_package_ignores_changes_of_nested_packages(repo):
+    write_project(repo, "root")
+    write_project(repo / "pkgs" / "a", "a")
+    write_project(repo / "pkgs" / "b", "b")
+    commit(repo, "Initial")
+    for tag in ("root-v1.0", "a-v1.0", "b-v1.0"):
+        run_git(repo, "tag", tag)
+
+    (repo / "pkgs" / "a" / "module.py").write_text("x = 1\n")
+    write_project(repo / "pkgs" / "a", "a", "1.1")
+    commit(repo)
+
+    assert statuses(repo) == {
+        ".": (monorepo.UNCHANGED, "root-v1.0"),
+        "pkgs/a": (monorepo.CHANGED, "a-v1.0"),
+        "pkgs/b": (monorepo.UNCHANGED, "b-v1.0"),
+    }
+
+    (repo / "root.py").write_text("y = 2\n")
+    commit(repo)
+
+    assert statuses(repo)["."] == (monorepo.NOT_BUMPED, "root-v1.0")
+
+
+def test_discover_packages(repo):
+    write_project(repo / "services" / "api", "My_API", "2.0")
+    write_project(repo / "libs" / "core", "core", None)
+    write_project(repo / "libs" / "broken", "broken", "one")
+    (repo / "tools").mkdir()
+    (repo / "tools" / "pyproject.toml").write_text("[tool.ruff]\nline-length = 100\n")
+    (repo / "bad").mkdir()
+    (repo / "bad" / "pyproject.toml").write_text("[project\n")
+    for skipped in (".hidden", "build", "dist", ".venv", "node_modules"):
+        write_project(repo / skipped, skipped.strip("."))
+
+    packages = monorepo.discover_packages(str(repo))
+
+    assert [(package["path"], package["name"], package["normalized"], package["version"]) for package in packages] == [
+        ("libs/broken", "broken", "broken", "one"),
+        ("libs/core", "core", "core", None),
+        ("services/api", "My_API", "my-api", "2.0"),
+    ]
+    assert [error.field for error in packages[0]["errors"]] == ["project.version"]
+    assert packages[1]["errors"] == packages[2]["errors"] == []
+
+
+def test_discover_packages_reports_malformed_packages(repo):
+    write_project(repo, "root", extra='urls = ["a"]\n')
+    (repo / "odd").mkdir()
+    (repo / "odd" / "pyproject.toml").write_text('[project]\nname = ["odd"]\nversion = "1.0"\n')
+
+    packages = monorepo.discover_packages(str(repo))
+
+    assert [(package["path"], package["name"]) for package in packages] == [(".", "root"), ("odd", "")]
+    assert [error.field for error in packages[0]["errors"]] == ["project.urls"]
+    assert [error.field for error in packages[1]["errors"]] == ["project.name"]
+
+
+def test_last_release_tags(repo):
+    write_project(repo / "foo", "foo")
+    write_project(repo / "foo-viz", "foo-viz")
+    commit(repo, "Initial")
+    for tag in ("foo-v1.0", "foo-v1.10", "foo-v1.9", "foo-v2.0rc1", "foo-viz-v3.0", "foo-vnext", "unrelated-v9.0"):
+        run_git(repo, "tag", tag)
+    # A tag on another branch isn't a release of this history
+    run_git(repo, "checkout", "--quiet", "-b", "other")
+    commit(repo, "Elsewhere")
+    run_git(repo, "tag", "foo-v5.0")
+    run_git(repo, "checkout", "--quiet", "-")
+
+    packages = monorepo.discover_packages(str(repo))
+
+    assert monorepo.last_release_tags(str(repo), packages) == {"foo": "foo-v2.0rc1", "foo-viz": "foo-viz-v3.0"}
+    assert monorepo.last_release_tags(str(repo), [package for package in packages if package["name"] == "foo"]) == {"foo": "foo-v2.0rc1"}
+
+
+def test_detect_changes(repo):
+    for name in ("new", "unchanged", "changed", "not-bumped"):
+        write_project(repo / name, name)
+    write_project(repo / "dynamic", "dynamic", None)
+    write_project(repo / "invalid", "invalid", "one")
+    commit(repo, "Initial")
+    for name in ("unchanged", "changed", "not-bumped", "dynamic", "invalid"):
+        run_git(repo, "tag", f"{name}-v1.0")
+
+    write_project(repo / "changed", "changed", "1.1")
+    (repo / "not-bumped" / "module.py").write_text("x = 1\n")
+    (repo / "dynamic" / "module.py").write_text("x = 1\n")
+    commit(repo)
+
+    assert statuses(repo) == {
+        "changed": (monorepo.CHANGED, "changed-v1.0"),
+        "dynamic": (monorepo.DYNAMIC_VERSION, "dynamic-v1.0"),
+        "invalid": (monorepo.INVALID, "invalid-v1.0"),
+        "new": (monorepo.NEW, None),
+        "not-bumped": (monorepo.NOT_BUMPED, "not-bumped-v1.0"),
+        "unchanged": (monorepo.UNCHANGED, "unchanged-v1.0"),
+    }
+    forced = statuses(repo, force=True)
+    assert forced["unchanged"] == (monorepo.NOT_BUMPED, "unchanged-v1.0")
+    assert forced["changed"] == (monorepo.CHANGED, "changed-v1.0")
+
+
+def test_changed_writes_the_release_matrix_to_github_output(repo, tmp_path, capsys):
+    write_project(repo / "pkgs" / "my.pkg", "my.pkg", "1.1")
+    write_project(repo / "pkgs" / "other", "other")
+    commit(repo, "Initial")
+    run_git(repo, "tag", "other-v1.0")
+    output = tmp_path / "github_output"
+    output.write_text("earlier=1\n")
+
+    assert monorepo.main(["changed", "--root", str(repo), "--github-output", str(output)]) == 0
+
+    lines = output.read_text().splitlines()
+    assert lines[0] == "earlier=1"
+    assert lines[1] == 'packages=[{"name":"my.pkg","normalized":"my-pkg","legacy":"my.pkg","path":"pkgs/my.pkg","version":"1.1","tag":"my-pkg-v1.1"}]'
+    assert lines[2:] == ["any=true"]
+    assert "1 package(s) to release: my.pkg" in capsys.readouterr().out
+
+    run_git(repo, "tag", "my-pkg-v1.1")
+    assert monorepo.main(["changed", "--root", str(repo), "--github-output", str(output)]) == 0
+    assert output.read_text().splitlines()[3:] == ["packages=[]", "any=false"]
+
+    assert monorepo.main(["changed", "--root", str(repo), "--all", "--github-output", str(output)]) == 0
+    assert output.read_text().splitlines()[5:] == ["packages=[]", "any=false"] # Every version is already tagged
@@ -0,0 +1,75 @@
+import os
+import sys
+import json
+import hashlib
+import subprocess
+
+import index
+import publish
+from conftest import REPO_ROOT, run_git, write_sdist, write_wheel
+
+URL_BASE = "https://github.com/me/my-pkg/releases/download/v1.0"
+
+
+def test_release_asset_storage_links_assets_without_committing_them(tmp_path, index_remote, clone_index):
+    checkout = clone_index("checkout")
+    dist = tmp_path / "dist"
+    dist.mkdir()
+    wheel = write_wheel(str(dist), "my-pkg", "1.0", requires_python=">=3.9")
+    sdist = write_sdist(str(dist), "my-pkg", "1.0")
+
+    assert publish.main(["my-pkg", "--root", str(checkout), "--dist", str(dist), "--url-base", URL_BASE + "/"]) == 0
+
+    published = clone_index("published")
+    package_dir = published / "my-pkg"
+    page = (package_dir / "index.html").read_text()
+    document = json.loads((package_dir / "index.json").read_text())
+    files = {entry["filename"]: entry for entry in document["files"]}
+    for path in (wheel, sdist):
+        filename = os.path.basename(path)
+        with open(path, "rb") as f:
+            sha256 = hashlib.sha256(f.read()).hexdigest()
+        assert f'href="{URL_BASE}/{filename}#sha256={sha256}"' in page
+        assert files[filename]["url"] == f"{URL_BASE}/{filename}"
+        assert files[filename]["hashes"] == {"sha256": sha256}
+        assert files[filename]["size"] == os.path.getsize(path)
+
+    # Only pages and the digest cache are committed; the artifacts and their sidecars stay release assets
+    committed = run_git(published, "ls-tree", "-r", "--name-only", "HEAD").splitlines()
+    assert not [name for name in committed if name.endswith((".whl", ".tar.gz", index.METADATA_SUFFIX))]
+    assert sorted(name for name in committed if name.startswith("my-pkg/")) == ["my-pkg/.digests.json", "my-pkg/index.html", "my-pkg/index.json"]
+
+    # Resolvers fetch '<asset url>.metadata', so the sidecar is written into dist/ for upload
+    sidecar = wheel + index.METADATA_SUFFIX
+    with open(sidecar, "rb") as f:
+        metadata_sha256 = hashlib.sha256(f.read()).hexdigest()
+    assert files[os.path.basename(wheel)]["core-metadata"] == {"sha256": metadata_sha256}
+    assert f'data-core-metadata="sha256={metadata_sha256}"' in page
+    assert not os.path.exists(sdist + index.METADATA_SUFFIX)
+
+
+def test_concurrent_writers_all_land(tmp_path, clone_index):
+    writers = 8
+    processes = []
+    for number in range(writers):
+        checkout = clone_index(f"writer-{number}")
+        dist = tmp_path / f"dist-{number}"
+        dist.mkdir()
+        write_wheel(str(dist), f"pkg-{number}", "1.0")
+        processes.append(subprocess.Popen(
+            [sys.executable, os.path.join(REPO_ROOT, "publish.py"), f"pkg-{number}", "--root", str(checkout), "--dist", str(dist),
+             "--attempts", "30", "--backoff", "0.05"],
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+        ))
+    for process in processes:
+        output, _ = process.communicate(timeout=120)
+        assert process.returncode == 0, output
+
+    published = clone_index("published")
+    projects = json.loads((published / index.ROOT_MANIFEST_FILENAME).read_text())["projects"]
+    expected = [f"pkg-{number}" for number in range(writers)]
+    assert sorted(projects) == expected
+    assert index.read_links(str(published / "index.html")) == [f"{project}/" for project in expected]
+    assert [project["name"] for project in json.loads((published / "index.json").read_text())["projects"]] == expected
+    for project in expected:
+        assert index.list_distributions(str(published / project)) == [f"{project.replace('-', '_')}-1.0-py3-none-any.whl"]
@@ -0,0 +1,182 @@
+import os
+import re
+import json
+from datetime import date
+
+import pytest
+
+import index
+import retention
+from conftest import write_sdist, write_wheel
+
+VERSIONS = ("1.0", "1.1", "2.0")
+
+
+@pytest.mark.parametrize("spec, message", [
+    ("keep-last=0", "positive integer"),
+    ("keep-last=ten", "positive integer"),
+    ("keep-last", "positive integer"),
+    ("keep-since=2024-13-01", "expects a date"),
+    ("keep-since=yesterday", "expects a date"),
+    ("keep-latest-patch=2", "takes no value"),
+    ("yank=true", "takes no value"),
+    ("keep-forever", "Unknown retention rule 'keep-forever'"),
+])
+def test_parse_policy_rejects_invalid_rules(spec, message):
+    with pytest.raises(ValueError, match=message):
+        retention.parse_policy(spec)
+
+
+def test_parse_policy():
+    assert retention.parse_policy(" keep-last=3, KEEP-SINCE=2024-01-31 ,keep-latest-patch,yank,") == {
+        "keep_last": 3, "keep_since": date(2024, 1, 31), "keep_latest_patch": True, "yank": True,
+    }
+    assert retention.parse_policy("") == {"keep_last": None, "keep_since": None, "keep_latest_patch": False, "yank": False}
+
+
+def test_version_key_follows_pep_440_ordering():
+    ordered = [
+        "not-a-version",
+        "1.0.dev1", "1.0a1.dev1", "1.0a1", "1.0a2", "1.0b1", "1.0rc1",
+        "1.0", "1.0.post1.dev1", "1.0.post1", "1.0.post2",
+        "1.0.1", "1.1", "2.0", "10.0",
+        "1!0.1",
+    ]
+
+    assert sorted(reversed(ordered), key=retention.version_key) == ordered
+
+
+def test_version_key_ignores_trailing_zeros_and_local_labels():
+    assert retention.version_key("1.0") == retention.version_key("1.0.0") == retention.version_key("1")
+    assert retention.version_key("1.0+local.1") == retention.version_key("1.0")
+
+
+def pruned(versions, spec):
+    return retention.select_pruned_versions(versions, retention.parse_policy(spec))
+
+
+def test_keep_last():
+    versions = dict.fromkeys(["1.0", "1.1", "2.0rc1", "2.0", "1.2"])
+
+    assert pruned(versions, "keep-last=2") == {"1.0", "1.1", "1.2"}
+    assert pruned(versions, "keep-last=3") == {"1.0", "1.1"}
+    assert pruned(versions, "keep-last=10") == set()
+
+
+def test_keep_since_keeps_versions_with_unknown_times():
+    versions = {"1.0": "2023-05-01T00:00:00Z", "1.1": None, "1.2": "2024-01-01T00:00:00Z", "2.0": "2024-06-01T12:00:00Z"}
+
+    assert pruned(versions, "keep-since=2024-01-01") == {"1.0"}
+
+
+def test_keep_latest_patch():
+    versions = dict.fromkeys(["1.0.0", "1.0.1", "1.0.2", "1.1.0", "1.1.1.post1", "1.1.1", "2.0.0", "1!1.0.0"])
+
+    assert pruned(versions, "keep-latest-patch") == {"1.0.0", "1.0.1", "1.1.0", "1.1.1"}
+
+
+def test_rules_are_combined_and_the_newest_version_is_always_kept():
+    versions = {"1.0": "2023-01-01T00:00:00Z", "1.1": "2023-02-01T00:00:00Z", "2.0": "2023-03-01T00:00:00Z"}
+
+    assert pruned(versions, "keep-since=2030-01-01") == {"1.0", "1.1"}
+    assert pruned(versions, "keep-since=2030-01-01,keep-latest-patch") == set()
+    assert pruned(versions, "keep-last=1,keep-since=2023-02-01") == {"1.0"}
+
+
+def test_policy_without_keep_rules_prunes_nothing():
+    assert pruned({"1.0": None, "2.0": None}, "yank") == set()
+    assert pruned({}, "keep-last=1") == set()
+
+
+@pytest.fixture
+def package(tmp_path):
+    """An index with three versions (a wheel and an sdist each) of one package. Returns its directory."""
+    dist = tmp_path / "dist"
+    dist.mkdir()
+    for version in VERSIONS:
+        write_wheel(str(dist), "my-pkg", version)
+        write_sdist(str(dist), "my-pkg", version)
+    root = tmp_path / "index"
+    index.update_index(str(root), "my-pkg", dist_dir=str(dist))
+    return root / "my-pkg"
+
+
+def files_of(version):
+    return {f"my_pkg-{version}-py3-none-any.whl", f"my_pkg-{version}-py3-none-any.whl.metadata", f"my_pkg-{version}.tar.gz"}
+
+
+def page_files(package_dir):
+    return {name: (package_dir / name).read_bytes() for name in ("index.html", "index.json", index.DIGEST_CACHE_FILENAME)}
+
+
+def anchor(package_dir, filename):
+    match = re.search(rf'<a [^>]*>{re.escape(filename)}</a>', (package_dir / "index.html").read_text())
+    return match and match.group(0)
+
+
+def json_files(package_dir):
+    return {entry["filename"]: entry for entry in json.loads((package_dir / "index.json").read_text())["files"]}
+
+
+def test_delete_removes_files_sidecars_and_links(package):
+    removed = files_of("1.0") | files_of("1.1")
+    size = sum(os.path.getsize(package / name) for name in removed)
+
+    stats = index.update_index(str(package.parent), "my-pkg", retention="keep-last=1")
+
+    assert stats["retention"] == {"versions": ["1.0", "1.1"], "files": 4, "action": "delete", "bytes_reclaimable": size, "dry_run": False}
+    assert not removed & set(os.listdir(package))
+    assert files_of("2.0") <= set(os.listdir(package))
+    assert set(index.load_digest_cache(str(package))) == {"my_pkg-2.0-py3-none-any.whl", "my_pkg-2.0.tar.gz"}
+    assert set(json_files(package)) == {"my_pkg-2.0-py3-none-any.whl", "my_pkg-2.0.tar.gz"}
+    assert anchor(package, "my_pkg-1.0.tar.gz") is None
+    assert index.load_root_manifest(str(package.parent))["my-pkg"]["files"] == 2
+
+
+def test_yank_marks_files_and_keeps_them(package):
+    stats = index.update_index(str(package.parent), "my-pkg", retention="keep-last=1,yank")
+
+    assert stats["retention"]["files"] == 4
+    assert stats["retention"]["action"] == "yank"
+    assert stats["retention"]["bytes_reclaimable"] == 0
+    assert files_of("1.0") | files_of("1.1") | files_of("2.0") <= set(os.listdir(package))
+    assert f'data-yanked="{retention.YANK_REASON}"' in anchor(package, "my_pkg-1.0.tar.gz")
+    assert "data-yanked" not in anchor(package, "my_pkg-2.0.tar.gz")
+    files = json_files(package)
+    assert files["my_pkg-1.1-py3-none-any.whl"]["yanked"] == retention.YANK_REASON
+    assert files["my_pkg-2.0-py3-none-any.whl"]["yanked"] is False
+
+    # Already yanked files are not yanked again
+    assert index.update_index(str(package.parent), "my-pkg", retention="keep-last=1,yank")["retention"]["files"] == 0
+
+
+def test_dry_run_reports_without_changing_anything(package):
+    before = page_files(package)
+    listing = set(os.listdir(package))
+    size = sum(os.path.getsize(package / name) for name in files_of("1.0"))
+
+    stats = index.update_index(str(package.parent), "my-pkg", retention="keep-last=2", dry_run=True)
+
+    assert stats["retention"] == {"versions": ["1.0"], "files": 2, "action": "delete", "bytes_reclaimable": size, "dry_run": True}
+    assert set(os.listdir(package)) == listing
+    assert page_files(package) == before
+
+
+def test_remote_entries_are_unlisted_not_deleted(tmp_path):
+    dist = tmp_path / "dist"
+    dist.mkdir()
+    for version in VERSIONS:
+        write_wheel(str(dist), "my-pkg", version)
+    root = tmp_path / "index"
+    url_base = "https://github.com/me/my-pkg/releases/download/v2.0"
+    index.update_index(str(root), "my-pkg", dist_dir=str(dist), url_base=url_base)
+    assets = set(os.listdir(dist))
+
+    stats = index.update_index(str(root), "my-pkg", retention="keep-last=1")
+
+    assert stats["retention"]["files"] == 2
+    assert stats["retention"]["bytes_reclaimable"] == 0
+    assert set(os.listdir(dist)) == assets
+    assert set(json_files(root / "my-pkg")) == {"my_pkg-2.0-py3-none-any.whl"}
+    assert json_files(root / "my-pkg")["my_pkg-2.0-py3-none-any.whl"]["url"].startswith(url_base)
+    assert set(index.load_digest_cache(str(root / "my-pkg"))) == {"my_pkg-2.0-py3-none-any.whl"}
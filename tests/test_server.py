@@ -0,0 +1,112 @@
+import json
+import hashlib
+import threading
+import http.client
+
+import pytest
+
+import index
+import server
+from conftest import write_wheel
+
+
+@pytest.fixture
+def index_dir(tmp_path):
+    root = tmp_path / "index"
+    dist = tmp_path / "dist"
+    dist.mkdir()
+    write_wheel(str(dist), "my-pkg", "1.0")
+    index.update_index(str(root), "my-pkg", dist_dir=str(dist))
+    (root / ".git").mkdir()
+    (root / ".git" / "config").write_text("[remote \"origin\"]\n")
+    return root
+
+
+@pytest.fixture
+def request_index(index_dir):
+    """Starts the server on a free port and returns a function making one request: (status, headers, body)."""
+    server.IndexRequestHandler.etags = server.ETagCache()
+    httpd = server.IndexServer(("127.0.0.1", 0), str(index_dir), quiet=True, workers=4)
+    thread = threading.Thread(target=httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+
+    def request(path, headers=None, method="GET"):
+        connection = http.client.HTTPConnection("127.0.0.1", httpd.server_address[1], timeout=10)
+        try:
+            connection.request(method, path, headers=headers or {})
+            response = connection.getresponse()
+            return response.status, dict(response.getheaders()), response.read()
+        finally:
+            connection.close()
+
+    yield request
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.mark.parametrize("path", ["/.git/config", "/.git/", "/my-pkg/.digests.json", "/.packages.json", "/my-pkg/../.git/config"])
+def test_dot_paths_are_not_served(request_index, path):
+    status, _, _ = request_index(path)
+
+    assert status == 404
+
+
+def test_content_negotiation(request_index):
+    status, headers, body = request_index("/my-pkg/", {"Accept": "application/vnd.pypi.simple.v1+json, text/html;q=0.5"})
+    assert status == 200
+    assert headers["Content-Type"] == server.JSON_CONTENT_TYPE
+    assert json.loads(body)["name"] == "my-pkg"
+
+    status, headers, body = request_index("/my-pkg/", {"Accept": "text/html"})
+    assert status == 200
+    assert b"Links for my-pkg" in body
+    assert request_index("/my-pkg")[0] == 301
+    assert request_index("/my-pkg/", {"Accept": "application/xml"})[0] == 406
+
+
+def test_artifact_etag_comes_from_the_digest_cache(index_dir, request_index):
+    filename = "my_pkg-1.0-py3-none-any.whl"
+    cache = index.load_digest_cache(str(index_dir / "my-pkg"))
+    # A recorded digest that differs from the content proves the file wasn't hashed on request
+    cache[filename] = dict(cache[filename], sha256="0" * 64)
+    index.save_digest_cache(str(index_dir / "my-pkg"), cache)
+
+    status, headers, _ = request_index(f"/my-pkg/{filename}", {"Range": "bytes=0-9"})
+
+    assert status == 206
+    assert headers["ETag"] == f'"{"0" * 64}"'
+    assert request_index(f"/my-pkg/{filename}", {"If-None-Match": headers["ETag"]})[0] == 304
+
+
+def test_artifact_etag_is_hashed_when_the_cached_size_differs(index_dir, request_index):
+    filename = "my_pkg-1.0-py3-none-any.whl"
+    cache = index.load_digest_cache(str(index_dir / "my-pkg"))
+    cache[filename] = dict(cache[filename], sha256="0" * 64, size=1)
+    index.save_digest_cache(str(index_dir / "my-pkg"), cache)
+
+    status, headers, body = request_index(f"/my-pkg/{filename}")
+
+    assert status == 200
+    assert headers["ETag"] == f'"{hashlib.sha256(body).hexdigest()}"'
+
+
+def test_range_requests(index_dir, request_index):
+    filename = "my_pkg-1.0-py3-none-any.whl"
+    content = (index_dir / "my-pkg" / filename).read_bytes()
+
+    status, headers, body = request_index(f"/my-pkg/{filename}", {"Range": "bytes=-10"})
+    assert status == 206
+    assert body == content[-10:]
+    assert headers["Content-Range"] == f"bytes {len(content) - 10}-{len(content) - 1}/{len(content)}"
+    assert request_index(f"/my-pkg/{filename}", {"Range": f"bytes={len(content)}-"})[0] == 416
+
+
+def test_more_connections_than_workers(request_index):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(request_index("/my-pkg/")[0])) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [200] * 20
@@ -0,0 +1,47 @@
+import errno
+import tomllib
+
+import update
+
+PYPROJECT = """[project]
+name = "my-pkg" # keep this comment
+version = "1.2.3"
+dependencies = ["requests"]
+"""
+
+
+def write_project(directory):
+    directory.mkdir()
+    (directory / "pyproject.toml").write_text(PYPROJECT)
+    return directory
+
+
+def test_bump_keeps_everything_else(tmp_path):
+    project = write_project(tmp_path / "a")
+
+    assert update.run_update([str(project)], update.build_changes(bump="minor")) == 0
+
+    text = (project / "pyproject.toml").read_text()
+    assert text == PYPROJECT.replace('"1.2.3"', '"1.3.0"')
+    assert tomllib.loads(text)["project"]["dependencies"] == ["requests"]
+
+
+def test_write_errors_are_reported_per_file(tmp_path, monkeypatch, capsys):
+    failing = write_project(tmp_path / "failing")
+    working = write_project(tmp_path / "working")
+    write_atomic = update.write_atomic
+
+    def write_or_fail(path, content):
+        if str(failing) in path:
+            raise OSError(errno.ENOSPC, "No space left on device")
+        write_atomic(path, content)
+
+    monkeypatch.setattr(update, "write_atomic", write_or_fail)
+
+    assert update.run_update([str(failing), str(working)], update.build_changes(bump="patch"), jobs=2) == 1
+
+    output = capsys.readouterr().out
+    assert "FAIL" in output and "can't write: No space left on device" in output
+    assert "1 updated, 0 unchanged, 1 failed." in output
+    assert (failing / "pyproject.toml").read_text() == PYPROJECT
+    assert '"1.2.4"' in (working / "pyproject.toml").read_text()
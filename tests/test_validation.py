@@ -0,0 +1,152 @@
+import json
+import tomllib
+
+import pytest
+
+import batch
+import validation
+from validation import Version
+
+VALID_PYPROJECT = """[project]
+name = "my-pkg"
+version = "1.0"
+authors = [{ name = "Jane Doe", email = "jane@example.com" }]
+urls = { Homepage = "https://github.com/me/my-pkg" }
+scripts = { my-cli = "my_pkg.main:run" }
+"""
+
+
+@pytest.mark.parametrize("version, expected", [
+    ("1.0", Version(0, (1, 0), None, None, None, None)),
+    ("1!2.0.1", Version(1, (2, 0, 1), None, None, None, None)),
+    ("2.0rc1", Version(0, (2, 0), ("rc", 1), None, None, None)),
+    ("1.0-alpha.2", Version(0, (1, 0), ("a", 2), None, None, None)),
+    ("1.0c3", Version(0, (1, 0), ("rc", 3), None, None, None)),
+    ("1.0b", Version(0, (1, 0), ("b", 0), None, None, None)),
+    ("1.0.post2", Version(0, (1, 0), None, 2, None, None)),
+    ("1.0-3", Version(0, (1, 0), None, 3, None, None)),
+    ("1.0rev", Version(0, (1, 0), None, 0, None, None)),
+    ("1.0.dev4", Version(0, (1, 0), None, None, 4, None)),
+    ("1.0a1.post2.dev3", Version(0, (1, 0), ("a", 1), 2, 3, None)),
+    ("1.0+Ubuntu.1", Version(0, (1, 0), None, None, None, "ubuntu.1")),
+    ("v1.2", Version(0, (1, 2), None, None, None, None)),
+    ("  1.2\n", Version(0, (1, 2), None, None, None, None)),
+])
+def test_parse_version_accepts_pep_440_forms(version, expected):
+    assert validation.parse_version(version) == expected
+    assert validation.is_valid_version(version)
+
+
+@pytest.mark.parametrize("version", ["", "1.0.", "one", "1.0-", "1.0+", "1.0+local!", "x1.0", "1 .0"])
+def test_parse_version_rejects_invalid_versions(version):
+    assert validation.parse_version(version) is None
+    assert not validation.is_valid_version(version)
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("my-pkg", "my-pkg"),
+    ("My_Pkg", "my-pkg"),
+    ("my.pkg", "my-pkg"),
+    ("my--_.pkg", "my-pkg"),
+    ("MY-PKG", "my-pkg"),
+])
+def test_normalize_name(name, expected):
+    assert validation.normalize_name(name) == expected
+
+
+def test_check_fields_collects_every_problem():
+    record = {
+        "package_name": "-bad-",
+        "package_version": "one",
+        "your_email": "not-an-email",
+        "package_github_url": "https://gitlab.com/me/pkg",
+        "cli_entry_point": 5,
+    }
+
+    errors = validation.check_fields(record, required=("package_name", "your_name"))
+
+    assert sorted(error.field for error in errors) == [
+        "cli_entry_point", "package_github_url", "package_name", "package_version", "your_email", "your_name",
+    ]
+    assert str(next(error for error in errors if error.field == "your_name")) == "your_name: missing or empty"
+
+
+def test_check_fields_accepts_a_valid_record():
+    record = {"package_name": "my.pkg", "package_version": "1.0rc1", "your_email": "jane@example.com"}
+
+    assert validation.check_fields(record, required=("package_name",)) == []
+
+
+def test_validate_pyproject_accepts_a_valid_project():
+    assert validation.validate_pyproject(tomllib.loads(VALID_PYPROJECT)) == []
+
+
+def test_validate_pyproject_accepts_a_dynamic_version():
+    assert validation.validate_pyproject({"project": {"name": "my-pkg", "dynamic": ["version"]}}) == []
+
+
+@pytest.mark.parametrize("project, field", [
+    ({"version": "1.0"}, "project.name"),
+    ({"name": "my-pkg"}, "project.version"),
+    ({"name": "my-pkg", "version": "one"}, "project.version"),
+    ({"name": "my-pkg", "version": "1.0", "authors": [{"email": "nope"}]}, "project.authors[0].email"),
+    ({"name": "my-pkg", "version": "1.0", "urls": {"Homepage": "ftp://host"}}, "project.urls.Homepage"),
+    ({"name": "my-pkg", "version": "1.0", "scripts": {"my-cli": "no-colon"}}, "project.scripts.my-cli"),
+])
+def test_validate_pyproject_reports_invalid_values(project, field):
+    assert [error.field for error in validation.validate_pyproject({"project": project})] == [field]
+
+
+@pytest.mark.parametrize("key, value, field", [
+    ("urls", ["a"], "project.urls"),
+    ("scripts", "my_pkg.main:run", "project.scripts"),
+    ("gui-scripts", 1, "project.gui-scripts"),
+    ("dynamic", "version", "project.dynamic"),
+    ("authors", "Jane Doe", "project.authors"),
+    ("maintainers", ["Jane Doe"], "project.maintainers[0]"),
+    ("authors", [{"email": 5}], "project.authors[0].email"),
+])
+def test_validate_pyproject_reports_malformed_types(key, value, field):
+    project = {"name": "my-pkg", "version": "1.0", key: value}
+
+    errors = validation.validate_pyproject({"project": project})
+
+    assert [error.field for error in errors] == [field]
+
+
+def test_validate_pyproject_without_a_project_table():
+    assert [error.field for error in validation.validate_pyproject({"tool": {}})] == ["project"]
+    assert [error.field for error in validation.validate_pyproject({"project": "x"})] == ["project"]
+
+
+def write_pyproject(directory, text):
+    directory.mkdir()
+    path = directory / "pyproject.toml"
+    path.write_text(text)
+    return str(path)
+
+
+def test_run_validate_exit_codes(tmp_path, capsys):
+    valid = write_pyproject(tmp_path / "valid", VALID_PYPROJECT)
+    invalid = write_pyproject(tmp_path / "invalid", '[project]\nname = "my-pkg"\nversion = "1.0"\nurls = ["a"]\n')
+    unreadable = write_pyproject(tmp_path / "unreadable", "[project\n")
+
+    assert batch.run_validate([valid]) == 0
+    assert batch.run_validate([valid, invalid]) == 1
+    assert "project.urls: expected a table" in capsys.readouterr().out
+    assert batch.run_validate([invalid, unreadable]) == 2
+    assert batch.run_validate([str(tmp_path / "missing.toml")]) == 2
+
+
+def test_run_validate_json_format(tmp_path, capsys):
+    manifest = tmp_path / "packages.jsonl"
+    manifest.write_text(json.dumps({"package_name": "my-pkg", "package_version": "one"}) + "\n")
+
+    assert batch.run_validate([str(manifest)], output_format="json") == 1
+
+    problems = json.loads(capsys.readouterr().out)
+    assert {"path": str(manifest), "record": 0, "package": "my-pkg", "field": "package_version", "value": "one",
+            "message": "not a valid PEP 440 version, got 'one'"} in problems
+    assert {problem["field"] for problem in problems} == {
+        "package_version", "your_name", "your_email", "short_description", "package_github_url",
+    }
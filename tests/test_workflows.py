@@ -0,0 +1,157 @@
+"""Structural tests of the generated workflows: every combination of settings must be valid YAML with the expected jobs and steps."""
+import re
+import itertools
+
+import pytest
+import yaml
+
+import main
+import monorepo
+
+SETTINGS = {"github_username": "me", "pypi_index_repo_name": "my-python-index", "pat_secret_name": "INDEX_PAT"}
+RETENTIONS = (None, "keep-last=10,yank")
+MATRICES = (None, {"python-version": ["3.11", "3.12"], "os": ["ubuntu-latest", "windows-latest"]})
+FULL_HISTORY = (False, True)
+CONCURRENCY_GROUP = "pypi-index-me-my-python-index-${{ github.repository }}"
+
+SINGLE_PACKAGE_COMBINATIONS = list(itertools.product(main.WORKFLOW_PROFILE_CHOICES, main.ARTIFACT_STORAGE_CHOICES, RETENTIONS, MATRICES, FULL_HISTORY))
+MONOREPO_COMBINATIONS = list(itertools.product(main.WORKFLOW_PROFILE_CHOICES, main.ARTIFACT_STORAGE_CHOICES, RETENTIONS, FULL_HISTORY))
+
+
+def combination_id(values):
+    return "-".join("matrix" if isinstance(value, dict) else str(value) for value in values)
+
+
+def load(content):
+    workflow = yaml.safe_load(content)
+    # YAML 1.1 reads the bare key 'on' as a boolean
+    workflow["on"] = workflow.pop(True)
+    return workflow
+
+
+def step_using(job, action, **with_values):
+    """The steps of a job that use an action and whose 'with' block contains the given values."""
+    return [
+        step for step in job["steps"]
+        if step.get("uses", "").startswith(action) and all(step.get("with", {}).get(key) == value for key, value in with_values.items())
+    ]
+
+
+def step_named(job, prefix):
+    steps = [step for step in job["steps"] if step.get("name", "").startswith(prefix)]
+    assert len(steps) == 1, f"expected one step named '{prefix}...'"
+    return steps[0]
+
+
+def package_checkout(job):
+    """The checkout of the package repository (the index repository checkout names a 'repository')."""
+    steps = [step for step in step_using(job, "actions/checkout@") if "repository" not in step.get("with", {})]
+    assert len(steps) == 1
+    return steps[0]
+
+
+def check_setup_steps(job, profile, full_history, pyproject_glob):
+    fetch_depth = package_checkout(job)["with"]["fetch-depth"]
+    assert fetch_depth == (0 if profile == "standard" or full_history else 1)
+    setup_uv = step_using(job, "astral-sh/setup-uv@")
+    if profile == "fast":
+        assert len(setup_uv) == 1
+        assert setup_uv[0]["with"] == {"enable-cache": True, "cache-dependency-glob": pyproject_glob}
+        assert "uv build" in step_named(job, "Build")["run"]
+    else:
+        assert setup_uv == []
+        assert "python -m build" in step_named(job, "Build")["run"]
+
+
+def check_index_checkout(job, package_expression):
+    checkouts = step_using(job, "actions/checkout@", repository="me/my-python-index")
+    assert len(checkouts) == 1
+    options = checkouts[0]["with"]
+    assert options["token"] == "${{ secrets.INDEX_PAT }}"
+    assert options["filter"] == "blob:none"
+    assert options["sparse-checkout-cone-mode"] is True
+    assert options["sparse-checkout"].splitlines() == [f"${{{{ {package_expression}.normalized }}}}", f"${{{{ {package_expression}.legacy }}}}"]
+
+
+def check_publish_options(job, artifact_storage, retention):
+    command = step_named(job, "Update and push PyPI Index")["run"]
+    assert "python -m py_toml_builder.publish" in command
+    assert ("--url-base" in command) == (artifact_storage == "release")
+    assert (f'--retention "{retention}"' in command) == bool(retention)
+    uploads = [step for step in job["steps"] if step.get("name") == "Upload distributions as release assets"]
+    assert len(uploads) == (1 if artifact_storage == "release" else 0)
+
+
+def check_triggers(workflow, artifact_storage):
+    assert workflow["on"]["release"] == {"types": ["published"]}
+    dispatch = workflow["on"]["workflow_dispatch"]
+    if artifact_storage == "release":
+        assert dispatch["inputs"]["tag"]["required"] is True
+    else:
+        assert dispatch is None
+    assert workflow["concurrency"] == {"group": CONCURRENCY_GROUP, "cancel-in-progress": False}
+
+
+@pytest.mark.parametrize("profile, artifact_storage, retention, matrix, full_history", SINGLE_PACKAGE_COMBINATIONS, ids=map(combination_id, SINGLE_PACKAGE_COMBINATIONS))
+def test_single_package_workflow(profile, artifact_storage, retention, matrix, full_history):
+    workflow = load(main.generate_workflow_yml(
+        **SETTINGS, artifact_storage=artifact_storage, retention=retention, profile=profile, full_history=full_history, matrix=matrix
+    ))
+
+    check_triggers(workflow, artifact_storage)
+    publish_job = workflow["jobs"]["build_and_publish"]
+    check_setup_steps(publish_job, profile, full_history, "pyproject.toml")
+    check_index_checkout(publish_job, "steps.package.outputs")
+    check_publish_options(publish_job, artifact_storage, retention)
+    assert main.INDEX_BUILDER_REQUIREMENT in main.generate_setup_steps(profile, full_history)
+
+    if matrix:
+        # Wheels are built in parallel and a single fan-in job builds the sdist and updates the index
+        assert set(workflow["jobs"]) == {"build_wheels", "build_and_publish"}
+        build_job = workflow["jobs"]["build_wheels"]
+        assert build_job["strategy"]["matrix"] == matrix
+        assert build_job["runs-on"] == "${{ matrix.os }}"
+        check_setup_steps(build_job, profile, full_history, "pyproject.toml")
+        assert "--wheel" in step_named(build_job, "Build")["run"]
+        assert step_using(build_job, "actions/upload-artifact@")[0]["with"]["path"] == "dist/*.whl"
+        assert publish_job["needs"] == "build_wheels"
+        assert "--sdist" in step_named(publish_job, "Build")["run"]
+        assert step_using(publish_job, "actions/download-artifact@", pattern="dist-*", **{"merge-multiple": True})
+    else:
+        assert set(workflow["jobs"]) == {"build_and_publish"}
+        assert "needs" not in publish_job
+        assert not step_using(publish_job, "actions/download-artifact@")
+
+
+@pytest.mark.parametrize("profile, artifact_storage, retention, full_history", MONOREPO_COMBINATIONS, ids=map(combination_id, MONOREPO_COMBINATIONS))
+def test_monorepo_workflow(profile, artifact_storage, retention, full_history):
+    content = main.generate_monorepo_workflow_yml(**SETTINGS, artifact_storage=artifact_storage, retention=retention, profile=profile, full_history=full_history)
+    workflow = load(content)
+
+    check_triggers(workflow, artifact_storage)
+    assert set(workflow["jobs"]) == {"detect", "build_and_publish"}
+    detect_job = workflow["jobs"]["detect"]
+    assert package_checkout(detect_job)["with"] == {"fetch-depth": 0, "filter": "blob:none"}
+    assert "py_toml_builder.monorepo changed" in step_named(detect_job, "Detect changed packages")["run"]
+
+    publish_job = workflow["jobs"]["build_and_publish"]
+    assert publish_job["needs"] == "detect"
+    assert publish_job["if"] == "needs.detect.outputs.any == 'true'"
+    assert publish_job["strategy"] == {"fail-fast": False, "matrix": {"package": "${{ fromJSON(needs.detect.outputs.packages) }}"}}
+    check_setup_steps(publish_job, profile, full_history, "${{ matrix.package.path }}/pyproject.toml")
+    check_index_checkout(publish_job, "matrix.package")
+    check_publish_options(publish_job, artifact_storage, retention)
+
+    # Every 'matrix.package.<key>' the workflow uses is produced by the detect job
+    used_keys = set(re.findall(r"matrix\.package\.([a-z_]+)", content))
+    package = {"name": "My.Pkg", "normalized": "my-pkg", "path": "packages/my-pkg", "version": "1.0", "errors": []}
+    assert used_keys <= set(monorepo.release_matrix([(package, monorepo.NEW, None)])[0])
+
+
+def test_generate_workflow_rejects_unknown_settings():
+    with pytest.raises(ValueError):
+        main.generate_workflow_yml(**SETTINGS, profile="turbo")
+    with pytest.raises(ValueError):
+        main.generate_workflow_yml(**SETTINGS, artifact_storage="s3")
+    with pytest.raises(ValueError):
+        main.generate_workflow_yml(**SETTINGS, retention="keep-forever")
@@ -0,0 +1,350 @@
+"""
+In-place updates of existing pyproject.toml files.
+
+Only the requested [project] keys are rewritten, by editing their lines in the original text, so
+comments, formatting, dependencies and every other table stay as they are:
+
+    py-toml-builder update services/*/ --bump patch
+    py-toml-builder update . --version 1.4.0 --script my-cli=my_pkg.main:run --url Homepage=https://github.com/me/my-pkg
+    py-toml-builder update repo-a repo-b --author "Jane Doe <jane@example.com>"
+
+Each file is read with tomllib, patched, re-parsed to verify that exactly the requested values changed,
+and written atomically (temporary file + os.replace). Files whose content doesn't change are not written.
+"""
+import os
+import re
+import copy
+import json
+import shutil
+import tomllib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parseaddr
+
+try:
+    from .main import COLOR_RESET, COLOR_GREEN, COLOR_YELLOW, COLOR_RED, COLOR_CYAN, PYPROJECT_PATH, toml_key, toml_string
+    from .metrics import Metrics
+    from .validation import parse_version, is_valid_version, is_valid_email, is_valid_url, is_valid_entry_point
+except ImportError:
+    from main import COLOR_RESET, COLOR_GREEN, COLOR_YELLOW, COLOR_RED, COLOR_CYAN, PYPROJECT_PATH, toml_key, toml_string
+    from metrics import Metrics
+    from validation import parse_version, is_valid_version, is_valid_email, is_valid_url, is_valid_entry_point
+
+BUMP_PARTS = ("major", "minor", "patch")
+
+_TABLE_HEADER_PATTERN = re.compile(r"^\s*\[\s*([^\[\]]+?)\s*\]\s*(?:#.*)?$")
+_ARRAY_TABLE_HEADER_PATTERN = re.compile(r"^\s*\[\[\s*([^\[\]]+?)\s*\]\]\s*(?:#.*)?$")
+_KEY_PATTERN = re.compile(r"""^\s*("(?:[^"\\]|\\.)*"|'[^']*'|[A-Za-z0-9_-]+)\s*=""")
+
+
+class UpdateError(Exception):
+    """Raised when a pyproject.toml can't be read or patched safely."""
+
+
+# --- TOML text helpers ---
+def scan_line(line, depth=0, string=None):
+    """
+    Scans one line, tracking bracket depth and multi-line strings.
+    Returns (depth, open multi-line string delimiter or None, index of the comment '#' or None).
+    """
+    position = 0
+    while position < len(line):
+        if string:
+            if string in ('"', '"""') and line[position] == "\\":
+                position += 2
+            elif line.startswith(string, position):
+                position += len(string)
+                string = None
+            else:
+                position += 1
+            continue
+        char = line[position]
+        if char == "#":
+            return depth, None, position
+        if line.startswith('"""', position) or line.startswith("'''", position):
+            string = line[position:position + 3]
+            position += 3
+            continue
+        if char in "\"'":
+            string = char
+        elif char in "[{":
+            depth += 1
+        elif char in "]}":
+            depth -= 1
+        position += 1
+    return depth, (string if string in ('"""', "'''") else None), None
+
+
+def unquote_key(key):
+    return json.loads(key) if key.startswith('"') else key.strip("'")
+
+
+def scan_statements(lines):
+    """
+    Splits a TOML document into statements: [(kind, name, first line, last line)], where kind is
+    'table' for '[header]' and '[[header]]' lines and 'key' for key/value pairs (name is the unquoted
+    first key). Multi-line arrays, inline tables and strings belong to the statement they start in.
+    """
+    statements = []
+    depth, string, start = 0, None, None
+    for number, line in enumerate(lines):
+        if start is None:
+            stripped = line.strip()
+            if not stripped or stripped.startswith("#"):
+                continue
+            header = _ARRAY_TABLE_HEADER_PATTERN.match(line) or _TABLE_HEADER_PATTERN.match(line)
+            if header:
+                statements.append(("table", header.group(1), number, number))
+                continue
+            start = number
+        depth, string, _ = scan_line(line, depth, string)
+        if depth <= 0 and string is None:
+            key = _KEY_PATTERN.match(lines[start])
+            statements.append(("key", unquote_key(key.group(1)) if key else None, start, number))
+            depth, start = 0, None
+    return statements
+
+
+def find_table(statements, table):
+    """Returns (header statement or None, [key statements]) of a table; the table '' is the document root."""
+    header, keys, current = None, [], ""
+    for statement in statements:
+        kind, name = statement[0], statement[1]
+        if kind == "table":
+            current = name
+            if name == table:
+                header = statement
+        elif current == table:
+            keys.append(statement)
+    return header, keys
+
+
+def line_ending(lines):
+    return "\r\n" if lines and lines[0].endswith("\r\n") else "\n"
+
+
+def set_statement(lines, table, key, statement, after=()):
+    """
+    Sets 'key' of 'table' to the rendered 'statement' (e.g. 'version = "1.0"'). An existing single-line
+    statement keeps its indentation and trailing comment; a missing key is inserted after the first
+    existing key named in 'after' (or at the end of the table), and a missing table is appended.
+    Returns the new list of lines.
+    """
+    newline = line_ending(lines)
+    statements = scan_statements(lines)
+    header, keys = find_table(statements, table)
+    for _, name, first, last in keys:
+        if name == key:
+            indent = lines[first][:len(lines[first]) - len(lines[first].lstrip())]
+            comment = ""
+            if first == last:
+                _, _, comment_position = scan_line(lines[first])
+                if comment_position is not None:
+                    code = lines[first][:comment_position]
+                    comment = code[len(code.rstrip()):] + lines[first][comment_position:].rstrip("\r\n")
+            return lines[:first] + [indent + statement.replace("\n", newline) + comment + newline] + lines[last + 1:]
+
+    new_lines = [part + newline for part in statement.split("\n")]
+    if lines and not lines[-1].endswith(("\n", "\r")):
+        lines = lines[:-1] + [lines[-1] + newline] # New lines may be added after the last one
+    if header is None and table:
+        return lines + [newline, f"[{table}]{newline}"] + new_lines
+    anchors = {name: last for _, name, _, last in keys}
+    anchor = next((anchors[name] for name in after if name in anchors), None)
+    if anchor is None:
+        anchor = keys[-1][3] if keys else (header[3] if header else -1)
+    return lines[:anchor + 1] + new_lines + lines[anchor + 1:]
+
+
+# --- Requested changes ---
+def bump_version(version, part):
+    """Increments the major, minor or patch number of a PEP 440 version; pre/post/dev/local parts are dropped."""
+    parsed = parse_version(version)
+    if parsed is None:
+        raise UpdateError(f"can't bump '{version}': not a valid PEP 440 version")
+    index = BUMP_PARTS.index(part)
+    release = (parsed.release + (0, 0, 0))[:3]
+    release = release[:index] + (release[index] + 1,) + (0,) * (2 - index)
+    return (f"{parsed.epoch}!" if parsed.epoch else "") + ".".join(str(number) for number in release)
+
+
+def parse_assignments(values, option, validator, description):
+    """Parses repeated 'NAME=VALUE' options into a dict. Raises ValueError on malformed or invalid values."""
+    parsed = {}
+    for value in values or ():
+        name, separator, target = value.partition("=")
+        if not separator or not name.strip() or not validator(target.strip()):
+            raise ValueError(f"{option} expects NAME={description}, got '{value}'")
+        parsed[name.strip()] = target.strip()
+    return parsed
+
+
+def build_changes(version=None, bump=None, scripts=None, urls=None, authors=None):
+    """Validates the requested changes and returns them as a dict. Raises ValueError on invalid input."""
+    if version and bump:
+        raise ValueError("--version and --bump can't be combined")
+    if version and not is_valid_version(version):
+        raise ValueError(f"--version: '{version}' is not a valid PEP 440 version")
+    parsed_authors = []
+    for author in authors or ():
+        name, email = parseaddr(author)
+        if not email or not is_valid_email(email):
+            name, email = author.strip(), None
+        if not name:
+            raise ValueError(f"--author expects 'Name <email>', got '{author}'")
+        parsed_authors.append((name, email))
+    changes = {
+        "version": version,
+        "bump": bump,
+        "scripts": parse_assignments(scripts, "--script", is_valid_entry_point, "module.path:object"),
+        "urls": parse_assignments(urls, "--url", is_valid_url, "https://..."),
+        "authors": parsed_authors,
+    }
+    if not any(changes.values()):
+        raise ValueError("nothing to update (use --version, --bump, --script, --url or --author)")
+    return changes
+
+
+def render_authors(authors):
+    people = [f"  {{ name={toml_string(name)}" + (f", email={toml_string(email)}" if email else "") + " }," for name, email in authors]
+    return "\n".join(["authors = [", *people, "]"])
+
+
+def patch_entries(lines, project, table, entries, quoted):
+    """Merges 'entries' into the [project.<table>] table, or into an inline 'table = {...}' under [project]."""
+    _, keys = find_table(scan_statements(lines), "project")
+    if any(name == table for _, name, _, _ in keys):
+        merged = dict(project.get(table, {}), **entries)
+        inline = ", ".join(f"{toml_key(key, quoted)} = {toml_string(value)}" for key, value in merged.items())
+        return set_statement(lines, "project", table, f"{table} = {{ {inline} }}")
+    for key, value in entries.items():
+        lines = set_statement(lines, f"project.{table}", key, f"{toml_key(key, quoted)} = {toml_string(value)}")
+    return lines
+
+
+def apply_changes(text, changes):
+    """
+    Applies the changes to the text of a pyproject.toml. Returns (new text, {key: (old, new)}).
+    Raises UpdateError if the file can't be patched or the result doesn't parse to the expected values.
+    """
+    try:
+        data = tomllib.loads(text)
+    except tomllib.TOMLDecodeError as e:
+        raise UpdateError(f"invalid TOML: {e}") from e
+    project = data.get("project")
+    if not isinstance(project, dict):
+        raise UpdateError("no [project] table")
+
+    expected = copy.deepcopy(data)
+    lines = text.splitlines(keepends=True)
+    changed = {}
+
+    version = changes.get("version")
+    if changes.get("bump"):
+        if "version" not in project:
+            raise UpdateError("no static project.version to bump" + (" (it is dynamic)" if "version" in project.get("dynamic", []) else ""))
+        version = bump_version(project["version"], changes["bump"])
+    if version:
+        if "version" in project.get("dynamic", []):
+            raise UpdateError("project.version is dynamic (e.g. set from git tags); remove it from 'dynamic' first")
+        if project.get("version") != version:
+            lines = set_statement(lines, "project", "version", f"version = {toml_string(version)}", after=("name",))
+            changed["version"] = (project.get("version"), version)
+            expected["project"]["version"] = version
+
+    for table, quoted in (("scripts", False), ("urls", True)):
+        entries = {key: value for key, value in changes.get(table, {}).items() if project.get(table, {}).get(key) != value}
+        if entries:
+            lines = patch_entries(lines, project, table, entries, quoted)
+            changed[table] = (project.get(table), dict(project.get(table, {}), **entries))
+            expected["project"][table] = changed[table][1]
+
+    if changes.get("authors"):
+        authors = [{"name": name, **({"email": email} if email else {})} for name, email in changes["authors"]]
+        if project.get("authors") != authors:
+            lines = set_statement(lines, "project", "authors", render_authors(changes["authors"]), after=("version", "name"))
+            changed["authors"] = (project.get("authors"), authors)
+            expected["project"]["authors"] = authors
+
+    new_text = "".join(lines)
+    try:
+        patched = tomllib.loads(new_text)
+    except tomllib.TOMLDecodeError as e:
+        raise UpdateError(f"patching would produce invalid TOML ({e}); edit this file by hand") from e
+    if patched != expected:
+        raise UpdateError("unusual layout (e.g. dotted keys); the patch didn't produce the expected values, edit this file by hand")
+    return new_text, changed
+
+
+def write_atomic(path, content):
+    """Replaces the file in one step, so readers never see a partially written file."""
+    fd, temp_path = tempfile.mkstemp(prefix=".pyproject-", suffix=".tmp", dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        shutil.copymode(path, temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def update_pyproject(path, changes, dry_run=False):
+    """Patches one pyproject.toml (or the one inside a directory). Returns (path, {key: (old, new)})."""
+    if os.path.isdir(path):
+        path = os.path.join(path, PYPROJECT_PATH)
+    try:
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            text = f.read()
+    except OSError as e:
+        raise UpdateError(f"can't read: {e.strerror}") from e
+    new_text, changed = apply_changes(text, changes)
+    if changed and new_text != text and not dry_run:
+        write_atomic(path, new_text)
+    return path, changed
+
+
+def describe(changed):
+    parts = []
+    for key, (old, new) in changed.items():
+        if key == "version":
+            parts.append(f"version {old} -> {new}")
+        elif key == "authors":
+            parts.append(f"authors -> {', '.join(author['name'] for author in new)}")
+        else:
+            parts.append(f"{key} " + ", ".join(name for name in new if (old or {}).get(name) != new[name]))
+    return "; ".join(parts)
+
+
+def run_update(paths, changes, jobs=None, dry_run=False, metrics=None):
+    """Updates many pyproject.toml files in parallel, prints a report and returns the exit code."""
+    metrics = metrics or Metrics()
+
+    def update(path):
+        try:
+            return path, *update_pyproject(path, changes, dry_run=dry_run), None
+        except UpdateError as e:
+            return path, path, None, str(e)
+        except OSError as e: # e.g. a read-only directory or a full disk while writing
+            return path, path, None, f"can't write: {e.strerror or e}"
+
+    updated = failed = 0
+    with metrics.phase("update"), ThreadPoolExecutor(max_workers=jobs or min(32, (os.cpu_count() or 1) + 4)) as executor:
+        for _, path, changed, error in executor.map(update, paths):
+            if error:
+                failed += 1
+                print(f"{COLOR_RED}  FAIL  {COLOR_RESET}{path}: {error}")
+            elif changed:
+                updated += 1
+                print(f"{COLOR_GREEN}  {'WOULD' if dry_run else 'OK'}    {COLOR_RESET}{path}: {describe(changed)}")
+            else:
+                print(f"{COLOR_YELLOW}  SAME  {COLOR_RESET}{path}")
+    metrics.count("files_updated", updated)
+    metrics.count("files_unchanged", len(paths) - updated - failed)
+    metrics.count("files_failed", failed)
+    verb = "would be updated" if dry_run else "updated"
+    print(f"{COLOR_CYAN}{updated} {verb}, {len(paths) - updated - failed} unchanged, {failed} failed.{COLOR_RESET}")
+    return 1 if failed else 0
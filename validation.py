@@ -0,0 +1,188 @@
+"""
+Validation of package settings: precompiled patterns, a PEP 440 version parser and the PEP 503 name
+normalizer (both memoized), and checks that collect every problem of a record or pyproject.toml as
+FieldError tuples instead of stopping at the first one.
+
+The interactive prompts, batch manifests and the 'validate' subcommand all use these rules.
+"""
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+# PEP 440 public and local versions, as given in the specification's appendix
+VERSION_PATTERN = re.compile(
+    r"""
+    ^\s*v?
+    (?:(?P<epoch>[0-9]+)!)?
+    (?P<release>[0-9]+(?:\.[0-9]+)*)
+    (?:[-_.]?(?P<pre_label>a|b|c|rc|alpha|beta|pre|preview)[-_.]?(?P<pre_number>[0-9]+)?)?
+    (?:-(?P<post_implicit>[0-9]+)|[-_.]?(?P<post_label>post|rev|r)[-_.]?(?P<post_number>[0-9]+)?)?
+    (?:[-_.]?(?P<dev_label>dev)[-_.]?(?P<dev_number>[0-9]+)?)?
+    (?:\+(?P<local>[a-z0-9]+(?:[-_.][a-z0-9]+)*))?
+    \s*$
+    """,
+    re.VERBOSE | re.IGNORECASE
+)
+PROJECT_NAME_PATTERN = re.compile(r"^(?:[A-Z0-9]|[A-Z0-9][A-Z0-9._-]*[A-Z0-9])$", re.IGNORECASE) # PEP 508
+NORMALIZE_PATTERN = re.compile(r"[-_.]+") # PEP 503
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+GITHUB_URL_PATTERN = re.compile(r"^https://github\.com/[a-zA-Z0-9_-]+/[a-zA-Z0-9_.-]+/?$")
+URL_PATTERN = re.compile(r"^https?://\S+$")
+# Console script (command) names: letters, digits, '.', '_' and '-'
+SCRIPT_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_][A-Za-z0-9._-]*$")
+# importable.module:object.attr
+ENTRY_POINT_PATTERN = re.compile(r"^[a-zA-Z_][a-zA-Z0-9_.]*:[a-zA-Z_][a-zA-Z0-9_.]*$")
+
+_PRE_LABELS = {"a": "a", "alpha": "a", "b": "b", "beta": "b", "c": "rc", "rc": "rc", "pre": "rc", "preview": "rc"}
+
+
+class Version(namedtuple("Version", ["epoch", "release", "pre", "post", "dev", "local"])):
+    """A parsed PEP 440 version; 'pre' is (label, number) with the label normalized to a/b/rc, or None."""
+    __slots__ = ()
+
+
+class FieldError(namedtuple("FieldError", ["field", "value", "message"])):
+    """One problem with one field of a record; 'field' is the record key or dotted pyproject.toml key."""
+    __slots__ = ()
+
+    def __str__(self):
+        return f"{self.field}: {self.message}"
+
+
+@lru_cache(maxsize=4096)
+def parse_version(version):
+    """Parses a PEP 440 version into a Version, or returns None if it isn't valid."""
+    match = VERSION_PATTERN.match(version)
+    if not match:
+        return None
+    pre = (_PRE_LABELS[match["pre_label"].lower()], int(match["pre_number"] or 0)) if match["pre_label"] else None
+    if match["post_implicit"] is not None:
+        post = int(match["post_implicit"])
+    elif match["post_label"]:
+        post = int(match["post_number"] or 0)
+    else:
+        post = None
+    dev = int(match["dev_number"] or 0) if match["dev_label"] else None
+    return Version(
+        epoch=int(match["epoch"] or 0),
+        release=tuple(int(part) for part in match["release"].split(".")),
+        pre=pre,
+        post=post,
+        dev=dev,
+        local=match["local"].lower() if match["local"] else None,
+    )
+
+
+@lru_cache(maxsize=4096)
+def normalize_name(name):
+    """PEP 503 normalized form of a project name (runs of '-', '_' and '.' become '-', lowercased)."""
+    return NORMALIZE_PATTERN.sub("-", name).lower()
+
+
+def is_valid_version(version):
+    return parse_version(version) is not None
+
+
+def is_valid_project_name(name):
+    return PROJECT_NAME_PATTERN.match(name) is not None
+
+
+def is_valid_email(email):
+    return EMAIL_PATTERN.match(email) is not None
+
+
+def is_valid_github_url(url):
+    return GITHUB_URL_PATTERN.match(url) is not None
+
+
+def is_valid_url(url):
+    return URL_PATTERN.match(url) is not None
+
+
+def is_valid_script_name(name):
+    return SCRIPT_NAME_PATTERN.match(name) is not None
+
+
+def is_valid_entry_point(reference):
+    return ENTRY_POINT_PATTERN.match(reference) is not None
+
+
+# Format checks for the package fields of a manifest record (and the interactive answers)
+FIELD_VALIDATORS = {
+    "package_name": (is_valid_project_name, "not a valid project name (letters, digits, '.', '_' and '-')"),
+    "package_version": (is_valid_version, "not a valid PEP 440 version"),
+    "your_email": (is_valid_email, "not a valid email address"),
+    "package_github_url": (is_valid_github_url, "expected https://github.com/<owner>/<repository>"),
+    "cli_command_name": (is_valid_script_name, "not a valid command name (letters, digits, '.', '_' and '-')"),
+    "cli_entry_point": (is_valid_entry_point, "expected 'module.path:object'"),
+}
+
+
+def check_fields(record, required=(), validators=FIELD_VALIDATORS):
+    """
+    Checks that the required fields are non-empty strings and that every present field passes its
+    format check. Returns a list of FieldError (empty if the record is valid).
+    """
+    errors = []
+    for field in required:
+        value = record.get(field)
+        if not isinstance(value, str) or not value.strip():
+            errors.append(FieldError(field, value, "missing or empty"))
+    for field, (validator, message) in validators.items():
+        value = record.get(field)
+        if isinstance(value, str) and value.strip() and not validator(value.strip()):
+            errors.append(FieldError(field, value, f"{message}, got '{value}'"))
+        elif value is not None and not isinstance(value, str) and field not in required:
+            errors.append(FieldError(field, value, "expected a string"))
+    return errors
+
+
+def validate_pyproject(data):
+    """Checks the [project] table of a parsed pyproject.toml. Returns a list of FieldError."""
+    project = data.get("project")
+    if not isinstance(project, dict):
+        return [FieldError("project", project, "missing [project] table")]
+
+    errors = []
+    name = project.get("name")
+    if not isinstance(name, str) or not is_valid_project_name(name):
+        errors.append(FieldError("project.name", name, f"not a valid project name, got '{name}'" if name else "missing or empty"))
+    dynamic = project.get("dynamic", [])
+    if not isinstance(dynamic, list):
+        errors.append(FieldError("project.dynamic", dynamic, "expected an array"))
+        dynamic = []
+    version = project.get("version")
+    if version is None:
+        if "version" not in dynamic:
+            errors.append(FieldError("project.version", None, "missing (and not listed in project.dynamic)"))
+    elif not isinstance(version, str) or not is_valid_version(version):
+        errors.append(FieldError("project.version", version, f"not a valid PEP 440 version, got '{version}'"))
+
+    for key in ("authors", "maintainers"):
+        people = project.get(key, [])
+        if not isinstance(people, list):
+            errors.append(FieldError(f"project.{key}", people, "expected an array of tables"))
+            continue
+        for position, person in enumerate(people):
+            if not isinstance(person, dict):
+                errors.append(FieldError(f"project.{key}[{position}]", person, "expected a table"))
+                continue
+            email = person.get("email")
+            if email is not None and (not isinstance(email, str) or not is_valid_email(email)):
+                errors.append(FieldError(f"project.{key}[{position}].email", email, f"not a valid email address, got '{email}'"))
+    urls = project.get("urls", {})
+    if not isinstance(urls, dict):
+        errors.append(FieldError("project.urls", urls, "expected a table"))
+        urls = {}
+    for label, url in urls.items():
+        if not isinstance(url, str) or not is_valid_url(url):
+            errors.append(FieldError(f"project.urls.{label}", url, f"not an http(s) URL, got '{url}'"))
+    for key in ("scripts", "gui-scripts"):
+        scripts = project.get(key, {})
+        if not isinstance(scripts, dict):
+            errors.append(FieldError(f"project.{key}", scripts, "expected a table"))
+            continue
+        for command, reference in scripts.items():
+            if not isinstance(reference, str) or not is_valid_entry_point(reference):
+                errors.append(FieldError(f"project.{key}.{command}", reference, f"expected 'module.path:object', got '{reference}'"))
+    return errors